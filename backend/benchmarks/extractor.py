@@ -0,0 +1,99 @@
+"""Benchmark the lxml extractor against `langchain_docs_extractor`.
+
+Each page of a fixed local HTML corpus (by default, the golden pages of the
+unit tests) is parsed and extracted, as `Crawler` does: with BeautifulSoup and
+`langchain_docs_extractor`, and with `langchain_docs_extractor_lxml`. Outputs
+are checked to be identical. Reports pages per second, the peak of Python
+allocations while extracting a page (tracemalloc), and the growth of the
+resident set size over the run, measured in a fresh process per extractor
+(lxml trees live in C memory, which tracemalloc does not see).
+
+Usage:
+    poetry run python backend/benchmarks/extractor.py
+    poetry run python backend/benchmarks/extractor.py --corpus saved_pages/ --repeat 20
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from backend.parser import langchain_docs_extractor, langchain_docs_extractor_lxml
+
+CORPUS = Path(__file__).parents[1] / "tests" / "unit_tests" / "fixtures" / "html"
+
+
+def extract_soup(html: str) -> str:
+    return langchain_docs_extractor(BeautifulSoup(html, "lxml"))
+
+
+EXTRACTORS = {
+    "beautifulsoup": extract_soup,
+    "lxml": langchain_docs_extractor_lxml,
+}
+
+
+def measure(name: str, pages: list[str], repeat: int) -> dict:
+    """Run in a fresh process, so that resident set sizes are comparable."""
+    extract = EXTRACTORS[name]
+    extract(pages[0])
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    elapsed = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+
+    peak = 0
+    tracemalloc.start()
+    for html in pages:
+        tracemalloc.reset_peak()
+        extract(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return {
+        "pages_per_second": repeat * len(pages) / elapsed,
+        "peak_kib": peak / 1024,
+        "rss_growth_kib": rss_growth,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = [path.read_text() for path in sorted(args.corpus.glob("*.html"))]
+    for html in pages:
+        assert langchain_docs_extractor_lxml(html) == extract_soup(html)
+    size = sum(len(html) for html in pages)
+    print(f"pages={len(pages)} size={size / 1024:.0f} KiB repeat={args.repeat}")
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        results = {
+            name: pool.apply(measure, (name, pages, args.repeat)) for name in EXTRACTORS
+        }
+    print(
+        f"{'extractor':>14} {'pages/s':>10} {'peak KiB/page':>14} {'RSS growth KiB':>15}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:>14} {result['pages_per_second']:>10.1f}"
+            f" {result['peak_kib']:>14.1f} {result['rss_growth_kib']:>15}"
+        )
+    speedup = (
+        results["lxml"]["pages_per_second"]
+        / results["beautifulsoup"]["pages_per_second"]
+    )
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark approximate (IVF) search of the local vector index against exact search.
+
+For each ``nprobe``, reports recall@k (the fraction of the exact top-k that the
+approximate search returns) and the mean latency per query, to choose the
+``nprobe`` search kwarg of the "local" retriever provider.
+
+Queries are rows of the index perturbed with Gaussian noise, which approximates
+questions close to (but not exactly equal to) an indexed chunk.
+
+Usage:
+    poetry run python backend/benchmarks/local_index_ann.py --index-path ./local_index
+    poetry run python backend/benchmarks/local_index_ann.py --synthetic 50000 --lists 256
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.local_index import LocalVectorIndex
+
+
+def make_synthetic_index(
+    n: int, dimensions: int, n_topics: int, seed: int = 0
+) -> LocalVectorIndex:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dimensions)).astype(np.float32)
+    vectors = topics[rng.integers(n_topics, size=n)] + 0.5 * rng.normal(
+        size=(n, dimensions)
+    ).astype(np.float32)
+    documents = [Document(page_content=str(i)) for i in range(n)]
+    return LocalVectorIndex.from_vectors(vectors, documents, "synthetic")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--index-path", type=Path, help="Local index snapshot")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic vectors")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--lists", type=int, help="IVF lists (default: 4 * sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--noise", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.index_path:
+        index = LocalVectorIndex.load(args.index_path)
+    else:
+        index = make_synthetic_index(args.synthetic, args.dimensions, n_topics=100)
+
+    n_lists = args.lists or int(4 * np.sqrt(len(index)))
+    if index.ivf is None or args.lists:
+        start = time.perf_counter()
+        index.build_ivf(n_lists)
+        print(f"Built {n_lists} IVF lists in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(index), args.queries, replace=False)
+    queries = np.asarray(index.vectors[rows]) + args.noise * rng.normal(
+        size=(args.queries, index.vectors.shape[1])
+    )
+
+    def run(nprobe):
+        start = time.perf_counter()
+        results = [index.search(query, args.k, nprobe=nprobe) for query in queries]
+        latency = (time.perf_counter() - start) / len(queries)
+        return [{row for row, _ in result} for result in results], latency
+
+    exact, exact_latency = run(None)
+    print(f"N={len(index)} k={args.k} queries={args.queries}")
+    print(f"{'nprobe':>8} {'recall@k':>10} {'ms/query':>10} {'speedup':>8}")
+    print(f"{'exact':>8} {1.0:>10.3f} {exact_latency * 1000:>10.2f} {1.0:>8.1f}")
+    for nprobe in args.nprobe:
+        if nprobe > index.ivf.n_lists:
+            break
+        approximate, latency = run(nprobe)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact) if e])
+        print(
+            f"{nprobe:>8} {recall:>10.3f} {latency * 1000:>10.2f}"
+            f" {exact_latency / latency:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark quantized codes (int8 / binary, full or reduced dimensions) of the local index.
+
+For each configuration, reports the resident size of the codes, recall@k against
+exact float32 search (after rescoring the shortlisted candidates with the float32
+vectors) and the mean latency per query.
+
+Queries are rows of the index perturbed with Gaussian noise, which approximates
+questions close to (but not exactly equal to) an indexed chunk.
+
+Results so far are synthetic only (20k x 1536 Gaussian vectors: int8 codes keep
+recall@6 = 1.0 at 4x less memory). Synthetic vectors lack the prefix property of
+text-embedding-3 vectors, so they say nothing about reduced dimensions or binary
+codes. The trade-off on the real corpus has not been measured yet: run
+``--from-weaviate --output`` against the production collection and keep the
+recorded results before enabling quantization there.
+
+Usage:
+    poetry run python backend/benchmarks/local_index_quantization.py --from-weaviate --output results.json
+    poetry run python backend/benchmarks/local_index_quantization.py --index-path ./local_index
+    poetry run python backend/benchmarks/local_index_quantization.py --synthetic 20000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.benchmarks.local_index_ann import make_synthetic_index
+from backend.local_index import LocalVectorIndex
+
+CONFIGURATIONS = [
+    ("int8", None),
+    ("int8", 512),
+    ("int8", 256),
+    ("binary", None),
+    ("binary", 512),
+]
+
+
+def export_general_guides(path: Path) -> LocalVectorIndex:
+    """Export the WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME collection."""
+    from backend.clients import connect_weaviate_client
+    from backend.constants import WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+    from backend.local_index import export_weaviate_collection
+
+    with connect_weaviate_client() as client:
+        return export_weaviate_collection(
+            client.collections.get(WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME),
+            path,
+            embedding_model="openai/text-embedding-3-small",
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-weaviate", action="store_true")
+    source.add_argument("--index-path", type=Path, help="Local index snapshot")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic vectors")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[24, 48, 96])
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--output", type=Path, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.from_weaviate:
+        index = export_general_guides(Path(tempfile.mkdtemp()))
+    elif args.index_path:
+        index = LocalVectorIndex.load(args.index_path)
+    else:
+        index = make_synthetic_index(args.synthetic, args.dimensions, n_topics=100)
+    index.codes = None
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(index), args.queries, replace=False)
+    queries = np.asarray(index.vectors[rows]) + args.noise * rng.normal(
+        size=(args.queries, index.vectors.shape[1])
+    )
+
+    def run(rescore=None):
+        start = time.perf_counter()
+        results = [index.search(query, args.k, rescore=rescore) for query in queries]
+        latency = (time.perf_counter() - start) / len(queries)
+        return [{row for row, _ in result} for result in results], latency
+
+    exact, exact_latency = run()
+    float_mb = index.vectors.nbytes / 2**20
+    results = [
+        {
+            "codes": "float32",
+            "rescore": None,
+            "mib": float_mb,
+            "recall": 1.0,
+            "ms_per_query": exact_latency * 1000,
+        }
+    ]
+    print(f"N={len(index)} D={index.vectors.shape[1]} k={args.k}")
+    print(
+        f"{'codes':>14} {'rescore':>8} {'MiB':>8} {'ratio':>6}"
+        f" {'recall@k':>9} {'ms/query':>9}"
+    )
+    print(
+        f"{'float32':>14} {'-':>8} {float_mb:>8.1f} {1:>6.0f}"
+        f" {1.0:>9.3f} {exact_latency * 1000:>9.2f}"
+    )
+    for kind, dimensions in CONFIGURATIONS:
+        if dimensions is not None and dimensions >= index.vectors.shape[1]:
+            continue
+        index.quantize(kind, dimensions)
+        name = f"{kind}@{index.codes.dimensions}"
+        codes_mb = index.codes.nbytes / 2**20
+        for rescore in args.rescore:
+            approximate, latency = run(rescore)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+            results.append(
+                {
+                    "codes": name,
+                    "rescore": rescore,
+                    "mib": codes_mb,
+                    "recall": float(recall),
+                    "ms_per_query": latency * 1000,
+                }
+            )
+            print(
+                f"{name:>14} {rescore:>8} {codes_mb:>8.1f} {float_mb / codes_mb:>6.0f}"
+                f" {recall:>9.3f} {latency * 1000:>9.2f}"
+            )
+
+    if args.output:
+        source = (
+            "weaviate"
+            if args.from_weaviate
+            else str(args.index_path or f"synthetic-{args.synthetic}")
+        )
+        args.output.write_text(
+            json.dumps(
+                {
+                    "source": source,
+                    "n": len(index),
+                    "dimensions": index.vectors.shape[1],
+                    "k": args.k,
+                    "queries": args.queries,
+                    "noise": args.noise,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
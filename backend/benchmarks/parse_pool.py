@@ -0,0 +1,94 @@
+"""Benchmark parsing and splitting crawled pages in a process pool.
+
+Pages of a fixed local HTML corpus (by default, the saved documentation pages of
+the unit tests) are parsed with `langchain_docs_extractor` and split as during
+ingestion, through `Crawler.process`: on the event loop (``parse_workers=0``)
+and in pools of processes. Reports pages per second; the pool only pays off
+with several cores, as parsing is CPU-bound.
+
+Usage:
+    poetry run python backend/benchmarks/parse_pool.py
+    poetry run python backend/benchmarks/parse_pool.py --pages 2000 --workers 0 2 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from functools import partial
+from pathlib import Path
+
+from bs4 import BeautifulSoup, SoupStrainer
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+from backend.crawler import Crawler, Site
+from backend.parser import langchain_docs_extractor
+
+CORPUS = Path(__file__).parents[1] / "tests" / "unit_tests" / "fixtures" / "html"
+
+
+def metadata(entry: dict, soup: BeautifulSoup) -> dict:
+    title = soup.find("title")
+    return {"source": entry["loc"], "title": title.get_text() if title else ""}
+
+
+def split(documents: list[Document], text_splitter: TextSplitter) -> list[Document]:
+    return text_splitter.split_documents(documents)
+
+
+async def run(
+    site: Site, pages: list[tuple[dict, str]], transform, workers: int
+) -> tuple[float, int]:
+    async with Crawler(transform=transform, parse_workers=workers) as crawler:
+        # Start the processes before timing.
+        await asyncio.gather(
+            *(crawler.process(site, *pages[0]) for _ in range(max(workers, 1)))
+        )
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(crawler.process(site, entry, html) for entry, html in pages)
+        )
+        elapsed = time.perf_counter() - start
+    return elapsed, sum(len(documents) for documents in results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[0, 1, 2, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    corpus = [path.read_text() for path in sorted(args.corpus.glob("*.html"))]
+    pages = [
+        ({"loc": f"https://docs.example/page-{i}"}, corpus[i % len(corpus)])
+        for i in range(args.pages)
+    ]
+    site = Site(
+        "https://docs.example/sitemap.xml",
+        parsing_function=langchain_docs_extractor,
+        meta_function=metadata,
+        parse_only=SoupStrainer(name=("article", "title", "html", "lang", "content")),
+    )
+    transform = partial(
+        split,
+        text_splitter=RecursiveCharacterTextSplitter(
+            chunk_size=4000, chunk_overlap=200
+        ),
+    )
+
+    print(f"pages={len(pages)} corpus={len(corpus)} files cpus={os.cpu_count()}")
+    print(f"{'workers':>8} {'pages/s':>10} {'chunks':>8} {'speedup':>8}")
+    baseline = None
+    for workers in dict.fromkeys(args.workers):
+        elapsed, chunks = asyncio.run(run(site, pages, transform, workers))
+        rate = len(pages) / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {chunks:>8} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark merging retrieved documents into the graph state.
+
+Simulates a research run: batches of retrieved documents (some of them already
+seen, some without a uuid) are merged one after another into the state until it
+holds N documents, as the researcher and agent graphs do through their
+``documents`` reducer. Reports the mean cost of a merge for the previous
+``reduce_docs`` (which rebuilt the uuid set and copied the state on every merge,
+and deep-copied documents without a uuid) and for `DocumentCollection`.
+
+`DocumentCollection` still copies the list of references on every merge, so its
+cost grows slowly with N; it is not constant.
+
+Usage:
+    poetry run python backend/benchmarks/reduce_docs.py
+    poetry run python backend/benchmarks/reduce_docs.py --sizes 1000 10000 --batch 20
+"""
+
+import argparse
+import time
+import uuid
+
+from langchain_core.documents import Document
+
+from backend.utils import reduce_docs
+
+
+def legacy_reduce_docs(existing: list[Document], new: list[Document]) -> list[Document]:
+    """`reduce_docs` before `DocumentCollection`, for Document inputs."""
+    existing_list = list(existing) if existing else []
+    new_list = []
+    existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
+    for item in new:
+        item_id = item.metadata.get("uuid")
+        if item_id is None:
+            item_id = str(uuid.uuid4())
+            new_item = item.copy(deep=True)
+            new_item.metadata["uuid"] = item_id
+        else:
+            new_item = item
+        if item_id not in existing_ids:
+            new_list.append(new_item)
+            existing_ids.add(item_id)
+    return existing_list + new_list
+
+
+def make_batches(n: int, batch: int) -> list[list[Document]]:
+    """Batches adding ``n`` documents in total, each repeating one earlier document."""
+    metadata = {"source": "https://python.langchain.com/docs/", "title": "Docs"}
+    batches = []
+    for start in range(0, n, batch):
+        documents = [
+            Document(
+                page_content="x" * 2000,
+                metadata={**metadata, "uuid": f"doc-{i}"} if i % 10 else metadata,
+            )
+            for i in range(start, min(start + batch, n))
+        ]
+        if start:
+            documents.append(batches[-1][-1])
+        batches.append(documents)
+    return batches
+
+
+def run(reducer, batches: list[list[Document]]) -> tuple[float, int]:
+    state: list[Document] = []
+    start = time.perf_counter()
+    for documents in batches:
+        state = reducer(state, documents)
+    return (time.perf_counter() - start) / len(batches), len(state)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--batch", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"batch={args.batch}")
+    print(
+        f"{'N':>8} {'legacy us/merge':>16} {'collection us/merge':>20} {'speedup':>8}"
+    )
+    for n in args.sizes:
+        batches = make_batches(n, args.batch)
+        legacy, legacy_size = run(legacy_reduce_docs, batches)
+        collection, size = run(reduce_docs, batches)
+        assert size == legacy_size
+        print(
+            f"{n:>8} {legacy * 1e6:>16.1f} {collection * 1e6:>20.1f}"
+            f" {legacy / collection:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""In-process caches and the optional shared cache store.
+
+`LRUCache` is a thread-safe, size-bounded LRU map with optional per-entry TTL
+and hit/miss counters. The shared store is an optional second tier (Redis or a
+local directory) configured through environment variables:
+
+- ``CACHE_REDIS_URL``: use Redis (e.g. the ``redis`` service of docker-compose).
+  Requires the ``redis`` extra (``poetry install --extras redis``).
+- ``CACHE_DIR``: otherwise, use a directory on local disk.
+
+When neither is set, only the in-process tier is used.
+
+Entries of the shared store expire ``CACHE_TTL_SECONDS`` (default: 7 days) after
+they were written, so that the store does not grow with every query ever asked:
+Redis expires them itself, and expired files of ``CACHE_DIR`` are removed when a
+process starts using the directory (see `prune_cache_dir`). 0 disables expiry.
+
+The shared store also holds the generation of each vector index, bumped by
+ingestion whenever it changes the index, so that caches derived from the index
+can tell that their entries are stale.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from langchain_core.stores import ByteStore
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+CACHE_NAMESPACE = "chat-langchain"
+DEFAULT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Prefix of the index generation keys, which never expire.
+INDEX_GENERATION_PREFIX = "index-generation"
+
+
+class LRUCache(Generic[K, V]):
+    """A thread-safe LRU cache bounded by the total size of its values.
+
+    Args:
+        max_size (int): Maximum total size of the cached values. A value of 0
+            disables the cache.
+        sizeof (Callable[[V], int]): Returns the size of a value. Defaults to
+            counting every entry as 1, which bounds the number of entries.
+    """
+
+    def __init__(self, max_size: int, sizeof: Callable[[V], int] = lambda _: 1):
+        self.max_size = max_size
+        self._sizeof = sizeof
+        self._data: OrderedDict[K, tuple[V, int, Optional[float]]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> Optional[V]:
+        """Return the cached value, or None on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if (
+                entry is not None
+                and entry[2] is not None
+                and entry[2] < time.monotonic()
+            ):
+                del self._data[key]
+                self._size -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Insert a value, evicting the least recently used ones as needed.
+
+        Args:
+            key (K): The cache key.
+            value (V): The value to cache.
+            ttl (Optional[float]): Seconds after which the entry expires.
+        """
+        size = self._sizeof(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._data[key] = (value, size, expires_at)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: K) -> Optional[V]:
+        """Remove and return a value, if present."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+            self._size -= entry[1]
+            return entry[0]
+
+    def clear(self) -> None:
+        """Remove every entry. Counters are preserved."""
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached values."""
+        return self._size
+
+    def stats(self) -> dict[str, int]:
+        """Return the counters used to size the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "size": self._size,
+            "max_size": self.max_size,
+        }
+
+
+def get_cache_ttl() -> int:
+    """Return the TTL of shared store entries, from ``CACHE_TTL_SECONDS``."""
+    return int(os.environ.get("CACHE_TTL_SECONDS", str(DEFAULT_CACHE_TTL_SECONDS)))
+
+
+def _make_shared_store(ttl: int) -> Optional[ByteStore]:
+    if redis_url := os.environ.get("CACHE_REDIS_URL"):
+        # Requires the optional `redis` package (the "redis" extra).
+        from langchain_community.storage import RedisStore
+
+        return RedisStore(
+            redis_url=redis_url, namespace=CACHE_NAMESPACE, ttl=ttl or None
+        )
+
+    if cache_dir := os.environ.get("CACHE_DIR"):
+        from langchain.storage import LocalFileStore
+
+        root = os.path.join(cache_dir, CACHE_NAMESPACE)
+        if ttl:
+            prune_cache_dir(root, ttl)
+        return LocalFileStore(root)
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_shared_store() -> Optional[ByteStore]:
+    """Return the optional cross-process cache store, based on the environment.
+
+    Its entries expire after `get_cache_ttl` seconds.
+    """
+    return _make_shared_store(get_cache_ttl())
+
+
+def _get_generation_store() -> Optional[ByteStore]:
+    # The shared store, without expiry: an expired generation would be read as
+    # "0". Only Redis entries expire by themselves.
+    store = get_shared_store()
+    if getattr(store, "ttl", None):
+        from langchain_community.storage import RedisStore
+
+        return RedisStore(client=store.client, namespace=store.namespace)
+    return store
+
+
+def prune_cache_dir(root: str, ttl: int) -> int:
+    """Remove the files of a ``CACHE_DIR`` store written more than ``ttl`` seconds ago.
+
+    Index generations are kept. Returns the number of removed files.
+    """
+    expired_before = time.time() - ttl
+    removed = 0
+    for directory, _, files in os.walk(root):
+        if os.path.relpath(directory, root).split(os.sep)[0] == (
+            INDEX_GENERATION_PREFIX
+        ):
+            continue
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime < expired_before:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                # Removed by another process.
+                pass
+    return removed
+
+
+# Used when no shared store is configured: only ingestion runs in this process
+# can then invalidate caches, so caches that must never serve results of a
+# previous index (e.g. the retrieval cache) are disabled.
+_local_index_generations: dict[str, bytes] = {}
+
+
+def _index_generation_key(index_name: str) -> str:
+    # Valid as a key of every shared store (`LocalFileStore` keys are paths).
+    return f"{INDEX_GENERATION_PREFIX}/{index_name}"
+
+
+def get_index_generation(index_name: str) -> str:
+    """Return the current generation of an index ("0" if it was never bumped)."""
+    key = _index_generation_key(index_name)
+    store = _get_generation_store()
+    value = (
+        store.mget([key])[0] if store is not None else _local_index_generations.get(key)
+    )
+    return value.decode() if value is not None else "0"
+
+
+async def aget_index_generation(index_name: str) -> str:
+    """Async version of `get_index_generation`."""
+    key = _index_generation_key(index_name)
+    store = _get_generation_store()
+    value = (
+        (await store.amget([key]))[0]
+        if store is not None
+        else _local_index_generations.get(key)
+    )
+    return value.decode() if value is not None else "0"
+
+
+def bump_index_generation(index_name: str) -> str:
+    """Mark an index as changed, invalidating every cache derived from it."""
+    key = _index_generation_key(index_name)
+    generation = str(time.time_ns())
+    store = _get_generation_store()
+    if store is not None:
+        store.mset([(key, generation.encode())])
+    else:
+        _local_index_generations[key] = generation.encode()
+    return generation
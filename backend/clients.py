@@ -0,0 +1,312 @@
+"""Process-wide clients shared across graph runs.
+
+Opening a Weaviate connection costs an HTTP readiness probe plus a gRPC channel
+handshake. The retrieval nodes run many times per user question, so instead of
+connecting on every call they borrow a client from a pool that is connected
+lazily, health-checked periodically, re-established after connection failures
+and closed when the process exits.
+
+Two pools are provided: `weaviate_pool` for synchronous code (ingestion, scripts)
+and `async_weaviate_pool`, used by the async graph nodes so that concurrent
+retrievals share one event loop instead of blocking it or occupying threads.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+from urllib.parse import urlparse
+
+import weaviate
+from weaviate import WeaviateAsyncClient, WeaviateClient
+from weaviate.exceptions import WeaviateBaseError
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SECONDS = 30.0
+
+
+def _is_local_weaviate(weaviate_url: str) -> bool:
+    return "localhost" in weaviate_url or "127.0.0.1" in weaviate_url
+
+
+def _weaviate_connection_args(
+    weaviate_url: Optional[str], api_key: Optional[str]
+) -> tuple[bool, dict]:
+    """Return whether the instance is local, and the matching connection args."""
+    weaviate_url = weaviate_url or os.environ["WEAVIATE_URL"]
+    if _is_local_weaviate(weaviate_url):
+        # Extract host and port from URL (e.g., "http://localhost:8088" -> host="localhost", port=8088)
+        parsed = urlparse(weaviate_url)
+        host = parsed.hostname or "localhost"
+        port = parsed.port or 8080
+        logger.info(f"Connecting to LOCAL Weaviate at {host}:{port}")
+        return True, {"host": host, "port": port}
+
+    logger.info(f"Connecting to Weaviate CLOUD at {weaviate_url}")
+    return False, {
+        "cluster_url": weaviate_url,
+        "auth_credentials": weaviate.classes.init.Auth.api_key(
+            api_key or os.environ.get("WEAVIATE_API_KEY", "not_provided")
+        ),
+        "skip_init_checks": True,
+    }
+
+
+def connect_weaviate_client(
+    weaviate_url: Optional[str] = None, api_key: Optional[str] = None
+) -> WeaviateClient:
+    """Connect to Weaviate, auto-detecting a local (Docker) or cloud instance.
+
+    Args:
+        weaviate_url (Optional[str]): URL of the instance. Defaults to the
+            ``WEAVIATE_URL`` environment variable.
+        api_key (Optional[str]): API key for Weaviate Cloud. Defaults to the
+            ``WEAVIATE_API_KEY`` environment variable.
+
+    Returns:
+        WeaviateClient: A connected client.
+    """
+    is_local, connection_args = _weaviate_connection_args(weaviate_url, api_key)
+    if is_local:
+        return weaviate.connect_to_local(**connection_args)
+    return weaviate.connect_to_weaviate_cloud(**connection_args)
+
+
+async def connect_async_weaviate_client(
+    weaviate_url: Optional[str] = None, api_key: Optional[str] = None
+) -> WeaviateAsyncClient:
+    """Async counterpart of `connect_weaviate_client`.
+
+    Returns:
+        WeaviateAsyncClient: A connected client bound to the running event loop.
+    """
+    is_local, connection_args = _weaviate_connection_args(weaviate_url, api_key)
+    if is_local:
+        client = weaviate.use_async_with_local(**connection_args)
+    else:
+        client = weaviate.use_async_with_weaviate_cloud(**connection_args)
+    await client.connect()
+    return client
+
+
+class WeaviateClientPool:
+    """A lazily connected Weaviate client shared by every caller in the process.
+
+    The client is created on first use. When it has not been checked for
+    ``health_check_interval`` seconds, the next borrower probes ``is_ready()``
+    and transparently reconnects if the probe fails. A connection error raised
+    while a client is borrowed drops it so that the next borrower reconnects.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], WeaviateClient] = connect_weaviate_client,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+    ) -> None:
+        self._connect = connect
+        self._health_check_interval = health_check_interval
+        self._client: Optional[WeaviateClient] = None
+        self._last_health_check = 0.0
+        self._lock = threading.Lock()
+
+    def _is_healthy(self, client: WeaviateClient) -> bool:
+        try:
+            return client.is_connected() and client.is_ready()
+        except WeaviateBaseError:
+            return False
+
+    def get(self) -> WeaviateClient:
+        """Return the shared client, connecting or reconnecting if needed."""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._client is not None
+                and now - self._last_health_check > self._health_check_interval
+            ):
+                if not self._is_healthy(self._client):
+                    logger.warning("Pooled Weaviate client is unhealthy, reconnecting")
+                    self._close_client()
+                self._last_health_check = now
+
+            if self._client is None:
+                self._client = self._connect()
+                self._last_health_check = now
+            return self._client
+
+    @contextmanager
+    def borrow(self) -> Iterator[WeaviateClient]:
+        """Borrow the shared client for the duration of a ``with`` block.
+
+        The client is not closed on exit; it is only dropped if the block raises a
+        Weaviate error, so that the next borrower gets a fresh connection.
+        """
+        client = self.get()
+        try:
+            yield client
+        except WeaviateBaseError:
+            self.invalidate(client)
+            raise
+
+    def invalidate(self, client: Optional[WeaviateClient] = None) -> None:
+        """Drop the pooled client (only if it is still ``client``, when given)."""
+        with self._lock:
+            if client is None or client is self._client:
+                self._close_client()
+
+    def close(self) -> None:
+        """Close the pooled client. A later ``get()`` reconnects."""
+        self.invalidate()
+
+    def _close_client(self) -> None:
+        if self._client is None:
+            return
+        try:
+            self._client.close()
+        except Exception:
+            logger.exception("Failed to close pooled Weaviate client")
+        self._client = None
+
+
+@dataclass
+class _LoopClient:
+    """The pooled client of an event loop."""
+
+    lock: asyncio.Lock
+    client: Optional[WeaviateAsyncClient] = None
+    last_health_check: float = 0.0
+
+
+class AsyncWeaviateClientPool:
+    """Async counterpart of `WeaviateClientPool`.
+
+    An async client is bound to the event loop it was connected on, so the pool
+    keeps one client per loop (e.g. the server loop and the loops of worker
+    threads each get their own). The client of a loop is closed once that loop
+    is closed: on the next use of the pool from another loop, or at exit.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[
+            [], Awaitable[WeaviateAsyncClient]
+        ] = connect_async_weaviate_client,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL_SECONDS,
+    ) -> None:
+        self._connect = connect
+        self._health_check_interval = health_check_interval
+        self._clients: dict[asyncio.AbstractEventLoop, _LoopClient] = {}
+        self._clients_lock = threading.Lock()
+
+    async def _is_healthy(self, client: WeaviateAsyncClient) -> bool:
+        try:
+            return client.is_connected() and await client.is_ready()
+        except WeaviateBaseError:
+            return False
+
+    async def _loop_client(self) -> _LoopClient:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            closed = [other for other in self._clients if other.is_closed()]
+            released = [self._clients.pop(other).client for other in closed]
+            if loop not in self._clients:
+                self._clients[loop] = _LoopClient(asyncio.Lock())
+            loop_client = self._clients[loop]
+        for client in released:
+            if client is not None:
+                # Its loop is closed (e.g. by ``asyncio.run``): close what can be
+                # closed from this one.
+                await self._close(client)
+        return loop_client
+
+    async def get(self) -> WeaviateAsyncClient:
+        """Return the client of the running loop, connecting or reconnecting if needed."""
+        loop_client = await self._loop_client()
+        async with loop_client.lock:
+            now = time.monotonic()
+            if (
+                loop_client.client is not None
+                and now - loop_client.last_health_check > self._health_check_interval
+            ):
+                if not await self._is_healthy(loop_client.client):
+                    logger.warning("Pooled Weaviate client is unhealthy, reconnecting")
+                    await self._close(loop_client.client)
+                    loop_client.client = None
+                loop_client.last_health_check = now
+
+            if loop_client.client is None:
+                loop_client.client = await self._connect()
+                loop_client.last_health_check = now
+            return loop_client.client
+
+    @asynccontextmanager
+    async def borrow(self) -> AsyncIterator[WeaviateAsyncClient]:
+        """Borrow the shared client for the duration of an ``async with`` block."""
+        client = await self.get()
+        try:
+            yield client
+        except WeaviateBaseError:
+            await self.invalidate(client)
+            raise
+
+    async def invalidate(self, client: Optional[WeaviateAsyncClient] = None) -> None:
+        """Drop the client of the running loop (only if it is still ``client``, when given)."""
+        loop_client = await self._loop_client()
+        async with loop_client.lock:
+            if loop_client.client is not None and client in (None, loop_client.client):
+                await self._close(loop_client.client)
+                loop_client.client = None
+
+    async def close(self) -> None:
+        """Close the client of the running loop. A later ``get()`` reconnects."""
+        await self.invalidate()
+
+    def close_detached(self) -> None:
+        """Close every pooled client from outside any running event loop (e.g. at exit)."""
+        with self._clients_lock:
+            clients = [
+                (loop, loop_client.client)
+                for loop, loop_client in self._clients.items()
+                if loop_client.client is not None
+            ]
+            self._clients.clear()
+        for loop, client in clients:
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(self._close(client))
+            else:
+                asyncio.run(self._close(client))
+
+    @staticmethod
+    async def _close(client: WeaviateAsyncClient) -> None:
+        try:
+            await client.close()
+        except Exception:
+            logger.exception("Failed to close pooled Weaviate client")
+
+
+weaviate_pool = WeaviateClientPool()
+async_weaviate_pool = AsyncWeaviateClientPool()
+
+
+def close_clients() -> None:
+    """Close every process-wide client. Registered to run at interpreter exit.
+
+    Servers that own an event loop should rather call `aclose_clients` from their
+    shutdown hook, while the loop of the async clients is still running.
+    """
+    weaviate_pool.close()
+    async_weaviate_pool.close_detached()
+
+
+async def aclose_clients() -> None:
+    """Close the sync client and the async client of the running loop."""
+    weaviate_pool.close()
+    await async_weaviate_pool.close()
+
+
+atexit.register(close_clients)
@@ -49,17 +49,26 @@ class BaseConfiguration:
     )
 
     retriever_provider: Annotated[
-        Literal["weaviate"],
+        Literal["weaviate", "local"],
         {"__template_metadata__": {"kind": "retriever"}},
     ] = field(
         default="weaviate",
-        metadata={"description": "The vector store provider to use for retrieval."},
+        metadata={
+            "description": "The vector store provider to use for retrieval. 'local' searches an in-process snapshot of the index, loaded from LOCAL_INDEX_PATH."
+        },
     )
 
     search_kwargs: dict[str, Any] = field(
         default_factory=dict,
         metadata={
-            "description": "Additional keyword arguments to pass to the search function of the retriever."
+            "description": 'Additional keyword arguments to pass to the search function of the retriever. Searches are hybrid (BM25 keywords + vectors): alpha weights the vector results (1 is a pure vector search), and fusion_type "ranked" fuses both result lists by reciprocal rank fusion, e.g. {"alpha": 0.5, "fusion_type": "ranked", "query_properties": ["text"]}. The local provider always uses rank fusion and defaults to alpha=1.'
+        },
+    )
+
+    retrieval_cache_ttl: int = field(
+        default=0,
+        metadata={
+            "description": "Seconds for which search results are cached, keyed by index, normalized query and search_kwargs. Entries are invalidated when ingestion changes the index, which requires CACHE_REDIS_URL or CACHE_DIR: without a shared store, the cache is disabled. 0 disables the cache."
         },
     )
 
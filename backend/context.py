@@ -0,0 +1,131 @@
+"""Token-budgeted packing of documents into the response prompt.
+
+The ingestion splitter cuts pages into chunks overlapping by up to
+``CHUNK_OVERLAP`` characters, so neighbouring chunks of a page that are both
+retrieved repeat some text. `pack_context` removes those overlaps, then keeps
+documents in ranked order while they fit in the token budget of the response
+model (see `get_context_budget`), which makes the prompt size predictable.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+
+from backend.utils import format_docs
+
+logger = logging.getLogger(__name__)
+
+# Must match the text splitter of backend/ingest.py.
+CHUNK_OVERLAP = 200
+# Overlaps shorter than this are treated as coincidental.
+MIN_OVERLAP = 20
+
+DEFAULT_CONTEXT_BUDGET = 20_000
+# Context token budgets by response model name, or by prefix of the name.
+DEFAULT_CONTEXT_BUDGETS: dict[str, int] = {
+    "groq/": 4_000,
+}
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("tiktoken is unavailable, estimating token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken (cl100k_base), or estimate them as len / 4.
+
+    Response models use different tokenizers; cl100k_base is a close enough
+    approximation to size a budget.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def get_context_budget(
+    model: str, budgets: dict[str, int], default: int = DEFAULT_CONTEXT_BUDGET
+) -> int:
+    """Return the budget of a model: exact match, else longest matching prefix."""
+    if model in budgets:
+        return budgets[model]
+    prefixes = [prefix for prefix in budgets if model.startswith(prefix)]
+    return budgets[max(prefixes, key=len)] if prefixes else default
+
+
+def _overlap(before: str, after: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``before`` that is a prefix of ``after``."""
+    for size in range(min(max_overlap, len(before), len(after)), MIN_OVERLAP - 1, -1):
+        if before.endswith(after[:size]):
+            return size
+    return 0
+
+
+def dedupe_overlaps(
+    documents: list[Document], max_overlap: int = CHUNK_OVERLAP
+) -> list[Document]:
+    """Drop duplicate documents and trim text overlapping with earlier documents.
+
+    Documents are compared with the earlier documents of the same source: an
+    exact duplicate is dropped, and a prefix (or suffix) repeating the end (or
+    start) of an earlier chunk is removed. Trimmed documents are copies.
+    """
+    kept: list[Document] = []
+    by_source: dict[str, list[str]] = {}
+    for document in documents:
+        source = document.metadata.get("source") or ""
+        earlier = by_source.setdefault(source, [])
+        text = document.page_content
+        if text in earlier:
+            continue
+        for other in earlier:
+            text = text[_overlap(other, text, max_overlap) :]
+            end = _overlap(text, other, max_overlap)
+            text = text[: len(text) - end]
+        earlier.append(document.page_content)
+        if not text.strip():
+            continue
+        if text != document.page_content:
+            document = Document(page_content=text, metadata=dict(document.metadata))
+        kept.append(document)
+    return kept
+
+
+def pack_context(
+    documents: list[Document],
+    budget: int,
+    count: Callable[[str], int] = count_tokens,
+    max_overlap: Optional[int] = CHUNK_OVERLAP,
+) -> list[Document]:
+    """Select documents, in ranked order, whose formatted size fits in ``budget``.
+
+    Args:
+        documents (list[Document]): Documents, most relevant first.
+        budget (int): Maximum number of tokens of the formatted documents.
+        count (Callable[[str], int]): Token counter.
+        max_overlap (Optional[int]): Maximum overlap between chunks of a page to
+            remove. None disables de-duplication.
+
+    Returns:
+        list[Document]: The selected documents. A document that does not fit is
+            skipped and smaller documents ranked after it can still be selected.
+    """
+    if max_overlap is not None:
+        documents = dedupe_overlaps(documents, max_overlap)
+    selected: list[Document] = []
+    remaining = budget
+    for document in documents:
+        tokens = count(format_docs([document]))
+        if tokens <= remaining:
+            selected.append(document)
+            remaining -= tokens
+    return selected
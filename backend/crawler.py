@@ -0,0 +1,588 @@
+"""Asynchronous sitemap crawler used by ingestion.
+
+`SitemapLoader` fetches the pages of one site at a time, so ingesting several
+documentation sites takes the sum of their crawl times. `Crawler` fetches the
+pages of all sites concurrently on one event loop and one HTTP session
+(keep-alive connections are reused across pages), with:
+
+- a bound on concurrent requests per host, so that no site is hammered;
+- retries with exponential backoff (and ``Retry-After``) on connection errors,
+  timeouts, 429 and 5xx responses.
+
+Like `SitemapLoader`, a page that fails with a client error (e.g. a 404 for a
+page removed since the sitemap was generated) is logged and skipped, and its
+record is removed from the store. A page that still fails after the retries of
+a transient error fails the crawl.
+
+Pages are parsed as they arrive into documents with the same content and
+metadata as `SitemapLoader` with the same parsing and metadata functions, then
+optionally transformed (e.g. split into chunks). Parsing and transforming are
+CPU-bound: with ``parse_workers``, they run in a pool of processes, so that
+they scale with cores and do not block the event loop fetching pages.
+
+Crawls are incremental when the crawler is given a `ByteStore`. For each page,
+the store records its sitemap ``lastmod``, ``ETag``, ``Last-Modified``, a hash
+of its content and its transformed documents. On the next crawl, a page whose
+``lastmod`` did not change is not requested; other pages are requested with
+conditional headers, and are only parsed and transformed again if the server
+returns new content. Unchanged pages are returned from the store, so a crawl
+always returns the documents of every page (as required by indexing with
+``cleanup="full"``).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import queue
+import random
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+from langchain_core.documents import Document
+from langchain_core.stores import ByteStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_TIMEOUT_SECONDS = 60.0
+MAX_SITEMAP_DEPTH = 10
+DEFAULT_BATCH_PAGES = 32
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+USER_AGENT = "chat-langchain-ingest (+https://github.com/langchain-ai/chat-langchain)"
+SITEMAP_TAGS = ["loc", "lastmod", "changefreq", "priority"]
+
+
+@dataclass
+class Response:
+    """A fetched URL. ``text`` is empty for a 304 (Not Modified) response."""
+
+    status: int
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+@dataclass
+class Site:
+    """A documentation site crawled from its sitemap.
+
+    Args:
+        sitemap_url (str): URL of the sitemap (or sitemap index).
+        parsing_function (Callable[[BeautifulSoup], str]): Extracts the text of a page.
+        meta_function (Callable[[dict, BeautifulSoup], dict]): Builds the metadata of
+            a page from its sitemap entry ('loc', 'lastmod', ...) and its soup.
+        filter_urls (Optional[list[str]]): Regular expressions, one of which page
+            URLs must match (from their start). All pages are crawled if None.
+        parse_only (Optional[SoupStrainer]): Restricts the parsed elements of pages.
+    """
+
+    sitemap_url: str
+    parsing_function: Callable[[BeautifulSoup], str]
+    meta_function: Callable[[dict, BeautifulSoup], dict]
+    filter_urls: Optional[list[str]] = None
+    parse_only: Optional[SoupStrainer] = None
+
+    def allows(self, url: str) -> bool:
+        """Return whether a URL of the sitemap is crawled.
+
+        Like `SitemapLoader`, only URLs on the domain of the sitemap are crawled.
+        """
+        sitemap = urlparse(self.sitemap_url)
+        page = urlparse(url)
+        if (page.scheme, page.netloc) != (sitemap.scheme, sitemap.netloc):
+            return False
+        return self.filter_urls is None or any(
+            re.match(pattern, url) for pattern in self.filter_urls
+        )
+
+
+class Crawler:
+    """Fetches pages over a shared HTTP session, bounded per host, with retries.
+
+    Use as an async context manager, which opens and closes the session.
+
+    Args:
+        max_connections_per_host (int): Maximum concurrent requests per host.
+        max_retries (int): Maximum retries of a request after a transient error.
+        backoff_seconds (float): Delay before the first retry, doubled for each
+            further retry (with jitter).
+        timeout_seconds (float): Total timeout of a request.
+        store (Optional[ByteStore]): Records of the pages of previous crawls. If
+            set, crawls are incremental.
+        transform (Optional[Callable[[list[Document]], list[Document]]]): Applied
+            to the document of each new or changed page, e.g. to split it. The
+            transformed documents are the ones returned and recorded.
+        refresh (bool): Crawl every page again, ignoring (but updating) the records
+            of the store, e.g. after a change of the parsing functions.
+        parse_workers (int): Number of processes parsing and transforming pages.
+            Pages are processed on the event loop if 0. The sites and
+            ``transform`` are sent to the processes, so they must be picklable
+            (module-level functions, `functools.partial`...).
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        store: Optional[ByteStore] = None,
+        transform: Optional[Callable[[list[Document]], list[Document]]] = None,
+        refresh: bool = False,
+        parse_workers: int = 0,
+    ) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.store = store
+        self.transform = transform
+        self.refresh = refresh
+        self.parse_workers = parse_workers
+        # Pages by outcome: "lastmod" (not requested), "not_modified" (304),
+        # "same_content", "changed" and "skipped" (client error).
+        self.stats: Counter[str] = Counter()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def __aenter__(self) -> "Crawler":
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            headers={"User-Agent": USER_AGENT},
+        )
+        if self.parse_workers > 0:
+            # Not forked: crawls may run in a thread (see `iter_sites`).
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown, cancel_futures=True)
+            self._executor = None
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(
+                self.max_connections_per_host
+            )
+        return self._host_semaphores[host]
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        delay = self.backoff_seconds * 2**attempt
+        return delay + random.uniform(0, delay / 2)
+
+    async def request(
+        self, url: str, headers: Optional[dict[str, str]] = None
+    ) -> Response:
+        """Request a URL, retrying transient errors.
+
+        Raises:
+            aiohttp.ClientError: If the request still fails after the retries, or
+                fails with a non-transient status (e.g. 404).
+        """
+        if self._session is None:
+            raise RuntimeError("Crawler must be used as an async context manager")
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._host_semaphore(url):
+                    async with self._session.get(url, headers=headers) as response:
+                        if (
+                            response.status in RETRY_STATUSES
+                            and attempt < self.max_retries
+                        ):
+                            retry_after = response.headers.get("Retry-After")
+                            error = f"HTTP {response.status}"
+                        else:
+                            response.raise_for_status()
+                            return Response(
+                                status=response.status,
+                                text=""
+                                if response.status == 304
+                                else await response.text(),
+                                etag=response.headers.get("ETag"),
+                                last_modified=response.headers.get("Last-Modified"),
+                            )
+            except (
+                aiohttp.ClientConnectionError,
+                aiohttp.ClientPayloadError,
+                asyncio.TimeoutError,
+            ) as e:
+                if attempt == self.max_retries:
+                    raise
+                error = repr(e)
+            delay = self._retry_delay(attempt, retry_after)
+            logger.info(f"Retrying {url} in {delay:.1f}s after {error}")
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def fetch(self, url: str) -> str:
+        """Return the decoded body of a URL (see `request`)."""
+        return (await self.request(url)).text
+
+    async def sitemap_entries(self, site: Site) -> list[dict]:
+        """Return the entries ('loc', 'lastmod', ...) of the pages of a site.
+
+        Nested sitemaps of a sitemap index are fetched concurrently.
+        """
+
+        async def entries(url: str, depth: int) -> list[dict]:
+            if depth >= MAX_SITEMAP_DEPTH:
+                return []
+            soup = BeautifulSoup(await self.fetch(url), "xml")
+            pages = []
+            for element in soup.find_all("url"):
+                loc = element.find("loc")
+                if not loc or not site.allows(loc.text.strip()):
+                    continue
+                pages.append(
+                    {
+                        tag: prop.text.strip()
+                        for tag in SITEMAP_TAGS
+                        if (prop := element.find(tag))
+                    }
+                )
+            nested = [
+                loc.text.strip()
+                for sitemap in soup.find_all("sitemap")
+                if (loc := sitemap.find("loc"))
+            ]
+            for nested_pages in await asyncio.gather(
+                *(entries(nested_url, depth + 1) for nested_url in nested)
+            ):
+                pages.extend(nested_pages)
+            return pages
+
+        return await entries(site.sitemap_url, 0)
+
+    async def process(self, site: Site, entry: dict, html: str) -> list[Document]:
+        """Parse a page and apply `transform`, in the process pool if there is one."""
+        if self._executor is None:
+            return process_page(site, entry, html, self.transform)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, process_page, site, entry, html, self.transform
+        )
+
+    async def load_page(
+        self, site: Site, entry: dict, record: Optional[dict]
+    ) -> Optional[dict]:
+        """Return the record of a page (see `load_site`), reusing ``record`` if unchanged.
+
+        Returns None if the page fails with a client error (4xx other than 429).
+        """
+        try:
+            return await self._load_page(site, entry, record)
+        except aiohttp.ClientResponseError as e:
+            if not 400 <= e.status < 500 or e.status in RETRY_STATUSES:
+                raise
+            logger.warning(f"Skipping {entry['loc']}: HTTP {e.status}")
+            self.stats["skipped"] += 1
+            return None
+
+    async def _load_page(self, site: Site, entry: dict, record: Optional[dict]) -> dict:
+        if record is not None:
+            if entry.get("lastmod") and entry.get("lastmod") == record["lastmod"]:
+                self.stats["lastmod"] += 1
+                return _refresh(record, entry)
+            headers = {}
+            if record["etag"]:
+                headers["If-None-Match"] = record["etag"]
+            if record["last_modified"]:
+                headers["If-Modified-Since"] = record["last_modified"]
+            response = await self.request(entry["loc"], headers)
+        else:
+            response = await self.request(entry["loc"])
+
+        if record is not None and response.status == 304:
+            self.stats["not_modified"] += 1
+            return _refresh(record, entry, response)
+        content_hash = hashlib.sha256(response.text.encode()).hexdigest()
+        if record is not None and record["content_hash"] == content_hash:
+            self.stats["same_content"] += 1
+            return _refresh(record, entry, response)
+        self.stats["changed"] += 1
+        return {
+            "entry": entry,
+            "lastmod": entry.get("lastmod"),
+            "etag": response.etag,
+            "last_modified": response.last_modified,
+            "content_hash": content_hash,
+            "documents": [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in await self.process(site, entry, response.text)
+            ],
+        }
+
+    async def _load_batch(self, site: Site, entries: list[dict]) -> list[Document]:
+        """Load a batch of pages concurrently, reading and writing their records."""
+        urls = [entry["loc"] for entry in entries]
+        # Sync store methods in a thread: stores such as SQLStore only support
+        # async calls with an async engine.
+        previous = (
+            await asyncio.to_thread(self.store.mget, urls)
+            if self.store is not None and not self.refresh
+            else [None] * len(urls)
+        )
+        records = await asyncio.gather(
+            *(
+                self.load_page(site, entry, json.loads(data) if data else None)
+                for entry, data in zip(entries, previous)
+            )
+        )
+        if self.store is not None:
+            await asyncio.to_thread(
+                self.store.mset,
+                [
+                    (url, json.dumps(record).encode())
+                    for url, record in zip(urls, records)
+                    if record is not None
+                ],
+            )
+            if skipped := [url for url, record in zip(urls, records) if record is None]:
+                await asyncio.to_thread(self.store.mdelete, skipped)
+        return [
+            Document(**document)
+            for record in records
+            if record is not None
+            for document in record["documents"]
+        ]
+
+    async def aiter_site(
+        self, site: Site, batch_pages: int = DEFAULT_BATCH_PAGES
+    ) -> AsyncIterator[list[Document]]:
+        """Yield the documents of the pages of a site, by batches of pages.
+
+        Pages are yielded in sitemap order. The next batch is loaded while the
+        current one is consumed, but not further: at most two batches of pages
+        are held in memory.
+
+        Args:
+            site (Site): The site to crawl.
+            batch_pages (int): Number of pages per batch.
+        """
+        entries = await self.sitemap_entries(site)
+        logger.info(f"Crawling {len(entries)} pages of {site.sitemap_url}")
+        batches = [
+            entries[start : start + batch_pages]
+            for start in range(0, len(entries), batch_pages)
+        ]
+        next_batch = (
+            asyncio.create_task(self._load_batch(site, batches[0])) if batches else None
+        )
+        try:
+            for i in range(len(batches)):
+                documents = await next_batch
+                next_batch = (
+                    asyncio.create_task(self._load_batch(site, batches[i + 1]))
+                    if i + 1 < len(batches)
+                    else None
+                )
+                yield documents
+        finally:
+            if next_batch is not None:
+                next_batch.cancel()
+        logger.info(f"Crawled {len(entries)} pages of {site.sitemap_url}")
+
+    async def load_site(self, site: Site) -> list[Document]:
+        """Fetch and parse every page of a site, in sitemap order.
+
+        With a store, unchanged pages are returned from the store, and the
+        records of the crawled pages are updated.
+        """
+        return [
+            document
+            async for documents in self.aiter_site(site)
+            for document in documents
+        ]
+
+
+def parse_page(site: Site, entry: dict, html: str) -> Document:
+    """Parse a page into a document, like `SitemapLoader`."""
+    soup = BeautifulSoup(html, "lxml", parse_only=site.parse_only)
+    return Document(
+        page_content=site.parsing_function(soup),
+        metadata=site.meta_function(entry, soup),
+    )
+
+
+def process_page(
+    site: Site,
+    entry: dict,
+    html: str,
+    transform: Optional[Callable[[list[Document]], list[Document]]] = None,
+) -> list[Document]:
+    """Parse a page, then apply ``transform``. Run in the processes of `Crawler`."""
+    documents = [parse_page(site, entry, html)]
+    return transform(documents) if transform else documents
+
+
+def _refresh(record: dict, entry: dict, response: Optional[Response] = None) -> dict:
+    """Update the record of an unchanged page with its new sitemap entry and headers.
+
+    Sitemap fields of the recorded documents are updated, so that they match the
+    documents of a full crawl.
+    """
+    previous = record["entry"]
+    documents = [
+        {
+            "page_content": document["page_content"],
+            "metadata": {
+                **document["metadata"],
+                **{
+                    key: value
+                    for key, value in entry.items()
+                    if document["metadata"].get(key) == previous.get(key)
+                },
+            },
+        }
+        for document in record["documents"]
+    ]
+    updated = {
+        **record,
+        "entry": entry,
+        "lastmod": entry.get("lastmod"),
+        "documents": documents,
+    }
+    if response is not None:
+        updated["etag"] = response.etag or record["etag"]
+        updated["last_modified"] = response.last_modified or record["last_modified"]
+    return updated
+
+
+async def aload_sites(sites: list[Site], **crawler_kwargs: Any) -> list[Document]:
+    """Crawl sites concurrently and return their documents, site by site.
+
+    Args:
+        sites (list[Site]): The sites to crawl.
+        **crawler_kwargs: Arguments of `Crawler`.
+    """
+    async with Crawler(**crawler_kwargs) as crawler:
+        results = await asyncio.gather(*(crawler.load_site(site) for site in sites))
+    if crawler.store is not None:
+        logger.info(f"Pages by crawl outcome: {dict(crawler.stats)}")
+    return [document for documents in results for document in documents]
+
+
+async def aiter_sites(
+    sites: list[Site], batch_pages: int = DEFAULT_BATCH_PAGES, **crawler_kwargs: Any
+) -> AsyncIterator[list[Document]]:
+    """Crawl sites concurrently, yielding batches of documents as they are loaded.
+
+    Each site loads at most one batch ahead of its consumer (see
+    `Crawler.aiter_site`), so memory is bounded by the batch size rather than by
+    the size of the sites. Batches of different sites are interleaved. An error
+    of any site is raised to the consumer, after which the crawl is stopped.
+
+    Args:
+        sites (list[Site]): The sites to crawl.
+        batch_pages (int): Number of pages per batch.
+        **crawler_kwargs: Arguments of `Crawler`.
+    """
+    done = object()
+    pages: asyncio.Queue = asyncio.Queue(maxsize=len(sites))
+
+    async def produce(crawler: Crawler, site: Site) -> None:
+        try:
+            async for documents in crawler.aiter_site(site, batch_pages):
+                await pages.put(documents)
+        except Exception as e:
+            await pages.put(e)
+        else:
+            await pages.put(done)
+
+    async with Crawler(**crawler_kwargs) as crawler:
+        producers = [asyncio.create_task(produce(crawler, site)) for site in sites]
+        try:
+            remaining = len(producers)
+            while remaining:
+                item = await pages.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+    if crawler.store is not None:
+        logger.info(f"Pages by crawl outcome: {dict(crawler.stats)}")
+
+
+def iter_sites(
+    sites: list[Site], max_pending_batches: int = 2, **kwargs: Any
+) -> Iterator[Document]:
+    """Synchronous version of `aiter_sites`, yielding documents one by one.
+
+    The crawl runs on an event loop in a background thread, which is paused
+    while ``max_pending_batches`` batches wait to be consumed. Errors of the
+    crawl are raised to the consumer; a consumer that stops early stops the crawl.
+
+    Args:
+        sites (list[Site]): The sites to crawl.
+        max_pending_batches (int): Maximum number of crawled batches not consumed yet.
+        **kwargs: Arguments of `aiter_sites`.
+    """
+    done = object()
+    batches: queue.Queue = queue.Queue(maxsize=max_pending_batches)
+    stopped = threading.Event()
+
+    async def put(item: Any) -> None:
+        # Polls rather than blocking a thread, so that the crawl can be stopped.
+        while not stopped.is_set():
+            try:
+                batches.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.05)
+
+    async def produce() -> None:
+        try:
+            async with aclosing(aiter_sites(sites, **kwargs)) as crawl:
+                async for documents in crawl:
+                    await put(documents)
+                    if stopped.is_set():
+                        break
+        except Exception as e:
+            await put(e)
+        else:
+            await put(done)
+
+    thread = threading.Thread(target=asyncio.run, args=(produce(),), daemon=True)
+    thread.start()
+    try:
+        while (item := batches.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+    finally:
+        stopped.set()
+        thread.join()
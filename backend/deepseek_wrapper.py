@@ -21,6 +21,8 @@ from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
 from langchain_core.pydantic_v1 import BaseModel
 from langchain_deepseek import ChatDeepSeek
 
+from backend.utils import cache_per_event_loop
+
 
 # ===========================================================================
 # PNL Anti-Hallucination Prompt (Documentation Mirror Mode)
@@ -268,6 +270,17 @@ def extract_json_from_response(content: str) -> str:
     raise ValueError(f"No valid JSON found in response: {content[:200]}...")
 
 
+@cache_per_event_loop
+def _load_deepseek_reasoner() -> ChatDeepSeek:
+    """deepseek-reasoner in JSON mode, created once per event loop."""
+    return ChatDeepSeek(
+        model="deepseek-reasoner",
+        response_format={'type': 'json_object'},  # Critical for DeepSeek
+        temperature=0,
+        max_tokens=64000  # deepseek-reasoner max (vs 8K for deepseek-chat)
+    )
+
+
 def load_deepseek_for_structured_output(
     model_name: str,
     schema: Optional[Type[BaseModel]] = None
@@ -306,17 +319,8 @@ def load_deepseek_for_structured_output(
     # ALWAYS use deepseek-reasoner (project requirement)
     # Reasoning: deepseek-reasoner has 8x higher output limits (64K vs 8K)
     # and superior quality for complex reasoning tasks
-    model_id = "deepseek-reasoner"
-
-    # Create base model with JSON mode and maximum output tokens
-    model = ChatDeepSeek(
-        model=model_id,
-        response_format={'type': 'json_object'},  # Critical for DeepSeek
-        temperature=0,
-        max_tokens=64000  # deepseek-reasoner max (vs 8K for deepseek-chat)
-    )
-
-    return model
+    # The model (JSON mode, maximum output tokens) is created once per event loop.
+    return _load_deepseek_reasoner()
 
 
 # Patch for generate_queries in researcher_graph/graph.py
@@ -1,6 +1,199 @@
+import hashlib
+import os
+import re
+import unicodedata
+from array import array
+from typing import Optional
+
 from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
 from langchain_openai import OpenAIEmbeddings
 
+from backend.cache import LRUCache
+
+# ~10k text-embedding-3-small vectors (1536 float32 = 6 KiB each).
+DEFAULT_EMBEDDING_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
 
 def get_embeddings_model() -> Embeddings:
     return OpenAIEmbeddings(model="text-embedding-3-small", chunk_size=200)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache lookups (unicode form and whitespace)."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _encode(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(data: bytes) -> list[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-memory LRU and an optional persistent tier.
+
+    Entries are keyed by (model name, normalized text) and stored as float32
+    bytes. The in-memory tier is bounded by the total size of the stored vectors;
+    the optional `ByteStore` tier (Redis or local files) is shared across
+    processes and restarts.
+
+    Queries and documents share cache entries, which assumes a symmetric encoder
+    (true for OpenAI embeddings, where ``embed_query`` embeds the text as-is).
+
+    Hit and miss counters are available through `stats()`.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_bytes: int = DEFAULT_EMBEDDING_CACHE_MAX_BYTES,
+        store: Optional[ByteStore] = None,
+    ) -> None:
+        self.underlying = underlying
+        self.model_name = model_name
+        self.memory: LRUCache[str, bytes] = LRUCache(max_bytes, sizeof=len)
+        self.store = store
+        self.store_hits = 0
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(
+            f"{self.model_name}\x00{normalize_text(text)}".encode()
+        ).hexdigest()
+        # Valid as a key of every shared store (`LocalFileStore` keys are paths).
+        return f"embedding/{digest}"
+
+    def _lookup(self, keys: list[str]) -> list[Optional[bytes]]:
+        found = [self.memory.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, found) if value is None]
+        if self.store is None or not missing:
+            return found
+        stored = dict(zip(missing, self.store.mget(missing)))
+        return self._promote(keys, found, stored)
+
+    async def _alookup(self, keys: list[str]) -> list[Optional[bytes]]:
+        found = [self.memory.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, found) if value is None]
+        if self.store is None or not missing:
+            return found
+        stored = dict(zip(missing, await self.store.amget(missing)))
+        return self._promote(keys, found, stored)
+
+    def _promote(
+        self,
+        keys: list[str],
+        found: list[Optional[bytes]],
+        stored: dict[str, Optional[bytes]],
+    ) -> list[Optional[bytes]]:
+        for i, key in enumerate(keys):
+            if found[i] is None and (value := stored.get(key)) is not None:
+                self.memory.set(key, value)
+                self.store_hits += 1
+                found[i] = value
+        return found
+
+    def _pending(
+        self, keys: list[str], texts: list[str], found: list[Optional[bytes]]
+    ) -> dict[str, str]:
+        """Map each missing key to one of its texts (duplicates embedded once)."""
+        return {
+            key: text for key, text, value in zip(keys, texts, found) if value is None
+        }
+
+    def _remember(
+        self, keys: list[str], vectors: list[list[float]]
+    ) -> dict[str, bytes]:
+        encoded = {key: _encode(vector) for key, vector in zip(keys, vectors)}
+        for key, value in encoded.items():
+            self.memory.set(key, value)
+        if self.store is not None and encoded:
+            self.store.mset(list(encoded.items()))
+        return encoded
+
+    async def _aremember(
+        self, keys: list[str], vectors: list[list[float]]
+    ) -> dict[str, bytes]:
+        encoded = {key: _encode(vector) for key, vector in zip(keys, vectors)}
+        for key, value in encoded.items():
+            self.memory.set(key, value)
+        if self.store is not None and encoded:
+            await self.store.amset(list(encoded.items()))
+        return encoded
+
+    def _assemble(
+        self,
+        keys: list[str],
+        found: list[Optional[bytes]],
+        computed: dict[str, bytes],
+    ) -> list[list[float]]:
+        # Cached and freshly computed vectors are both returned with float32
+        # precision, so a result does not depend on whether it was a hit.
+        return [
+            _decode(value if value is not None else computed[key])
+            for key, value in zip(keys, found)
+        ]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        pending = self._pending(keys, texts, found)
+        vectors = (
+            self.underlying.embed_documents(list(pending.values())) if pending else []
+        )
+        computed = self._remember(list(pending), vectors)
+        return self._assemble(keys, found, computed)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        found = await self._alookup(keys)
+        pending = self._pending(keys, texts, found)
+        vectors = (
+            await self.underlying.aembed_documents(list(pending.values()))
+            if pending
+            else []
+        )
+        computed = await self._aremember(list(pending), vectors)
+        return self._assemble(keys, found, computed)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        (value,) = self._lookup([key])
+        if value is None:
+            (value,) = self._remember(
+                [key], [self.underlying.embed_query(text)]
+            ).values()
+        return _decode(value)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        (value,) = await self._alookup([key])
+        if value is None:
+            vector = await self.underlying.aembed_query(text)
+            (value,) = (await self._aremember([key], [vector])).values()
+        return _decode(value)
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters for both tiers.
+
+        ``misses`` counts lookups that had to call the embedding model.
+        """
+        memory = self.memory.stats()
+        return {
+            **memory,
+            "store_hits": self.store_hits,
+            "misses": memory["misses"] - self.store_hits,
+        }
+
+
+def get_embedding_cache_max_bytes() -> int:
+    """Size of the in-memory embedding cache, from ``EMBEDDING_CACHE_MAX_BYTES``."""
+    return int(
+        os.environ.get(
+            "EMBEDDING_CACHE_MAX_BYTES", str(DEFAULT_EMBEDDING_CACHE_MAX_BYTES)
+        )
+    )
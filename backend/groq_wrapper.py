@@ -23,6 +23,8 @@ from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 from pydantic import BaseModel
 
+from backend.utils import cache_per_event_loop
+
 
 # ===========================================================================
 # PNL Anti-Hallucination Prompt (Documentation Mirror Mode)
@@ -61,8 +63,9 @@ IF INFORMATION MISSING:
 """
 
 
+@cache_per_event_loop
 def load_groq_model(model_name: str = "gemma2-9b-it") -> BaseChatModel:
-    """Load Groq model for standard chat completion.
+    """Load Groq model for standard chat completion (created once per event loop).
 
     Args:
         model_name: Groq model identifier (default: gemma2-9b-it for ultra-fast inference)
@@ -120,6 +123,16 @@ def load_groq_for_structured_output(
     return model
 
 
+@cache_per_event_loop
+def _load_groq_json_model(model_name: str) -> ChatGroq:
+    """Groq model in JSON mode, created once per event loop."""
+    return ChatGroq(
+        model=model_name,
+        temperature=0,
+        model_kwargs={"response_format": {"type": "json_object"}}
+    )
+
+
 async def generate_queries_groq(
     messages: List[Dict[str, str]],
     model_id: str,
@@ -141,12 +154,8 @@ async def generate_queries_groq(
     else:
         model_name = model_id
 
-    # Create Groq model with JSON mode
-    model = ChatGroq(
-        model=model_name,
-        temperature=0,
-        model_kwargs={"response_format": {"type": "json_object"}}
-    )
+    # Groq model with JSON mode
+    model = _load_groq_json_model(model_name)
 
     # Build schema description
     schema_desc = "{\n"
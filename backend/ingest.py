@@ -1,20 +1,32 @@
 """Load html from files, clean up, split, ingest into Weaviate."""
 
+import asyncio
 import logging
 import os
 import re
-from typing import Optional
+from functools import partial
+from typing import Callable, Iterator, Optional
 
-import weaviate
 from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
-from langchain.document_loaders import SitemapLoader
 from langchain.indexes import SQLRecordManager, index
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.stores import ByteStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
 from langchain_weaviate import WeaviateVectorStore
 
+from backend.cache import bump_index_generation
+from backend.clients import connect_weaviate_client
 from backend.constants import WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+from backend.crawler import (
+    DEFAULT_BATCH_PAGES,
+    DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    Site,
+    aload_sites,
+    iter_sites,
+)
 from backend.embeddings import get_embeddings_model
+from backend.local_index import export_weaviate_collection
 from backend.parser import langchain_docs_extractor
 
 # Load environment variables from .env file
@@ -66,84 +78,142 @@ def simple_extractor(html: str | BeautifulSoup) -> str:
 #########################
 
 
+PAGE_STRAINER = SoupStrainer(name=("article", "title", "html", "lang", "content"))
+
+# NOTE: To be deprecated once LangChain docs are migrated to new site.
+LANGCHAIN_PYTHON_DOCS = Site(
+    "https://python.langchain.com/sitemap.xml",
+    filter_urls=["https://python.langchain.com/"],
+    parsing_function=langchain_docs_extractor,
+    parse_only=PAGE_STRAINER,
+    meta_function=metadata_extractor,
+)
+
 # NOTE: To be deprecated once LangChain docs are migrated to new site.
+LANGCHAIN_JS_DOCS = Site(
+    "https://js.langchain.com/sitemap.xml",
+    parsing_function=simple_extractor,
+    parse_only=PAGE_STRAINER,
+    meta_function=metadata_extractor,
+    filter_urls=["https://js.langchain.com/docs/"],
+)
+
+AGGREGATED_DOCS_SITE = Site(
+    "https://docs.langchain.com/sitemap.xml",
+    parsing_function=simple_extractor,
+    parse_only=PAGE_STRAINER,
+    meta_function=metadata_extractor,
+)
+
+
 def load_langchain_python_docs():
-    return SitemapLoader(
-        "https://python.langchain.com/sitemap.xml",
-        filter_urls=["https://python.langchain.com/"],
-        parsing_function=langchain_docs_extractor,
-        default_parser="lxml",
-        bs_kwargs={
-            "parse_only": SoupStrainer(
-                name=("article", "title", "html", "lang", "content")
-            ),
-        },
-        meta_function=metadata_extractor,
-    ).load()
+    return asyncio.run(aload_sites([LANGCHAIN_PYTHON_DOCS]))
 
 
-# NOTE: To be deprecated once LangChain docs are migrated to new site.
 def load_langchain_js_docs():
-    return SitemapLoader(
-        "https://js.langchain.com/sitemap.xml",
-        parsing_function=simple_extractor,
-        default_parser="lxml",
-        bs_kwargs={
-            "parse_only": SoupStrainer(
-                name=("article", "title", "html", "lang", "content")
-            )
-        },
-        meta_function=metadata_extractor,
-        filter_urls=["https://js.langchain.com/docs/"],
-    ).load()
+    return asyncio.run(aload_sites([LANGCHAIN_JS_DOCS]))
 
 
 def load_aggregated_docs_site():
-    return SitemapLoader(
-        "https://docs.langchain.com/sitemap.xml",
-        parsing_function=simple_extractor,
-        default_parser="lxml",
-        bs_kwargs={
-            "parse_only": SoupStrainer(
-                name=("article", "title", "html", "lang", "content")
+    return asyncio.run(aload_sites([AGGREGATED_DOCS_SITE]))
+
+
+GENERAL_GUIDES_AND_TUTORIALS_SITES = [
+    LANGCHAIN_PYTHON_DOCS,
+    LANGCHAIN_JS_DOCS,
+    AGGREGATED_DOCS_SITE,
+]
+
+
+def _crawler_kwargs(
+    store: Optional[ByteStore],
+    transform: Optional[Callable[[list[Document]], list[Document]]],
+    refresh: bool,
+) -> dict:
+    return {
+        "max_connections_per_host": int(
+            os.environ.get(
+                "INGEST_MAX_CONNECTIONS_PER_HOST", str(DEFAULT_MAX_CONNECTIONS_PER_HOST)
             )
-        },
-        meta_function=metadata_extractor,
-    ).load()
+        ),
+        "store": store,
+        "transform": transform,
+        "refresh": refresh,
+        # Pages are parsed and split in a pool of processes (0 to disable).
+        "parse_workers": int(
+            os.environ.get("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1))
+        ),
+    }
+
+
+def ingest_general_guides_and_tutorials(
+    store: Optional[ByteStore] = None,
+    transform: Optional[Callable[[list[Document]], list[Document]]] = None,
+    refresh: bool = False,
+):
+    # The sites are crawled concurrently: the crawl takes as long as the slowest one.
+    return asyncio.run(
+        aload_sites(
+            GENERAL_GUIDES_AND_TUTORIALS_SITES,
+            **_crawler_kwargs(store, transform, refresh),
+        )
+    )
+
+
+def iter_general_guides_and_tutorials(
+    store: Optional[ByteStore] = None,
+    transform: Optional[Callable[[list[Document]], list[Document]]] = None,
+    refresh: bool = False,
+) -> Iterator[Document]:
+    """Stream the documents of `ingest_general_guides_and_tutorials` by batches of pages."""
+    return iter_sites(
+        GENERAL_GUIDES_AND_TUTORIALS_SITES,
+        batch_pages=int(os.environ.get("INGEST_BATCH_PAGES", str(DEFAULT_BATCH_PAGES))),
+        **_crawler_kwargs(store, transform, refresh),
+    )
+
+
+def get_crawl_store() -> Optional[ByteStore]:
+    """Records of the crawled pages, stored next to the record manager's.
+
+    Disabled with ``INGEST_INCREMENTAL=false``. The records hold the split
+    documents of each page: run with ``FORCE_UPDATE=true`` after changing the
+    parsing or splitting of pages, to crawl every page again.
+    """
+    if (os.environ.get("INGEST_INCREMENTAL") or "true").lower() != "true":
+        return None
+    from langchain_community.storage import SQLStore
+
+    store = SQLStore(
+        namespace=f"crawl/{WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME}",
+        db_url=RECORD_MANAGER_DB_URL,
+    )
+    store.create_schema()
+    return store
 
 
-def ingest_general_guides_and_tutorials():
-    langchain_python_docs = load_langchain_python_docs()
-    langchain_js_docs = load_langchain_js_docs()
-    aggregated_site_docs = load_aggregated_docs_site()
-    return langchain_python_docs + langchain_js_docs + aggregated_site_docs
+def split_documents(
+    docs: list[Document], text_splitter: TextSplitter
+) -> list[Document]:
+    docs_transformed = text_splitter.split_documents(docs)
+    docs_transformed = [doc for doc in docs_transformed if len(doc.page_content) > 10]
+
+    # We try to return 'source' and 'title' metadata when querying vector store and
+    # Weaviate will error at query time if one of the attributes is missing from a
+    # retrieved document.
+    for doc in docs_transformed:
+        if "source" not in doc.metadata:
+            doc.metadata["source"] = ""
+        if "title" not in doc.metadata:
+            doc.metadata["title"] = ""
+    return docs_transformed
 
 
 def ingest_docs():
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=4000, chunk_overlap=200)
     embedding = get_embeddings_model()
 
-    # Auto-detect local vs cloud Weaviate based on URL
-    is_local = "localhost" in WEAVIATE_URL or "127.0.0.1" in WEAVIATE_URL
-
-    if is_local:
-        # Connect to local Weaviate (Docker)
-        # Extract host and port from URL (e.g., "http://localhost:8088" -> host="localhost", port=8088)
-        from urllib.parse import urlparse
-        parsed = urlparse(WEAVIATE_URL)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 8080
-
-        logger.info(f"Connecting to LOCAL Weaviate at {host}:{port}")
-        weaviate_client = weaviate.connect_to_local(host=host, port=port)
-    else:
-        # Connect to Weaviate Cloud
-        logger.info(f"Connecting to Weaviate CLOUD at {WEAVIATE_URL}")
-        weaviate_client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=WEAVIATE_URL,
-            auth_credentials=weaviate.classes.init.Auth.api_key(WEAVIATE_API_KEY),
-            skip_init_checks=True,
-        )
+    weaviate_client = connect_weaviate_client(WEAVIATE_URL, WEAVIATE_API_KEY)
 
     with weaviate_client:
         # General Guides and Tutorials
@@ -159,31 +229,38 @@ def ingest_docs():
             db_url=RECORD_MANAGER_DB_URL,
         )
         record_manager.create_schema()
-        general_guides_and_tutorials_docs = ingest_general_guides_and_tutorials()
-        docs_transformed = text_splitter.split_documents(
-            general_guides_and_tutorials_docs
+        force_update = (os.environ.get("FORCE_UPDATE") or "false").lower() == "true"
+        # Pages are split as they are crawled. With the crawl store, only new or
+        # changed pages are parsed and split; others come from the store.
+        # Documents are streamed to index() by bounded batches (crawl -> parse ->
+        # split -> embed -> upsert), so memory does not grow with the corpus.
+        # With cleanup="full", index() deletes stale documents only once the
+        # stream is exhausted: a crawl error raises before anything is deleted.
+        docs_transformed = iter_general_guides_and_tutorials(
+            store=get_crawl_store(),
+            transform=partial(split_documents, text_splitter=text_splitter),
+            refresh=force_update,
         )
-        docs_transformed = [
-            doc for doc in docs_transformed if len(doc.page_content) > 10
-        ]
-
-        # We try to return 'source' and 'title' metadata when querying vector store and
-        # Weaviate will error at query time if one of the attributes is missing from a
-        # retrieved document.
-        for doc in docs_transformed:
-            if "source" not in doc.metadata:
-                doc.metadata["source"] = ""
-            if "title" not in doc.metadata:
-                doc.metadata["title"] = ""
         indexing_stats = index(
             docs_transformed,
             record_manager,
             general_guides_and_tutorials_vectorstore,
             cleanup="full",
             source_id_key="source",
-            force_update=(os.environ.get("FORCE_UPDATE") or "false").lower() == "true",
+            force_update=force_update,
+            batch_size=int(os.environ.get("INGEST_INDEX_BATCH_SIZE", "100")),
         )
         logger.info(f"Indexing stats: {indexing_stats}")
+        if (
+            indexing_stats["num_added"]
+            or indexing_stats["num_updated"]
+            or indexing_stats["num_deleted"]
+        ):
+            # Invalidate caches derived from the index (e.g. retrieval results).
+            generation = bump_index_generation(
+                WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+            )
+            logger.info(f"Index changed, bumped its generation to {generation}")
         num_vecs = (
             weaviate_client.collections.get(
                 WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
@@ -194,6 +271,19 @@ def ingest_docs():
         logger.info(
             f"General Guides and Tutorials now has this many vectors: {num_vecs}",
         )
+        if local_index_path := os.environ.get("LOCAL_INDEX_PATH"):
+            # Snapshot for the "local" retriever provider, reusing stored vectors.
+            export_weaviate_collection(
+                weaviate_client.collections.get(
+                    WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+                ),
+                local_index_path,
+                embedding_model="openai/text-embedding-3-small",
+                ivf_lists=int(os.environ.get("LOCAL_INDEX_IVF_LISTS", "0")),
+                quantization=os.environ.get("LOCAL_INDEX_QUANTIZATION"),
+                code_dimensions=int(os.environ.get("LOCAL_INDEX_CODE_DIMENSIONS", "0")),
+            )
+            logger.info(f"Wrote local index snapshot to {local_index_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,785 @@
+"""In-process vector index, used by the "local" retriever provider.
+
+A snapshot is a directory containing:
+
+- ``vectors.npy``: an (N, D) float32 matrix of L2-normalized chunk embeddings,
+  memory-mapped on load so that only the pages touched by searches are resident.
+- ``documents.jsonl``: one ``{"page_content": ..., "metadata": ...}`` line per row.
+- ``manifest.json``: the embedding model and shape of the matrix.
+- ``ivf_centroids.npy``, ``ivf_offsets.npy``, ``ivf_rows.npy`` (optional): an
+  inverted-file (IVF) coarse quantizer, see `IVFQuantizer`.
+- ``codes.npy``, ``code_scales.npy`` (optional): int8 or binary codes of the
+  vectors, possibly of their first dimensions only, see `QuantizedCodes`.
+
+Saving a snapshot at a path writes a new versioned directory next to it, then
+atomically points the path, a symbolic link, to that directory (see
+`LocalVectorIndex.save`), so that running servers can load the new snapshot.
+
+Snapshots are produced by the ingest pipeline (see `export_weaviate_collection`),
+after which the whole graph can run without a Weaviate instance. By default,
+search is an exact cosine top-k computed with a single matrix-vector product.
+When the snapshot has an IVF quantizer, passing ``nprobe`` restricts the search
+to the rows of the ``nprobe`` clusters closest to the query (approximate search).
+See ``backend/benchmarks/local_index_ann.py`` to pick ``n_lists`` and ``nprobe``.
+
+When the snapshot has quantized codes, they are loaded in memory and searched
+first; only the best ``rescore`` candidates are then scored with the float32
+vectors, so the memory-mapped matrix is mostly left on disk. See
+``backend/benchmarks/local_index_quantization.py`` for memory and recall numbers
+(measured on synthetic vectors only so far; measure the real corpus before
+enabling quantization).
+
+Like the Weaviate retriever, the local retriever supports hybrid search: with an
+``alpha`` search kwarg below 1, vector results are fused with BM25 keyword results
+(see `BM25Index`) by weighted reciprocal rank fusion.
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from collections import Counter
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+
+from backend.cache import LRUCache
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+MANIFEST_FILE = "manifest.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+IVF_ROWS_FILE = "ivf_rows.npy"
+CODES_FILE = "codes.npy"
+CODE_SCALES_FILE = "code_scales.npy"
+
+QUANTIZATIONS = ("int8", "binary")
+# Candidates rescored with float32 vectors, per result, when searching codes.
+DEFAULT_RESCORE_FACTOR = 8
+# Rows of int8 codes converted to float32 at once when scoring.
+SCORING_BATCH_SIZE = 4096
+# Results of each search (vector and keyword) fused by hybrid search.
+HYBRID_CANDIDATES = 50
+# Rank constant of reciprocal rank fusion (as in Weaviate's "ranked" fusion).
+RRF_K = 60
+
+# Rows processed at once when assigning vectors to clusters, which bounds the
+# memory used by the (rows, clusters) similarity matrix.
+ASSIGNMENT_BATCH_SIZE = 16384
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix (zero rows are left unchanged)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the ``k`` highest scores of each row, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(
+        -np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable"
+    )
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def truncate_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the first ``dimensions`` components and re-normalize.
+
+    text-embedding-3 models are trained so that prefixes of their embeddings are
+    embeddings themselves ("shortening" in the OpenAI API).
+    """
+    return normalize_rows(np.asarray(vectors)[..., :dimensions])
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _hamming(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Hamming distances between rows of packed bits and packed query bits."""
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        # NumPy >= 2.0: popcount 64 bits at a time.
+        codes, query = codes.view(np.uint64), query.view(np.uint64)
+        return np.bitwise_count(codes ^ query).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[codes ^ query].sum(axis=1, dtype=np.int32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the most similar centroid for each row."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGNMENT_BATCH_SIZE):
+        batch = np.asarray(vectors[start : start + ASSIGNMENT_BATCH_SIZE])
+        assignments[start : start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    max_training_points: int = 256,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster normalized vectors by cosine similarity.
+
+    Args:
+        vectors (np.ndarray): (N, D) matrix of L2-normalized vectors.
+        n_clusters (int): Number of clusters.
+        n_iter (int): Number of Lloyd iterations.
+        max_training_points (int): Training uses at most this many points per
+            cluster, sampled at random, which keeps training time independent of N.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        np.ndarray: (n_clusters, D) matrix of L2-normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    n_training = min(len(vectors), n_clusters * max_training_points)
+    sample = np.sort(rng.choice(len(vectors), n_training, replace=False))
+    training = np.asarray(vectors[sample], dtype=np.float32)
+    centroids = training[rng.choice(len(training), n_clusters, replace=False)]
+
+    for _ in range(n_iter):
+        assignments = _assign(training, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, training)
+        empty = ~np.bincount(assignments, minlength=n_clusters).astype(bool)
+        # Re-seed empty clusters with random training points.
+        sums[empty] = training[rng.choice(len(training), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFQuantizer:
+    """Inverted-file coarse quantizer: rows grouped by their nearest centroid.
+
+    The rows of cluster ``c`` are ``rows[offsets[c]:offsets[c + 1]]``.
+
+    Args:
+        centroids (np.ndarray): (C, D) matrix of normalized centroids.
+        offsets (np.ndarray): (C + 1,) start offset of each inverted list.
+        rows (np.ndarray): (N,) row indices, grouped by cluster.
+    """
+
+    def __init__(
+        self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray
+    ) -> None:
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls, vectors: np.ndarray, n_lists: int, n_iter: int = 20, seed: int = 0
+    ) -> "IVFQuantizer":
+        """Cluster ``vectors`` with spherical k-means and build the inverted lists."""
+        centroids = spherical_kmeans(vectors, n_lists, n_iter=n_iter, seed=seed)
+        assignments = _assign(vectors, centroids)
+        rows = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, offsets, rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Return the rows of the ``nprobe`` lists closest to a normalized query."""
+        lists = top_k(self.centroids @ query, nprobe)
+        return np.concatenate(
+            [self.rows[self.offsets[c] : self.offsets[c + 1]] for c in lists]
+        )
+
+
+class QuantizedCodes:
+    """Compact codes of the index vectors, used to shortlist search candidates.
+
+    - ``int8``: every dimension is scaled by its maximum absolute value and
+      rounded to [-127, 127] (4x smaller than float32).
+    - ``binary``: the sign of every dimension, packed 8 per byte (32x smaller),
+      scored by Hamming distance.
+
+    Args:
+        kind (str): "int8" or "binary".
+        codes (np.ndarray): (N, dimensions) int8 codes, or (N, dimensions / 8)
+            packed bits.
+        scales (np.ndarray): Per-dimension scales of the int8 codes (empty for
+            binary codes).
+        dimensions (int): Number of leading vector dimensions that were encoded.
+    """
+
+    def __init__(
+        self, kind: str, codes: np.ndarray, scales: np.ndarray, dimensions: int
+    ) -> None:
+        self.kind = kind
+        self.codes = codes
+        self.scales = scales
+        self.dimensions = dimensions
+
+    @classmethod
+    def encode(
+        cls, vectors: np.ndarray, kind: str, dimensions: Optional[int] = None
+    ) -> "QuantizedCodes":
+        """Quantize the first ``dimensions`` components (default: all) of the vectors."""
+        dimensions = dimensions or vectors.shape[1]
+        truncated = truncate_dimensions(vectors, dimensions)
+        if kind == "int8":
+            scales = np.abs(truncated).max(axis=0) / 127
+            scales[scales == 0] = 1
+            codes = np.round(truncated / scales).astype(np.int8)
+            return cls(kind, codes, scales.astype(np.float32), dimensions)
+        if kind == "binary":
+            codes = np.packbits(truncated > 0, axis=1)
+            return cls(kind, codes, np.empty(0, dtype=np.float32), dimensions)
+        raise ValueError(
+            f"Unrecognized quantization: {kind}. Expected one of: {QUANTIZATIONS}"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def scores(
+        self, query: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Approximate similarity of a normalized query with every (or some) rows."""
+        query = truncate_dimensions(query, self.dimensions)
+        codes = self.codes if rows is None else self.codes[rows]
+        if self.kind == "binary":
+            distances = _hamming(codes, np.packbits(query > 0))
+            return (self.dimensions - 2 * distances).astype(np.float32)
+
+        weights = query * self.scales
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORING_BATCH_SIZE):
+            batch = codes[start : start + SCORING_BATCH_SIZE]
+            scores[start : start + len(batch)] = batch.astype(np.float32) @ weights
+        return scores
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; ``a.b_c`` gives ``["a", "b_c"]``."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 keyword index over a list of texts.
+
+    Postings are stored as flat arrays (``rows`` and ``frequencies`` of term ``t``
+    are ``[offsets[t]:offsets[t + 1]]``), so a query only touches its own terms.
+
+    Args:
+        texts (Iterable[str]): The indexed texts.
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.terms: dict[str, int] = {}
+        term_ids, rows, frequencies, lengths = (
+            array("i"),
+            array("i"),
+            array("i"),
+            array("i"),
+        )
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            term_ids.extend(
+                [self.terms.setdefault(term, len(self.terms)) for term in counts]
+            )
+            rows.extend([row] * len(counts))
+            frequencies.extend(counts.values())
+
+        order = np.argsort(np.frombuffer(term_ids, dtype=np.int32), kind="stable")
+        self.rows = np.frombuffer(rows, dtype=np.int32)[order]
+        self.frequencies = np.frombuffer(frequencies, dtype=np.int32)[order].astype(
+            np.float32
+        )
+        document_frequencies = np.bincount(
+            np.frombuffer(term_ids, dtype=np.int32), minlength=len(self.terms)
+        )
+        self.offsets = np.concatenate([[0], np.cumsum(document_frequencies)])
+        self.lengths = np.frombuffer(lengths, dtype=np.int32).astype(np.float32)
+        n = len(self.lengths)
+        self.idf = np.log(
+            1 + (n - document_frequencies + 0.5) / (document_frequencies + 0.5)
+        )
+        self.average_length = float(self.lengths.mean()) if n else 0.0
+
+    def scores(self, query: str) -> np.ndarray:
+        """Return the BM25 score of every text for ``query``."""
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows, frequencies = self.rows[start:end], self.frequencies[start:end]
+            normalization = self.k1 * (
+                1 - self.b + self.b * self.lengths[rows] / self.average_length
+            )
+            scores[rows] += (
+                self.idf[term_id]
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + normalization)
+            )
+        return scores
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Return the (row, score) pairs of the ``k`` best matching texts."""
+        scores = self.scores(query)
+        return [
+            (int(row), float(scores[row]))
+            for row in top_k(scores, k)
+            if scores[row] > 0
+        ]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[int]], weights: list[float], k: int = RRF_K
+) -> list[tuple[int, float]]:
+    """Fuse rankings of rows: each row scores ``sum(weight / (k + rank))``.
+
+    Returns:
+        list[tuple[int, float]]: (row, fused score) pairs, best first.
+    """
+    fused: dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class LocalVectorIndex:
+    """Exact cosine-similarity index over a matrix of normalized embeddings.
+
+    Args:
+        vectors (np.ndarray): (N, D) float32 matrix of L2-normalized embeddings.
+        documents (list[Document]): The N documents, in the same order.
+        embedding_model (str): Name of the model that produced the embeddings.
+        ivf (Optional[IVFQuantizer]): Coarse quantizer for approximate search.
+        codes (Optional[QuantizedCodes]): Compact codes used to shortlist
+            candidates before rescoring them with ``vectors``.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        documents: list[Document],
+        embedding_model: str,
+        ivf: Optional[IVFQuantizer] = None,
+        codes: Optional[QuantizedCodes] = None,
+    ) -> None:
+        if len(vectors) != len(documents):
+            raise ValueError(
+                f"Got {len(vectors)} vectors but {len(documents)} documents."
+            )
+        self.vectors = vectors
+        self.documents = documents
+        self.embedding_model = embedding_model
+        self.ivf = ivf
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def from_vectors(
+        cls,
+        vectors: Union[np.ndarray, list[list[float]]],
+        documents: list[Document],
+        embedding_model: str,
+    ) -> "LocalVectorIndex":
+        """Build an index from raw (not necessarily normalized) embeddings."""
+        return cls(normalize_rows(np.asarray(vectors)), documents, embedding_model)
+
+    def build_ivf(self, n_lists: int, n_iter: int = 20, seed: int = 0) -> None:
+        """Train an IVF quantizer with ``n_lists`` clusters for approximate search.
+
+        About ``sqrt(N)`` to ``4 * sqrt(N)`` lists is a good starting point.
+        """
+        self.ivf = IVFQuantizer.train(self.vectors, n_lists, n_iter=n_iter, seed=seed)
+
+    @cached_property
+    def bm25(self) -> BM25Index:
+        """Keyword index over the documents, built on first use."""
+        return BM25Index(document.page_content for document in self.documents)
+
+    def quantize(self, kind: str, dimensions: Optional[int] = None) -> None:
+        """Encode the vectors as int8 or binary codes, searched before rescoring.
+
+        Args:
+            kind (str): "int8" or "binary".
+            dimensions (Optional[int]): Only encode the first ``dimensions``
+                components (e.g. 512 for text-embedding-3-small).
+        """
+        self.codes = QuantizedCodes.encode(self.vectors, kind, dimensions)
+
+    def search(
+        self,
+        query_vector: list[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        rescore: Optional[int] = None,
+    ) -> list[tuple[int, float]]:
+        """Return the (row, cosine similarity) pairs of the ``k`` nearest documents.
+
+        Args:
+            query_vector (list[float]): The query embedding.
+            k (int): Number of results.
+            nprobe (Optional[int]): If set and the index has an IVF quantizer, only
+                search the ``nprobe`` closest inverted lists. Otherwise, search
+                exhaustively.
+            rescore (Optional[int]): If the index has quantized codes, number of
+                candidates rescored with the float32 vectors. Defaults to
+                ``DEFAULT_RESCORE_FACTOR * k``.
+        """
+        return self.search_batch([query_vector], k, nprobe=nprobe, rescore=rescore)[0]
+
+    def search_batch(
+        self,
+        query_vectors: list[list[float]],
+        k: int,
+        nprobe: Optional[int] = None,
+        rescore: Optional[int] = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Search several queries (with a single matrix product when exact)."""
+        queries = normalize_rows(np.asarray(query_vectors))
+        if self.codes is not None or (nprobe is not None and self.ivf is not None):
+            return [
+                self._search_candidates(query, k, nprobe, rescore) for query in queries
+            ]
+
+        scores = queries @ self.vectors.T
+        rows = top_k(scores, k)
+        return [
+            [(int(row), float(score)) for row, score in zip(r, scores[i, r])]
+            for i, r in enumerate(rows)
+        ]
+
+    def hybrid_search(
+        self,
+        query: str,
+        query_vector: list[float],
+        k: int,
+        alpha: float = 0.5,
+        **kwargs: Any,
+    ) -> list[tuple[int, float]]:
+        """Fuse vector and BM25 results by weighted reciprocal rank fusion.
+
+        Args:
+            query (str): The query text, for the keyword search.
+            query_vector (list[float]): The query embedding, for the vector search.
+            k (int): Number of results.
+            alpha (float): Weight of the vector search (1 - alpha for keywords).
+            **kwargs: Passed to `search` (``nprobe``, ``rescore``).
+
+        Returns:
+            list[tuple[int, float]]: (row, fused score) pairs, best first.
+        """
+        limit = max(k, HYBRID_CANDIDATES)
+        vector_rows = (
+            [row for row, _ in self.search(query_vector, limit, **kwargs)]
+            if alpha > 0
+            else []
+        )
+        keyword_rows = (
+            [row for row, _ in self.bm25.search(query, limit)] if alpha < 1 else []
+        )
+        return reciprocal_rank_fusion([vector_rows, keyword_rows], [alpha, 1 - alpha])[
+            :k
+        ]
+
+    def _search_candidates(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int],
+        rescore: Optional[int],
+    ) -> list[tuple[int, float]]:
+        candidates = None
+        if nprobe is not None and self.ivf is not None:
+            candidates = np.sort(self.ivf.candidates(query, nprobe))
+        if self.codes is not None:
+            shortlist = top_k(
+                self.codes.scores(query, candidates),
+                rescore or DEFAULT_RESCORE_FACTOR * k,
+            )
+            candidates = np.sort(
+                shortlist if candidates is None else candidates[shortlist]
+            )
+        scores = self.vectors[candidates] @ query
+        best = top_k(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the index as a snapshot, replacing any previous snapshot at ``path``.
+
+        The snapshot is written to a new versioned directory next to ``path``, and
+        ``path`` is then atomically switched to it: ``path`` is a symbolic link to
+        the current version (see `_publish_snapshot`). Readers never see a
+        missing or partially written snapshot, and processes memory-mapping the
+        previous version keep reading consistent files.
+        """
+        path = Path(path).absolute()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        version = Path(tempfile.mkdtemp(prefix=f".{path.name}.v-", dir=path.parent))
+        try:
+            self._write(version)
+            _publish_snapshot(version, path)
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+
+    def _write(self, path: Path) -> None:
+        np.save(path / VECTORS_FILE, np.asarray(self.vectors, dtype=np.float32))
+        with open(path / DOCUMENTS_FILE, "w") as f:
+            for document in self.documents:
+                f.write(
+                    json.dumps(
+                        {
+                            "page_content": document.page_content,
+                            "metadata": document.metadata,
+                        },
+                        default=str,
+                    )
+                    + "\n"
+                )
+        (path / MANIFEST_FILE).write_text(
+            json.dumps(
+                {
+                    "embedding_model": self.embedding_model,
+                    "count": len(self.documents),
+                    "dimensions": int(self.vectors.shape[1]) if len(self) else 0,
+                    "ivf_lists": self.ivf.n_lists if self.ivf is not None else 0,
+                    "quantization": self.codes.kind if self.codes else None,
+                    "code_dimensions": self.codes.dimensions if self.codes else 0,
+                }
+            )
+        )
+        if self.ivf is not None:
+            np.save(path / IVF_CENTROIDS_FILE, self.ivf.centroids)
+            np.save(path / IVF_OFFSETS_FILE, self.ivf.offsets)
+            np.save(path / IVF_ROWS_FILE, self.ivf.rows)
+        if self.codes is not None:
+            np.save(path / CODES_FILE, self.codes.codes)
+            np.save(path / CODE_SCALES_FILE, self.codes.scales)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "LocalVectorIndex":
+        """Load a snapshot directory, memory-mapping the vectors by default.
+
+        Quantized codes, when present, are always read in memory.
+        """
+        path = Path(path)
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+        vectors = np.load(path / VECTORS_FILE, mmap_mode="r" if mmap else None)
+        with open(path / DOCUMENTS_FILE) as f:
+            documents = [Document(**json.loads(line)) for line in f]
+        ivf = None
+        if manifest.get("ivf_lists"):
+            ivf = IVFQuantizer(
+                np.load(path / IVF_CENTROIDS_FILE),
+                np.load(path / IVF_OFFSETS_FILE),
+                np.load(path / IVF_ROWS_FILE),
+            )
+        codes = None
+        if manifest.get("quantization"):
+            codes = QuantizedCodes(
+                manifest["quantization"],
+                np.load(path / CODES_FILE),
+                np.load(path / CODE_SCALES_FILE),
+                manifest["code_dimensions"],
+            )
+        return cls(
+            vectors, documents, manifest["embedding_model"], ivf=ivf, codes=codes
+        )
+
+
+def _publish_snapshot(version: Path, target: Path) -> None:
+    """Point the ``target`` symbolic link to the snapshot directory ``version``.
+
+    The new link replaces ``target`` with a single atomic `os.replace`. The
+    version it pointed to is kept, for readers that resolved the link just before
+    the switch; older versions are removed.
+    """
+    link = version.with_name(f"{version.name}.link")
+    os.symlink(version.name, link)
+    previous = None
+    if target.is_symlink():
+        previous = target.resolve()
+    elif target.exists():
+        # A snapshot saved as a plain directory, or an empty directory: it cannot
+        # be atomically replaced by a link, so it is moved aside first.
+        previous = target.with_name(f"{version.name}.previous")
+        os.rename(target, previous)
+    os.replace(link, target)
+    for old in target.parent.glob(f".{target.name}.v-*"):
+        if old.is_dir() and not old.is_symlink() and old not in (version, previous):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_local_index(path: str) -> LocalVectorIndex:
+    """Load a snapshot, reloading it when a new one has been saved at ``path``."""
+    # Each saved snapshot is a new directory, which the cache is keyed on.
+    return _load_snapshot(os.path.realpath(path))
+
+
+@lru_cache(maxsize=4)
+def _load_snapshot(version: str) -> LocalVectorIndex:
+    return LocalVectorIndex.load(version)
+
+
+def get_local_index_path() -> str:
+    """Return the snapshot directory, from the ``LOCAL_INDEX_PATH`` environment variable."""
+    try:
+        return os.environ["LOCAL_INDEX_PATH"]
+    except KeyError:
+        raise ValueError(
+            "retriever_provider 'local' requires the LOCAL_INDEX_PATH environment "
+            "variable to point to an index snapshot (see backend/local_index.py)."
+        ) from None
+
+
+class LocalIndexRetriever(BaseRetriever):
+    """Retriever over a `LocalVectorIndex`."""
+
+    index: LocalVectorIndex
+    """The index to search."""
+    embedding: Embeddings
+    """Encoder used to embed the query. Must match the index embedding model."""
+    search_kwargs: dict[str, Any] = Field(default_factory=dict)
+    """Keyword arguments for the search: ``k``, ``alpha`` (hybrid search when below
+    1), ``nprobe`` (IVF approximate search) and ``rescore`` (candidates rescored when
+    the index has quantized codes)."""
+    vector_cache: Optional[LRUCache] = None
+    """If set, the vectors of the results are cached by uuid."""
+
+    def _search(
+        self, queries: list[str], vectors: list[list[float]]
+    ) -> list[list[Document]]:
+        k = self.search_kwargs.get("k", 4)
+        alpha = self.search_kwargs.get("alpha", 1.0)
+        kwargs = {
+            "nprobe": self.search_kwargs.get("nprobe"),
+            "rescore": self.search_kwargs.get("rescore"),
+        }
+        if alpha < 1:
+            results = [
+                self.index.hybrid_search(query, vector, k, alpha, **kwargs)
+                for query, vector in zip(queries, vectors)
+            ]
+        else:
+            results = self.index.search_batch(vectors, k, **kwargs)
+        return [self._to_documents(result) for result in results]
+
+    def _to_documents(self, results: list[tuple[int, float]]) -> list[Document]:
+        if self.vector_cache is not None:
+            for row, _ in results:
+                if uuid := self.index.documents[row].metadata.get("uuid"):
+                    self.vector_cache.set(uuid, self.index.vectors[row].tobytes())
+        return [
+            Document(
+                page_content=self.index.documents[row].page_content,
+                metadata=dict(self.index.documents[row].metadata),
+            )
+            for row, _ in results
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        (documents,) = self._search([query], [self.embedding.embed_query(query)])
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        vector = await self.embedding.aembed_query(query)
+        (documents,) = await asyncio.to_thread(self._search, [query], [vector])
+        return documents
+
+    async def abatch_search(self, queries: list[str]) -> list[list[Document]]:
+        """Search several queries with one embedding request and one matrix product."""
+        vectors = await self.embedding.aembed_documents(queries)
+        return await asyncio.to_thread(self._search, queries, vectors)
+
+
+def export_weaviate_collection(
+    collection: Any,
+    path: Union[str, Path],
+    embedding_model: str,
+    text_key: str = "text",
+    attributes: Iterable[str] = ("source", "title"),
+    ivf_lists: int = 0,
+    quantization: Optional[str] = None,
+    code_dimensions: Optional[int] = None,
+) -> LocalVectorIndex:
+    """Write a snapshot of a Weaviate collection, reusing its stored vectors.
+
+    Args:
+        collection: The (sync) Weaviate collection to export.
+        path (Union[str, Path]): The snapshot directory.
+        embedding_model (str): Fully specified name of the model that produced the
+            vectors, e.g. "openai/text-embedding-3-small".
+        text_key (str): Property holding the document text.
+        attributes (Iterable[str]): Additional properties kept as metadata.
+        ivf_lists (int): If positive, also build an IVF quantizer with this many
+            lists for approximate search.
+        quantization (Optional[str]): If set ("int8" or "binary"), also store
+            quantized codes of the vectors.
+        code_dimensions (Optional[int]): Number of leading dimensions encoded in
+            the quantized codes (default: all).
+
+    Returns:
+        LocalVectorIndex: The exported index.
+    """
+    vectors: list[list[float]] = []
+    documents: list[Document] = []
+    for obj in collection.iterator(
+        include_vector=True, return_properties=[text_key, *attributes]
+    ):
+        properties = dict(obj.properties)
+        text = properties.pop(text_key)
+        vectors.append(obj.vector["default"])
+        documents.append(
+            Document(page_content=text, metadata={**properties, "uuid": str(obj.uuid)})
+        )
+    index = LocalVectorIndex.from_vectors(
+        np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1),
+        documents,
+        embedding_model,
+    )
+    if ivf_lists > 0:
+        index.build_ivf(ivf_lists)
+    if quantization:
+        index.quantize(quantization, code_dimensions)
+    index.save(path)
+    return index
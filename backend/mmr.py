@@ -0,0 +1,57 @@
+"""Maximal marginal relevance (MMR) selection of collected documents.
+
+Research steps and their queries often return overlapping chunks (e.g. the same
+page from the Python and JavaScript docs). MMR picks documents that are relevant
+to the question but not similar to the documents already picked, which shrinks
+the context without losing coverage.
+"""
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(
+    query_vector: list[float],
+    candidate_vectors: list[list[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> list[int]:
+    """Select ``k`` candidates by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``.
+    All similarities are computed upfront with two matrix products; every step is
+    then a single vector operation over the candidates.
+
+    Args:
+        query_vector (list[float]): The query embedding.
+        candidate_vectors (list[list[float]]): The candidate embeddings.
+        k (int): Number of candidates to select.
+        lambda_mult (float): Trade-off between relevance (1) and diversity (0).
+
+    Returns:
+        list[int]: Indices of the selected candidates, in selection order.
+    """
+    candidates = _normalize(np.asarray(candidate_vectors, dtype=np.float32))
+    if len(candidates) == 0 or k <= 0:
+        return []
+    query = _normalize(np.asarray(query_vector, dtype=np.float32))
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, len(candidates)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
@@ -0,0 +1,165 @@
+"""Rerankers scoring collected documents against the user's question.
+
+The researcher collects documents for every step of the research plan, in
+arrival order. A reranker scores them all against the question so that only the
+most relevant ones are passed to the response model.
+
+Two implementations are provided:
+
+- `LexicalReranker`: BM25 over the candidate documents. Cheap and dependency-free.
+- `CrossEncoderReranker`: a local cross-encoder run on CPU (PyTorch or ONNX).
+  Requires the ``rerank`` extra (``poetry install --extras rerank``). Loading
+  it may download the model, so async code gets it through `aget_reranker`.
+
+New rerankers implement `Reranker.score` and are registered in `get_reranker`.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from backend.local_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class Reranker(ABC):
+    """Scores documents against a query and keeps the best ones."""
+
+    @abstractmethod
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """Return a relevance score per document (higher is more relevant)."""
+
+    async def ascore(self, query: str, documents: list[Document]) -> list[float]:
+        """Async version of `score`. Runs `score` in a thread by default."""
+        return await asyncio.to_thread(self.score, query, documents)
+
+    @staticmethod
+    def _select(
+        documents: list[Document], scores: list[float], top_n: int
+    ) -> list[Document]:
+        # Stable: documents with equal scores keep their retrieval order.
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        return [documents[i] for i in order[:top_n]]
+
+    def rerank(
+        self, query: str, documents: list[Document], top_n: int
+    ) -> list[Document]:
+        """Return the ``top_n`` most relevant documents, best first."""
+        if not documents:
+            return []
+        return self._select(documents, self.score(query, documents), top_n)
+
+    async def arerank(
+        self, query: str, documents: list[Document], top_n: int
+    ) -> list[Document]:
+        """Async version of `rerank`."""
+        if not documents:
+            return []
+        return self._select(documents, await self.ascore(query, documents), top_n)
+
+
+class LexicalReranker(Reranker):
+    """Scores documents with BM25 statistics computed over the candidates only.
+
+    Document titles are indexed with the content, so that a page whose title
+    names the API the user asks about is ranked first.
+    """
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        index = BM25Index(
+            f"{document.metadata.get('title') or ''}\n{document.page_content}"
+            for document in documents
+        )
+        return index.scores(query).tolist()
+
+    async def ascore(self, query: str, documents: list[Document]) -> list[float]:
+        # Fast enough to run on the event loop.
+        return self.score(query, documents)
+
+
+class CrossEncoderReranker(Reranker):
+    """Scores (query, document) pairs with a local cross-encoder on CPU.
+
+    Args:
+        model_name (str): Name of the cross-encoder on the Hugging Face Hub.
+        backend (str): "torch" or "onnx" (requires ``optimum[onnxruntime]``).
+        max_length (int): Maximum number of tokens per pair; longer documents are
+            truncated.
+        batch_size (int): Number of pairs scored at once.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_CROSS_ENCODER_MODEL,
+        backend: str = "torch",
+        max_length: int = 512,
+        batch_size: int = 16,
+    ) -> None:
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "CrossEncoderReranker requires the sentence-transformers package: "
+                "poetry install --extras rerank"
+            ) from e
+
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        self.model = CrossEncoder(
+            model_name, device="cpu", max_length=max_length, **kwargs
+        )
+        self.batch_size = batch_size
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        pairs = [(query, document.page_content) for document in documents]
+        return self.model.predict(pairs, batch_size=self.batch_size).tolist()
+
+
+@lru_cache(maxsize=None)
+def get_reranker(name: str, model_name: str) -> Optional[Reranker]:
+    """Return the reranker configured by name, loaded once per process.
+
+    Args:
+        name (str): "none", "lexical", "cross-encoder" or "cross-encoder-onnx".
+        model_name (str): Model of the cross-encoder rerankers.
+
+    Returns:
+        Optional[Reranker]: The reranker, or None for "none". Cross-encoders fall
+            back to the lexical reranker when their dependencies are missing.
+    """
+    if name == "none":
+        return None
+    if name == "lexical":
+        return LexicalReranker()
+    if name in ("cross-encoder", "cross-encoder-onnx"):
+        backend = "onnx" if name == "cross-encoder-onnx" else "torch"
+        try:
+            return CrossEncoderReranker(model_name, backend=backend)
+        except ImportError:
+            logger.warning(
+                f"Cannot load the {name} reranker, falling back to the lexical "
+                "reranker",
+                exc_info=True,
+            )
+            return LexicalReranker()
+    raise ValueError(
+        f"Unrecognized reranker: {name}. Expected one of: "
+        "none, lexical, cross-encoder, cross-encoder-onnx"
+    )
+
+
+async def aget_reranker(name: str, model_name: str) -> Optional[Reranker]:
+    """Async version of `get_reranker`.
+
+    Cross-encoders are loaded in a thread: the first load reads (or downloads)
+    the model, which would otherwise block the event loop.
+    """
+    if name in ("cross-encoder", "cross-encoder-onnx"):
+        return await asyncio.to_thread(get_reranker, name, model_name)
+    return get_reranker(name, model_name)
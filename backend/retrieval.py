@@ -1,15 +1,57 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from contextlib import contextmanager
-from typing import Iterator
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncIterator,
+    Iterator,
+    Optional,
+    cast,
+    get_args,
+    get_type_hints,
+)
 
-import weaviate
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import RunnableConfig
 from langchain_weaviate import WeaviateVectorStore
+from pydantic import Field
+from weaviate import WeaviateClient
+from weaviate.classes.query import HybridFusion, MetadataQuery
+from weaviate.collections import CollectionAsync
 
+from backend.cache import (
+    LRUCache,
+    aget_index_generation,
+    get_index_generation,
+    get_shared_store,
+)
+from backend.clients import async_weaviate_pool, weaviate_pool
 from backend.configuration import BaseConfiguration
 from backend.constants import WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+from backend.embeddings import (
+    CachedEmbeddings,
+    get_embedding_cache_max_bytes,
+    normalize_text,
+)
+from backend.local_index import (
+    LocalIndexRetriever,
+    get_local_index_path,
+    load_local_index,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def make_text_encoder(model: str) -> Embeddings:
@@ -24,58 +66,469 @@ def make_text_encoder(model: str) -> Embeddings:
             raise ValueError(f"Unsupported embedding provider: {provider}")
 
 
+@lru_cache(maxsize=None)
+def get_text_encoder(model: str) -> CachedEmbeddings:
+    """Return the process-wide text encoder for the given model.
+
+    Encoders are stateless HTTP clients, so a single instance (and its connection
+    pool) is shared by every retrieval call instead of being rebuilt each time.
+    It is wrapped in an embedding cache, since generated queries repeat heavily
+    across users.
+    """
+    return CachedEmbeddings(
+        make_text_encoder(model),
+        model_name=model,
+        max_bytes=get_embedding_cache_max_bytes(),
+        store=get_shared_store(),
+    )
+
+
+# Constructing a WeaviateVectorStore issues two requests (collection existence and
+# config), so stores are cached per embedding model along with the pooled client
+# they are bound to, and rebuilt once the pool hands out a reconnected client.
+_vector_stores: dict[str, tuple[WeaviateClient, WeaviateVectorStore]] = {}
+_vector_stores_lock = threading.Lock()
+
+
+def _weaviate_hybrid_kwargs(search_kwargs: dict[str, Any]) -> dict[str, Any]:
+    """Translate configured search kwargs to arguments of Weaviate's hybrid query.
+
+    ``fusion_type`` can be given by name: "ranked" (reciprocal rank fusion) or
+    "relative_score".
+    """
+    kwargs = dict(search_kwargs)
+    if isinstance(kwargs.get("fusion_type"), str):
+        try:
+            kwargs["fusion_type"] = HybridFusion[kwargs["fusion_type"].upper()]
+        except KeyError:
+            raise ValueError(
+                f"Unrecognized fusion_type: {kwargs['fusion_type']}. "
+                f"Expected one of: {', '.join(f.name.lower() for f in HybridFusion)}"
+            ) from None
+    return kwargs
+
+
 @contextmanager
 def make_weaviate_retriever(
     configuration: BaseConfiguration, embedding_model: Embeddings
 ) -> Iterator[BaseRetriever]:
-    # Auto-detect local vs cloud Weaviate based on URL
-    weaviate_url = os.environ["WEAVIATE_URL"]
-    is_local = "localhost" in weaviate_url or "127.0.0.1" in weaviate_url
-
-    if is_local:
-        # Connect to local Weaviate (Docker)
-        from urllib.parse import urlparse
-        parsed = urlparse(weaviate_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 8080
-        weaviate_client = weaviate.connect_to_local(host=host, port=port)
-    else:
-        # Connect to Weaviate Cloud
-        weaviate_client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=weaviate_url,
-            auth_credentials=weaviate.classes.init.Auth.api_key(
-                os.environ.get("WEAVIATE_API_KEY", "not_provided")
+    with weaviate_pool.borrow() as weaviate_client:
+        with _vector_stores_lock:
+            client, store = _vector_stores.get(
+                configuration.embedding_model, (None, None)
+            )
+            if client is not weaviate_client:
+                store = WeaviateVectorStore(
+                    client=weaviate_client,
+                    index_name=WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME,
+                    text_key="text",
+                    embedding=embedding_model,
+                    attributes=["source", "title"],
+                )
+                _vector_stores[configuration.embedding_model] = (
+                    weaviate_client,
+                    store,
+                )
+        search_kwargs = _weaviate_hybrid_kwargs(
+            {**configuration.search_kwargs, "return_uuids": True}
+        )
+        yield store.as_retriever(search_kwargs=search_kwargs)
+
+
+# (page content, metadata, index vector as float32 bytes if it was fetched)
+CachedDocuments = tuple[tuple[str, dict[str, Any], Optional[bytes]], ...]
+
+
+def _to_cached(
+    documents: list[Document], vector_cache: Optional[LRUCache]
+) -> CachedDocuments:
+    # The vectors are kept with the results, so that a cache hit can still
+    # provide them to `aget_document_vectors`.
+    return tuple(
+        (
+            doc.page_content,
+            dict(doc.metadata),
+            (
+                vector_cache.get(doc.metadata.get("uuid") or "")
+                if vector_cache is not None
+                else None
             ),
-            skip_init_checks=True,
         )
+        for doc in documents
+    )
+
+
+def _from_cached(
+    cached: Optional[CachedDocuments], vector_cache: Optional[LRUCache]
+) -> Optional[list[Document]]:
+    # Fresh Document objects are built on every hit so that callers mutating a
+    # result cannot corrupt the cache.
+    if cached is None:
+        return None
+    documents = []
+    for text, metadata, vector in cached:
+        if vector_cache is not None and vector is not None:
+            vector_cache.set(metadata["uuid"], vector)
+        documents.append(Document(page_content=text, metadata=dict(metadata)))
+    return documents
+
+
+# Search results shared by all retrievers of the process, see `AsyncWeaviateRetriever`.
+retrieval_cache: LRUCache[str, CachedDocuments] = LRUCache(
+    int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+)
+
+# Index vectors of recently retrieved documents (float32 bytes, keyed by uuid), so
+# that documents can be compared (see `backend.mmr`) without embedding them again.
+document_vector_cache: LRUCache[str, bytes] = LRUCache(
+    int(os.environ.get("DOCUMENT_VECTOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    sizeof=len,
+)
+
+
+class AsyncWeaviateRetriever(BaseRetriever):
+    """Retriever built on Weaviate's async client.
+
+    It runs the same hybrid query as `WeaviateVectorStore` and returns documents with
+    the same metadata, but never blocks the event loop, so parallel retrievals in
+    the researcher graph are served concurrently by a single loop. Sync calls
+    (``invoke``) run the same query on a client of the sync pool.
+
+    Results can be cached (see `retrieval_cache_ttl` in the configuration), keyed by
+    index, normalized query, search kwargs and index generation.
+    """
+
+    collection: CollectionAsync
+    """The async collection to search."""
+    embedding: Embeddings
+    """Encoder used to embed the query."""
+    text_key: str = "text"
+    """Property holding the document text."""
+    attributes: list[str] = Field(default_factory=list)
+    """Additional properties returned as document metadata."""
+    search_kwargs: dict[str, Any] = Field(default_factory=dict)
+    """Keyword arguments passed to the search (``k``, ``return_uuids``, filters...)."""
+    cache: Optional[LRUCache] = None
+    """Process-wide cache of search results."""
+    cache_ttl: float = 0
+    """Seconds for which search results are cached. 0 disables the cache."""
+    vector_cache: Optional[LRUCache] = None
+    """If set, the stored vectors of the results are fetched and cached by uuid.
+
+    Leave unset unless the vectors are used (see `aget_document_vectors`): they
+    make every search response larger."""
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        # Sync callers (scripts, `invoke`) search through the sync client pool.
+        use_cache = self.cache is not None and self.cache_ttl > 0
+        if use_cache:
+            key = self._cache_key(get_index_generation(self.collection.name), query)
+            documents = _from_cached(self.cache.get(key), self.vector_cache)
+            if documents is not None:
+                return documents
+        vector = self.embedding.embed_query(query)
+        with weaviate_pool.borrow() as client:
+            result = client.collections.get(self.collection.name).query.hybrid(
+                **self._hybrid_kwargs(query, vector)
+            )
+        documents = self._to_documents(result)
+        if use_cache:
+            self.cache.set(
+                key, _to_cached(documents, self.vector_cache), ttl=self.cache_ttl
+            )
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        (documents,) = await self._asearch([query])
+        return documents
+
+    def _hybrid_kwargs(self, query: Optional[str], vector: list[float]) -> dict:
+        kwargs = _weaviate_hybrid_kwargs(self.search_kwargs)
+        kwargs.pop("return_uuids", None)
+        return {
+            "query": query,
+            "vector": vector,
+            "limit": kwargs.pop("k", 4),
+            "return_metadata": MetadataQuery(score=True),
+            "return_properties": [self.text_key, *self.attributes],
+            "include_vector": self.vector_cache is not None,
+            **kwargs,
+        }
+
+    def _to_documents(self, result: Any) -> list[Document]:
+        return_uuids = self.search_kwargs.get("return_uuids", False)
+        documents = []
+        for obj in result.objects:
+            if self.vector_cache is not None and obj.vector:
+                self.vector_cache.set(
+                    str(obj.uuid),
+                    np.asarray(obj.vector["default"], dtype=np.float32).tobytes(),
+                )
+            properties = dict(obj.properties)
+            text = properties.pop(self.text_key)
+            metadata = {
+                key: value
+                for key, value in obj.metadata.__dict__.items()
+                if value is not None and key != "score"
+            }
+            documents.append(
+                Document(
+                    page_content=text,
+                    metadata={
+                        **properties,
+                        **metadata,
+                        **({"uuid": str(obj.uuid)} if return_uuids else {}),
+                    },
+                )
+            )
+        return documents
+
+    async def asearch_by_vector(
+        self, query: Optional[str], vector: list[float]
+    ) -> list[Document]:
+        """Search with an already computed query embedding."""
+        result = await self.collection.query.hybrid(
+            **self._hybrid_kwargs(query, vector)
+        )
+        return self._to_documents(result)
+
+    async def abatch_search(self, queries: list[str]) -> list[list[Document]]:
+        """Search several queries with a single embedding request.
+
+        All queries are embedded in one ``aembed_documents`` call and the searches
+        are then issued concurrently.
+        """
+        return await self._asearch(queries)
+
+    def _cache_key(self, generation: str, query: str) -> str:
+        payload = json.dumps(
+            [
+                self.collection.name,
+                generation,
+                normalize_text(query),
+                self.search_kwargs,
+                # Results cached without their vectors cannot serve a retriever
+                # that needs them.
+                self.vector_cache is not None,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
 
-    with weaviate_client:
-        store = WeaviateVectorStore(
-            client=weaviate_client,
-            index_name=WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME,
-            text_key="text",
+    async def _asearch(self, queries: list[str]) -> list[list[Document]]:
+        results: list[Optional[list[Document]]] = [None] * len(queries)
+        use_cache = self.cache is not None and self.cache_ttl > 0
+        if use_cache:
+            # The generation is part of the key, so entries cached before an
+            # ingestion run changed the index are never served.
+            generation = await aget_index_generation(self.collection.name)
+            keys = [self._cache_key(generation, query) for query in queries]
+            results = [
+                _from_cached(self.cache.get(key), self.vector_cache) for key in keys
+            ]
+
+        missing = [i for i, documents in enumerate(results) if documents is None]
+        if len(missing) == 1:
+            vectors = [await self.embedding.aembed_query(queries[missing[0]])]
+        elif missing:
+            vectors = await self.embedding.aembed_documents(
+                [queries[i] for i in missing]
+            )
+        searched = await asyncio.gather(
+            *(
+                self.asearch_by_vector(queries[i], vector)
+                for i, vector in zip(missing, vectors if missing else [])
+            )
+        )
+        for i, documents in zip(missing, searched):
+            results[i] = documents
+            if use_cache:
+                self.cache.set(
+                    keys[i],
+                    _to_cached(documents, self.vector_cache),
+                    ttl=self.cache_ttl,
+                )
+        return cast(list[list[Document]], results)
+
+
+async def aget_document_vectors(
+    documents: list[Document], embedding: Embeddings
+) -> list[list[float]]:
+    """Return the embeddings of documents.
+
+    Vectors of documents retrieved by this process are read from
+    `document_vector_cache`; the others are embedded with ``embedding``.
+    """
+    cached = [
+        document_vector_cache.get(document.metadata.get("uuid") or "")
+        for document in documents
+    ]
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    embedded = (
+        await embedding.aembed_documents([documents[i].page_content for i in missing])
+        if missing
+        else []
+    )
+    vectors: list[list[float]] = [
+        np.frombuffer(vector, dtype=np.float32).tolist() if vector else []
+        for vector in cached
+    ]
+    for i, vector in zip(missing, embedded):
+        vectors[i] = vector
+    return vectors
+
+
+def document_key(document: Document) -> str:
+    """Identify a retrieved document: its uuid, or its source and content."""
+    return document.metadata.get("uuid") or (
+        f"{document.metadata.get('source')}\x00{document.page_content}"
+    )
+
+
+async def aretrieve_many(
+    retriever: BaseRetriever,
+    queries: list[str],
+    config: Optional[RunnableConfig] = None,
+) -> list[Document]:
+    """Retrieve documents for several queries at once.
+
+    Results are merged in query order and de-duplicated by uuid (or by source and
+    content for retrievers that do not return uuids).
+    """
+    if isinstance(retriever, (AsyncWeaviateRetriever, LocalIndexRetriever)):
+        results = await retriever.abatch_search(queries)
+    else:
+        results = await retriever.abatch(queries, config)
+
+    seen: set[str] = set()
+    documents: list[Document] = []
+    for result in results:
+        for document in result:
+            key = document_key(document)
+            if key not in seen:
+                seen.add(key)
+                documents.append(document)
+    return documents
+
+
+@lru_cache(maxsize=1)
+def _warn_retrieval_cache_disabled() -> None:
+    logger.warning(
+        "retrieval_cache_ttl is set but neither CACHE_REDIS_URL nor CACHE_DIR is: "
+        "ingestion could not invalidate cached results, so the cache is disabled"
+    )
+
+
+def get_retrieval_cache_ttl(configuration: BaseConfiguration) -> float:
+    """Return the TTL of the retrieval cache, 0 if it must be disabled.
+
+    Cached results are invalidated through the index generation bumped by
+    ingestion, which runs in another process: without a shared store, the bump
+    would not be seen and results of the previous index would be served.
+    """
+    if configuration.retrieval_cache_ttl > 0 and get_shared_store() is None:
+        _warn_retrieval_cache_disabled()
+        return 0
+    return configuration.retrieval_cache_ttl
+
+
+@asynccontextmanager
+async def make_async_weaviate_retriever(
+    configuration: BaseConfiguration,
+    embedding_model: Embeddings,
+    fetch_vectors: bool = False,
+) -> AsyncIterator[BaseRetriever]:
+    async with async_weaviate_pool.borrow() as weaviate_client:
+        yield AsyncWeaviateRetriever(
+            collection=weaviate_client.collections.get(
+                WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+            ),
             embedding=embedding_model,
             attributes=["source", "title"],
+            search_kwargs={**configuration.search_kwargs, "return_uuids": True},
+            cache=retrieval_cache,
+            cache_ttl=get_retrieval_cache_ttl(configuration),
+            vector_cache=document_vector_cache if fetch_vectors else None,
         )
-        search_kwargs = {**configuration.search_kwargs, "return_uuids": True}
-        yield store.as_retriever(search_kwargs=search_kwargs)
+
+
+def make_local_retriever(
+    configuration: BaseConfiguration,
+    embedding_model: Embeddings,
+    fetch_vectors: bool = False,
+) -> BaseRetriever:
+    index = load_local_index(get_local_index_path())
+    if index.embedding_model != configuration.embedding_model:
+        raise ValueError(
+            f"The local index was built with {index.embedding_model}, "
+            f"but the configured embedding model is {configuration.embedding_model}."
+        )
+    return LocalIndexRetriever(
+        index=index,
+        embedding=embedding_model,
+        search_kwargs=dict(configuration.search_kwargs),
+        vector_cache=document_vector_cache if fetch_vectors else None,
+    )
+
+
+def _unrecognized_retriever_provider(configuration: BaseConfiguration) -> ValueError:
+    return ValueError(
+        "Unrecognized retriever_provider in configuration. "
+        f"Expected one of: {', '.join(get_args(get_type_hints(BaseConfiguration)['retriever_provider']))}\n"
+        f"Got: {configuration.retriever_provider}"
+    )
 
 
 @contextmanager
 def make_retriever(
     config: RunnableConfig,
 ) -> Iterator[BaseRetriever]:
-    """Create a retriever for the agent, based on the current configuration."""
+    """Create a retriever for the agent, based on the current configuration.
+
+    The Weaviate client and text encoder are borrowed from process-wide pools, so
+    entering this context manager does not open any new connections.
+    """
     configuration = BaseConfiguration.from_runnable_config(config)
-    embedding_model = make_text_encoder(configuration.embedding_model)
+    embedding_model = get_text_encoder(configuration.embedding_model)
     match configuration.retriever_provider:
         case "weaviate":
             with make_weaviate_retriever(configuration, embedding_model) as retriever:
                 yield retriever
 
+        case "local":
+            yield make_local_retriever(configuration, embedding_model)
+
         case _:
-            raise ValueError(
-                "Unrecognized retriever_provider in configuration. "
-                f"Expected one of: {', '.join(BaseConfiguration.__annotations__['retriever_provider'].__args__)}\n"
-                f"Got: {configuration.retriever_provider}"
-            )
+            raise _unrecognized_retriever_provider(configuration)
+
+
+@asynccontextmanager
+async def make_async_retriever(
+    config: RunnableConfig, fetch_vectors: bool = False
+) -> AsyncIterator[BaseRetriever]:
+    """Async counterpart of `make_retriever`, for use inside async graph nodes.
+
+    Args:
+        config (RunnableConfig): The configuration of the run.
+        fetch_vectors (bool): Whether to also fetch the index vectors of the
+            results into `document_vector_cache`, for `aget_document_vectors`.
+    """
+    configuration = BaseConfiguration.from_runnable_config(config)
+    embedding_model = get_text_encoder(configuration.embedding_model)
+    match configuration.retriever_provider:
+        case "weaviate":
+            async with make_async_weaviate_retriever(
+                configuration, embedding_model, fetch_vectors
+            ) as retriever:
+                yield retriever
+
+        case "local":
+            yield make_local_retriever(configuration, embedding_model, fetch_vectors)
+
+        case _:
+            raise _unrecognized_retriever_provider(configuration)
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from typing import Literal
 
 from backend.configuration import BaseConfiguration
+from backend.context import DEFAULT_CONTEXT_BUDGET, DEFAULT_CONTEXT_BUDGETS
 from backend.retrieval_graph import prompts
 
 
@@ -28,6 +30,165 @@ class AgentConfiguration(BaseConfiguration):
         },
     )
 
+    # routing
+
+    router_mode: Literal["none", "llm", "local"] = field(
+        default="local",
+        metadata={
+            "description": "How the user's message is routed to research, a request for more information, or a general answer. 'local' (the default) classifies the first message of a conversation by similarity with labeled example messages and only calls query_model when unsure (follow-up messages, which depend on the conversation, are always routed by query_model); 'llm' always calls query_model, adding a model call before every research; 'none' always researches."
+        },
+    )
+
+    router_min_similarity: float = field(
+        default=0.3,
+        metadata={
+            "description": "In 'local' router mode, minimum cosine similarity between the message and the closest route's examples for the local classification to be used."
+        },
+    )
+
+    router_min_margin: float = field(
+        default=0.1,
+        metadata={
+            "description": "In 'local' router mode, minimum similarity gap between the closest and second closest routes for the local classification to be used."
+        },
+    )
+
+    # retrieval
+
+    retrieval_mode: Literal["parallel", "batched"] = field(
+        default="parallel",
+        metadata={
+            "description": "How the researcher retrieves documents for its generated queries. 'parallel' fans out one retrieval task per query; 'batched' embeds all queries in a single request and searches them concurrently in one task."
+        },
+    )
+
+    # research
+
+    research_mode: Literal["sequential", "parallel", "streaming"] = field(
+        default="sequential",
+        metadata={
+            "description": "How the steps of the research plan are conducted. 'sequential' runs the researcher on one step at a time; 'parallel' runs it on up to max_parallel_research_steps steps at once; 'streaming' streams the plan and runs the researcher on each step as soon as it is generated, up to max_parallel_research_steps steps at once."
+        },
+    )
+
+    max_parallel_research_steps: int = field(
+        default=4,
+        metadata={
+            "description": "The maximum number of research steps conducted concurrently in 'parallel' and 'streaming' research modes. The next step starts as soon as one is done."
+        },
+    )
+
+    research_min_novelty: float = field(
+        default=0.0,
+        metadata={
+            "description": "In 'sequential' research mode, skip the remaining research steps when a step contributes less than this fraction of new unique documents. 0 disables this criterion."
+        },
+    )
+
+    research_target_documents: int = field(
+        default=0,
+        metadata={
+            "description": "In 'sequential' research mode, skip the remaining research steps once this many collected documents have a cosine similarity with the user's question of at least research_relevance_threshold. 0 disables this criterion."
+        },
+    )
+
+    research_relevance_threshold: float = field(
+        default=0.5,
+        metadata={
+            "description": "Minimum cosine similarity between a document and the user's question for the document to count towards research_target_documents."
+        },
+    )
+
+    # diversity
+
+    mmr: bool = field(
+        default=False,
+        metadata={
+            "description": "Whether to select a diverse subset of the collected documents by maximal marginal relevance (MMR) before responding, dropping chunks that overlap with already selected ones."
+        },
+    )
+
+    mmr_lambda: float = field(
+        default=0.7,
+        metadata={
+            "description": "MMR trade-off between relevance to the question (1) and diversity (0)."
+        },
+    )
+
+    mmr_top_k: int = field(
+        default=10,
+        metadata={"description": "The number of documents selected by MMR."},
+    )
+
+    # reranking
+
+    reranker: Literal["none", "lexical", "cross-encoder", "cross-encoder-onnx"] = field(
+        default="none",
+        metadata={
+            "description": "How the collected documents are reranked against the user's question before responding. 'lexical' uses BM25 over the documents; 'cross-encoder' and 'cross-encoder-onnx' run reranker_model locally on CPU (requires the 'rerank' extra, falls back to 'lexical' when it is not installed; the model is loaded in a thread on first use); 'none' keeps the retrieval order."
+        },
+    )
+
+    reranker_model: str = field(
+        default="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        metadata={
+            "description": "The Hugging Face cross-encoder used by the cross-encoder rerankers."
+        },
+    )
+
+    rerank_top_n: int = field(
+        default=8,
+        metadata={
+            "description": "The number of documents passed to the response model after reranking."
+        },
+    )
+
+    # context
+
+    context_token_budgets: dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_CONTEXT_BUDGETS),
+        metadata={
+            "description": "Token budget of the documents in the response prompt, by response model name or by prefix of the name (e.g. 'groq/'). Documents are added in ranked order while they fit."
+        },
+    )
+
+    default_context_token_budget: int = field(
+        default=DEFAULT_CONTEXT_BUDGET,
+        metadata={
+            "description": "Token budget of the documents in the response prompt for response models not listed in context_token_budgets."
+        },
+    )
+
+    # prompt caching
+
+    prompt_caching: bool = field(
+        default=True,
+        metadata={
+            "description": "Whether to mark the response prompt (system prompt with the documents, then the conversation history) with cache breakpoints, so that follow-up turns reuse the provider's prompt cache. Only applies to Anthropic models."
+        },
+    )
+
+    # semantic answer cache
+
+    semantic_cache: bool = field(
+        default=False,
+        metadata={
+            "description": "Whether to answer first-turn questions from the semantic cache of previous answers, skipping research and response generation on a hit. Requires a store shared with ingestion (CACHE_REDIS_URL or CACHE_DIR), through which re-ingesting the index invalidates cached answers; without one, the cache is disabled."
+        },
+    )
+
+    semantic_cache_threshold: float = field(
+        default=0.95,
+        metadata={
+            "description": "Minimum cosine similarity between the question and a cached question for the cached answer to be returned."
+        },
+    )
+
+    semantic_cache_ttl: int = field(
+        default=24 * 60 * 60,
+        metadata={"description": "Seconds for which a cached answer can be returned."},
+    )
+
     # prompts
 
     router_system_prompt: str = field(
@@ -69,3 +230,8 @@ class AgentConfiguration(BaseConfiguration):
         default=prompts.RESPONSE_SYSTEM_PROMPT,
         metadata={"description": "The system prompt used for generating responses."},
     )
+
+    @property
+    def uses_document_vectors(self) -> bool:
+        """Whether responding compares the vectors of the collected documents."""
+        return self.mmr or self.research_target_documents > 0
@@ -6,16 +6,172 @@ and key functions for processing & routing user queries, generating research pla
 conducting research, and formulating responses.
 """
 
-from typing import Any, Literal, TypedDict, cast
-
-from langchain_core.messages import BaseMessage
+import asyncio
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Literal, Optional, TypedDict, Union, cast
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
-
+from langgraph.types import Command
+
+from backend.cache import aget_index_generation, get_shared_store
+from backend.constants import WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+from backend.context import get_context_budget, pack_context
+from backend.mmr import mmr_select
+from backend.rerank import aget_reranker
+from backend.retrieval import aget_document_vectors, document_key, get_text_encoder
 from backend.retrieval_graph.configuration import AgentConfiguration
+from backend.retrieval_graph.local_router import get_local_router
+from backend.retrieval_graph.plan_stream import astream_string_list
 from backend.retrieval_graph.researcher_graph.graph import graph as researcher_graph
 from backend.retrieval_graph.state import AgentState, InputState, Router
-from backend.utils import format_docs, load_chat_model
+from backend.semantic_cache import SemanticCache
+from backend.utils import (
+    cache_breakpoint,
+    format_docs,
+    get_prompt_cache_usage,
+    load_chat_model,
+    load_structured_chat_model,
+    supports_prompt_caching,
+    with_cache_breakpoint,
+)
+
+logger = logging.getLogger(__name__)
+
+semantic_cache = SemanticCache(
+    int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+)
+
+
+@lru_cache(maxsize=1)
+def _warn_semantic_cache_disabled() -> None:
+    logger.warning(
+        "semantic_cache is set but neither CACHE_REDIS_URL nor CACHE_DIR is: "
+        "ingestion could not invalidate cached answers, so the cache is disabled"
+    )
+
+
+def _use_semantic_cache(configuration: AgentConfiguration) -> bool:
+    """Return whether the semantic cache is enabled and can be invalidated.
+
+    Cached answers are invalidated through the index generation bumped by
+    ingestion, which runs in another process: without a shared store, the bump
+    would not be seen and answers based on the previous index would be served.
+    """
+    if configuration.semantic_cache and get_shared_store() is None:
+        _warn_semantic_cache_disabled()
+        return False
+    return configuration.semantic_cache
+
+
+def _context_budget(configuration: AgentConfiguration) -> int:
+    """Return the context token budget of the configured response model."""
+    return get_context_budget(
+        configuration.response_model,
+        configuration.context_token_budgets,
+        configuration.default_context_token_budget,
+    )
+
+
+def _semantic_cache_scope(configuration: AgentConfiguration) -> str:
+    """Scope cached answers by models, document selection settings and prompts."""
+    prompts = "\x00".join(
+        [
+            configuration.research_plan_system_prompt,
+            configuration.generate_queries_system_prompt,
+            configuration.response_system_prompt,
+        ]
+    )
+    prompt_version = hashlib.sha256(prompts.encode()).hexdigest()[:16]
+    return "\x00".join(
+        [
+            configuration.response_model,
+            configuration.embedding_model,
+            f"mmr={configuration.mmr},{configuration.mmr_lambda},{configuration.mmr_top_k}",
+            f"rerank={configuration.reranker},{configuration.rerank_top_n}",
+            f"budget={_context_budget(configuration)}",
+            prompt_version,
+        ]
+    )
+
+
+def _first_turn_question(state: AgentState) -> Optional[str]:
+    """Return the user's question if this is the first turn of the conversation."""
+    human_messages = [message for message in state.messages if message.type == "human"]
+    if len(human_messages) != 1 or not isinstance(human_messages[0].content, str):
+        return None
+    return human_messages[0].content
+
+
+async def check_semantic_cache(
+    state: AgentState, *, config: RunnableConfig
+) -> dict[str, Any]:
+    """Answer the user's question from the semantic cache, if possible.
+
+    Only first-turn questions are looked up, since follow-up answers depend on the
+    conversation history.
+
+    Args:
+        state (AgentState): The current state of the agent, including conversation history.
+        config (RunnableConfig): Configuration with the semantic cache settings.
+
+    Returns:
+        dict[str, Any]: On a hit, the cached answer as a message, the documents it was based
+            on and 'semantic_cache_hit' set to True. Otherwise, 'semantic_cache_hit' set to False.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    question = _first_turn_question(state)
+    if not _use_semantic_cache(configuration) or question is None:
+        return {"semantic_cache_hit": False}
+
+    vector = await get_text_encoder(configuration.embedding_model).aembed_query(
+        question
+    )
+    entry = semantic_cache.lookup(
+        vector,
+        scope=_semantic_cache_scope(configuration),
+        threshold=configuration.semantic_cache_threshold,
+        ttl=configuration.semantic_cache_ttl,
+        generation=await aget_index_generation(
+            WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+        ),
+    )
+    if entry is None:
+        return {"semantic_cache_hit": False}
+    return {
+        "messages": [AIMessage(content=entry.answer)],
+        "answer": entry.answer,
+        "documents": entry.documents,
+        "query": question,
+        "semantic_cache_hit": True,
+        "prompt_cache_read_tokens": 0,
+        "prompt_cache_creation_tokens": 0,
+    }
+
+
+def route_semantic_cache(
+    state: AgentState, *, config: RunnableConfig
+) -> Literal["analyze_and_route_query", "create_research_plan", "__end__"]:
+    """Finish the run on a semantic cache hit, otherwise route the query.
+
+    Args:
+        state (AgentState): The current state of the agent.
+        config (RunnableConfig): Configuration with the router mode.
+
+    Returns:
+        Literal["analyze_and_route_query", "create_research_plan", "__end__"]: The next step to take.
+    """
+    if state.semantic_cache_hit:
+        return END
+    if AgentConfiguration.from_runnable_config(config).router_mode == "none":
+        return "create_research_plan"
+    return "analyze_and_route_query"
 
 
 async def analyze_and_route_query(
@@ -23,8 +179,11 @@ async def analyze_and_route_query(
 ) -> dict[str, Router]:
     """Analyze the user's query and determine the appropriate routing.
 
-    This function uses a language model to classify the user's query and decide how to route it
-    within the conversation flow.
+    In "local" router mode, the first user message of a conversation is first classified by
+    similarity with labeled examples, without an LLM call. When that classification is not
+    confident enough, for follow-up messages (whose meaning depends on the conversation), or in
+    "llm" mode, a language model classifies the user's query and decides how to route it within
+    the conversation flow.
 
     Args:
         state (AgentState): The current state of the agent, including conversation history.
@@ -33,17 +192,22 @@ async def analyze_and_route_query(
     Returns:
         dict[str, Router]: A dictionary containing the 'router' key with the classification result (classification type and logic).
     """
-    # allow skipping the router for testing
-    if state.router and state.router["logic"]:
-        return {"router": state.router}
-
     configuration = AgentConfiguration.from_runnable_config(config)
-    structured_output_kwargs = (
-        {"method": "function_calling"} if "openai" in configuration.query_model else {}
-    )
-    model = load_chat_model(configuration.query_model).with_structured_output(
-        Router, **structured_output_kwargs
-    )
+    message = state.messages[-1].content
+    if (
+        configuration.router_mode == "local"
+        and len(state.messages) == 1
+        and isinstance(message, str)
+    ):
+        router = await get_local_router(configuration.embedding_model).aroute(
+            message,
+            min_similarity=configuration.router_min_similarity,
+            min_margin=configuration.router_min_margin,
+        )
+        if router is not None:
+            return {"router": router}
+
+    model = load_structured_chat_model(configuration.query_model, Router)
     messages = [
         {"role": "system", "content": configuration.router_system_prompt}
     ] + state.messages
@@ -124,34 +288,100 @@ async def respond_to_general_query(
     return {"messages": [response]}
 
 
+class Plan(TypedDict):
+    """Generate research plan."""
+
+    steps: list[str]
+
+
+async def _research_step(step: str, semaphore: asyncio.Semaphore) -> list[Document]:
+    """Research one step of the plan once the semaphore lets it run."""
+    async with semaphore:
+        result = await researcher_graph.ainvoke({"question": step})
+    return result["documents"]
+
+
+async def _stream_research(
+    messages: list[Any], configuration: AgentConfiguration
+) -> list[Document]:
+    """Stream the research plan and research each step as soon as it is generated.
+
+    Falls back to generating the whole plan first if the query model does not
+    support tool calling, or did not return any step.
+
+    Returns:
+        list[Document]: The documents retrieved for the steps of the plan, in plan order.
+    """
+    semaphore = asyncio.Semaphore(configuration.max_parallel_research_steps)
+    steps: list[str] = []
+    tasks: list[asyncio.Task] = []
+    try:
+        try:
+            async for step in astream_string_list(
+                load_chat_model(configuration.query_model),
+                Plan,
+                "steps",
+                messages,
+                {"tags": ["langsmith:nostream"]},
+            ):
+                steps.append(step)
+                tasks.append(asyncio.create_task(_research_step(step, semaphore)))
+        except NotImplementedError:
+            pass
+        if not steps:
+            model = load_structured_chat_model(configuration.query_model, Plan)
+            response = cast(
+                Plan, await model.ainvoke(messages, {"tags": ["langsmith:nostream"]})
+            )
+            steps = response["steps"]
+            tasks = [
+                asyncio.create_task(_research_step(step, semaphore)) for step in steps
+            ]
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return [document for documents in results for document in documents]
+
+
 async def create_research_plan(
     state: AgentState, *, config: RunnableConfig
-) -> dict[str, list[str]]:
+) -> Union[dict[str, Any], Command]:
     """Create a step-by-step research plan for answering a LangChain-related query.
 
+    In "streaming" research mode, the plan is streamed and each step is researched as soon as it is
+    generated, overlapping the generation of the plan with the first retrievals. The plan is then
+    returned as already conducted.
+
     Args:
         state (AgentState): The current state of the agent, including conversation history.
         config (RunnableConfig): Configuration with the model used to generate the plan.
 
     Returns:
-        dict[str, list[str]]: A dictionary with a 'steps' key containing the list of research steps.
+        Union[dict[str, Any], Command]: A dictionary with a 'steps' key containing the list of research steps.
+            In "streaming" research mode, an update clearing the documents of previous turns, then adding
+            the documents retrieved for every step, with no remaining step.
     """
-
-    class Plan(TypedDict):
-        """Generate research plan."""
-
-        steps: list[str]
-
     configuration = AgentConfiguration.from_runnable_config(config)
-    structured_output_kwargs = (
-        {"method": "function_calling"} if "openai" in configuration.query_model else {}
-    )
-    model = load_chat_model(configuration.query_model).with_structured_output(
-        Plan, **structured_output_kwargs
-    )
     messages = [
         {"role": "system", "content": configuration.research_plan_system_prompt}
     ] + state.messages
+    if configuration.research_mode == "streaming":
+        documents = await _stream_research(messages, configuration)
+        # Two updates of 'documents', applied in order by its reducer.
+        return Command(
+            update=[
+                ("documents", "delete"),
+                ("documents", documents),
+                ("steps", []),
+                ("query", state.messages[-1].content),
+                ("skipped_steps", []),
+                ("research_stop_reason", ""),
+            ]
+        )
+
+    model = load_structured_chat_model(configuration.query_model, Plan)
     response = cast(
         Plan, await model.ainvoke(messages, {"tags": ["langsmith:nostream"]})
     )
@@ -159,16 +389,53 @@ async def create_research_plan(
         "steps": response["steps"],
         "documents": "delete",
         "query": state.messages[-1].content,
+        "skipped_steps": [],
+        "research_stop_reason": "",
     }
 
 
-async def conduct_research(state: AgentState) -> dict[str, Any]:
+async def _early_stop_reason(
+    state: AgentState, documents: list[Document], configuration: AgentConfiguration
+) -> Optional[str]:
+    """Return why the research should stop after a step that retrieved ``documents``."""
+    known = {document_key(document) for document in state.documents}
+    retrieved = {document_key(document): document for document in documents}
+    new = [document for key, document in retrieved.items() if key not in known]
+    novelty = len(new) / len(retrieved) if retrieved else 0.0
+    if novelty < configuration.research_min_novelty:
+        return f"novelty {novelty:.2f} < {configuration.research_min_novelty}"
+
+    if configuration.research_target_documents > 0:
+        gathered = [*state.documents, *new]
+        encoder = get_text_encoder(configuration.embedding_model)
+        query = np.asarray(await encoder.aembed_query(state.query), dtype=np.float32)
+        vectors = np.asarray(
+            await aget_document_vectors(gathered, encoder), dtype=np.float32
+        )
+        similarities = (vectors @ query) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12
+        )
+        relevant = int(
+            (similarities >= configuration.research_relevance_threshold).sum()
+        )
+        if relevant >= configuration.research_target_documents:
+            return (
+                f"{relevant} relevant documents >= "
+                f"{configuration.research_target_documents}"
+            )
+    return None
+
+
+async def conduct_research(
+    state: AgentState, *, config: RunnableConfig
+) -> dict[str, Any]:
     """Execute the first step of the research plan.
 
     This function takes the first step from the research plan and uses it to conduct research.
 
     Args:
         state (AgentState): The current state of the agent, including the research plan steps.
+        config (RunnableConfig): Configuration with the early stopping criteria.
 
     Returns:
         dict[str, list[str]]: A dictionary with 'documents' containing the research results and
@@ -177,28 +444,95 @@ async def conduct_research(state: AgentState) -> dict[str, Any]:
     Behavior:
         - Invokes the researcher_graph with the first step of the research plan.
         - Updates the state with the retrieved documents and removes the completed step.
+        - If the step brought too few new documents, or enough relevant documents have been
+          gathered, skips the remaining steps and records them in 'skipped_steps'.
     """
     result = await researcher_graph.ainvoke({"question": state.steps[0]})
-    return {"documents": result["documents"], "steps": state.steps[1:]}
+    update = {"documents": result["documents"], "steps": state.steps[1:]}
+    if not update["steps"]:
+        return update
+
+    configuration = AgentConfiguration.from_runnable_config(config)
+    reason = await _early_stop_reason(state, result["documents"], configuration)
+    if reason is not None:
+        update.update(
+            steps=[], skipped_steps=update["steps"], research_stop_reason=reason
+        )
+    return update
+
+
+async def conduct_research_steps(
+    state: AgentState, *, config: RunnableConfig
+) -> dict[str, Any]:
+    """Execute every step of the research plan concurrently.
+
+    At most `max_parallel_research_steps` steps are researched at once, and the next step
+    starts as soon as one is done.
+
+    Args:
+        state (AgentState): The current state of the agent, including the research plan steps.
+        config (RunnableConfig): Configuration with the maximum number of parallel steps.
+
+    Returns:
+        dict[str, list]: A dictionary with 'documents' containing the research results, in plan
+            order, and no remaining 'steps'.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    semaphore = asyncio.Semaphore(configuration.max_parallel_research_steps)
+    results = await asyncio.gather(
+        *(_research_step(step, semaphore) for step in state.steps)
+    )
+    documents = [document for documents in results for document in documents]
+    return {"documents": documents, "steps": []}
 
 
-def check_finished(state: AgentState) -> Literal["respond", "conduct_research"]:
+def check_finished(
+    state: AgentState, *, config: RunnableConfig
+) -> Literal["respond", "conduct_research", "conduct_research_steps"]:
     """Determine if the research process is complete or if more research is needed.
 
     This function checks if there are any remaining steps in the research plan:
-        - If there are, route back to the `conduct_research` node
+        - If there are, route to the `conduct_research` node, or in "parallel" research mode,
+          to the `conduct_research_steps` node
         - Otherwise, route to the `respond` node
 
     Args:
         state (AgentState): The current state of the agent, including the remaining research steps.
+        config (RunnableConfig): Configuration with the research mode.
 
     Returns:
-        Literal["respond", "conduct_research"]: The next step to take based on whether research is complete.
+        Literal["respond", "conduct_research", "conduct_research_steps"]: The next step to take
+            based on whether research is complete.
     """
-    if len(state.steps or []) > 0:
-        return "conduct_research"
-    else:
+    if not state.steps:
         return "respond"
+    configuration = AgentConfiguration.from_runnable_config(config)
+    if configuration.research_mode == "parallel":
+        return "conduct_research_steps"
+    return "conduct_research"
+
+
+async def _select_documents(
+    state: AgentState, configuration: AgentConfiguration
+) -> list[Document]:
+    """Select the documents passed to the response model (MMR, then reranking)."""
+    documents = state.documents
+    if configuration.mmr and len(documents) > configuration.mmr_top_k:
+        encoder = get_text_encoder(configuration.embedding_model)
+        selected = mmr_select(
+            await encoder.aembed_query(state.query),
+            await aget_document_vectors(documents, encoder),
+            configuration.mmr_top_k,
+            configuration.mmr_lambda,
+        )
+        documents = [documents[i] for i in selected]
+
+    reranker = await aget_reranker(configuration.reranker, configuration.reranker_model)
+    if reranker is not None:
+        documents = await reranker.arerank(
+            state.query, documents, configuration.rerank_top_n
+        )
+    return documents
 
 
 async def respond(
@@ -206,7 +540,14 @@ async def respond(
 ) -> dict[str, list[BaseMessage]]:
     """Generate a final response to the user's query based on the conducted research.
 
-    This function formulates a comprehensive answer using the conversation history and the documents retrieved by the researcher.
+    This function formulates a comprehensive answer using the conversation history and the documents retrieved by the researcher,
+    optionally diversified (MMR) and reranked against the user's question to keep only the most relevant ones.
+    Documents are then packed, in that order and without the overlaps between chunks of a page, into the
+    context token budget of the response model.
+
+    With prompt caching, the system prompt and the end of the conversation are marked as cache breakpoints:
+    a follow-up turn reads the history (and the system prompt, if the documents did not change) from the
+    provider's cache. The cached and newly cached token counts are reported in the state.
 
     Args:
         state (AgentState): The current state of the agent, including retrieved documents and conversation history.
@@ -217,26 +558,76 @@ async def respond(
     """
     configuration = AgentConfiguration.from_runnable_config(config)
     model = load_chat_model(configuration.response_model)
-    # TODO: add a re-ranker here
-    top_k = 20
-    context = format_docs(state.documents[:top_k])
+    documents = pack_context(
+        await _select_documents(state, configuration), _context_budget(configuration)
+    )
+    context = format_docs(documents)
     prompt = configuration.response_system_prompt.format(context=context)
-    messages = [{"role": "system", "content": prompt}] + state.messages
+    system_content: Union[str, list[dict[str, Any]]] = prompt
+    conversation = list(state.messages)
+    if configuration.prompt_caching and supports_prompt_caching(
+        configuration.response_model
+    ):
+        system_content = cache_breakpoint(prompt)
+        # The last message of the conversation is the second breakpoint.
+        conversation[-1] = with_cache_breakpoint(conversation[-1])
+    messages = [{"role": "system", "content": system_content}] + conversation
     response = await model.ainvoke(messages)
-    return {"messages": [response], "answer": response.content}
+    cache_usage = get_prompt_cache_usage(response)
+
+    question = _first_turn_question(state)
+    if (
+        question
+        and isinstance(response.content, str)
+        and _use_semantic_cache(configuration)
+    ):
+        vector = await get_text_encoder(configuration.embedding_model).aembed_query(
+            question
+        )
+        semantic_cache.add(
+            vector,
+            scope=_semantic_cache_scope(configuration),
+            generation=await aget_index_generation(
+                WEAVIATE_GENERAL_GUIDES_AND_TUTORIALS_INDEX_NAME
+            ),
+            question=question,
+            answer=response.content,
+            documents=documents,
+        )
+    return {
+        "messages": [response],
+        "answer": response.content,
+        "prompt_cache_read_tokens": cache_usage["cache_read"],
+        "prompt_cache_creation_tokens": cache_usage["cache_creation"],
+    }
 
 
 # Define the graph
 
 
 builder = StateGraph(AgentState, input=InputState, config_schema=AgentConfiguration)
+builder.add_node(check_semantic_cache)
+builder.add_node(analyze_and_route_query)
+builder.add_node(ask_for_more_info)
+builder.add_node(respond_to_general_query)
 builder.add_node(create_research_plan)
 builder.add_node(conduct_research)
+builder.add_node(conduct_research_steps)
 builder.add_node(respond)
 
-builder.add_edge(START, "create_research_plan")
-builder.add_edge("create_research_plan", "conduct_research")
-builder.add_conditional_edges("conduct_research", check_finished)
+builder.add_edge(START, "check_semantic_cache")
+builder.add_conditional_edges("check_semantic_cache", route_semantic_cache)
+builder.add_conditional_edges("analyze_and_route_query", route_query)
+builder.add_edge("ask_for_more_info", END)
+builder.add_edge("respond_to_general_query", END)
+research_paths = ["conduct_research", "conduct_research_steps", "respond"]
+builder.add_conditional_edges(
+    "create_research_plan", check_finished, path_map=research_paths
+)
+builder.add_conditional_edges(
+    "conduct_research", check_finished, path_map=research_paths
+)
+builder.add_edge("conduct_research_steps", "respond")
 builder.add_edge("respond", END)
 
 # Compile into a graph object that you can invoke and deploy.
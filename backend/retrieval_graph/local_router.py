@@ -0,0 +1,139 @@
+"""Embedding-based query router, answering the common cases without an LLM call.
+
+The user's message is embedded and compared with the centroid of a few labeled
+example messages per route ("langchain", "more-info", "general"). When the closest
+centroid is both similar enough and clearly closer than the runner-up, its route
+is used directly; otherwise the caller falls back to the LLM router.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.retrieval import get_text_encoder
+from backend.retrieval_graph.state import Router
+
+ROUTER_EXAMPLES: dict[str, list[str]] = {
+    "general": [
+        "hi",
+        "hello!",
+        "hey there",
+        "good morning",
+        "thanks",
+        "thank you so much!",
+        "thanks, that helped",
+        "ok cool",
+        "bye",
+        "who are you?",
+        "what can you do?",
+        "tell me a joke",
+        "what's the weather like today?",
+        "what is the capital of France?",
+        "write me a poem about the sea",
+    ],
+    "more-info": [
+        "it doesn't work",
+        "I get an error",
+        "my code is broken, help",
+        "this isn't working",
+        "I have a bug",
+        "it crashes",
+        "help",
+        "why does it fail?",
+        "something is wrong with my agent",
+        "it returns the wrong result",
+    ],
+    "langchain": [
+        "How do I use RunnableWithMessageHistory?",
+        "How do I persist checkpoints with PostgresSaver.from_conn_string?",
+        "What is LCEL?",
+        "How do I stream tokens from a chat model?",
+        "How do I build a LangGraph agent with memory?",
+        "What is the difference between invoke, batch and stream?",
+        "How can I add a retriever to a chain?",
+        "How do I use structured output with a chat model?",
+        "How do I split documents into chunks with a text splitter?",
+        "How do I create a tool and bind it to a model?",
+        "How do I add human-in-the-loop interrupts to a graph?",
+        "How do I load documents from a PDF?",
+        "How do I use a vector store like Chroma or Weaviate?",
+        "How do I trace my chain with LangSmith?",
+        "How do I call a subgraph from a LangGraph node?",
+    ],
+}
+
+ROUTER_LOGIC: dict[str, str] = {
+    "general": "The message is a greeting, a thank-you, or a question unrelated to LangChain.",
+    "more-info": "The user reports a problem without enough details (such as the error or code) to investigate it.",
+    "langchain": "The message is a question about LangChain that can be answered from its documentation.",
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class NearestCentroidRouter:
+    """Routes messages to the route whose example centroid is the most similar.
+
+    Args:
+        embedding (Embeddings): Encoder of the messages and examples.
+        examples (dict[str, list[str]]): Example messages per route.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        examples: dict[str, list[str]] = ROUTER_EXAMPLES,
+    ) -> None:
+        self.embedding = embedding
+        self.examples = examples
+        self.labels = list(examples)
+        self._centroids: Optional[np.ndarray] = None
+
+    async def _aget_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            texts = [text for label in self.labels for text in self.examples[label]]
+            vectors = _normalize(
+                np.asarray(await self.embedding.aembed_documents(texts))
+            )
+            centroids, start = [], 0
+            for label in self.labels:
+                end = start + len(self.examples[label])
+                centroids.append(vectors[start:end].mean(axis=0))
+                start = end
+            self._centroids = _normalize(np.asarray(centroids))
+        return self._centroids
+
+    async def ascores(self, message: str) -> dict[str, float]:
+        """Return the cosine similarity of the message with each route centroid."""
+        centroids = await self._aget_centroids()
+        query = _normalize(np.asarray(await self.embedding.aembed_query(message)))
+        return dict(zip(self.labels, (centroids @ query).tolist()))
+
+    async def aroute(
+        self, message: str, min_similarity: float, min_margin: float
+    ) -> Optional[Router]:
+        """Return the route of the message, or None if the classifier is unsure.
+
+        Args:
+            message (str): The user's message.
+            min_similarity (float): Minimum similarity with the closest centroid.
+            min_margin (float): Minimum similarity gap with the second closest one.
+        """
+        scores = await self.ascores(message)
+        (best, best_score), (_, second_score) = sorted(
+            scores.items(), key=lambda item: item[1], reverse=True
+        )[:2]
+        if best_score < min_similarity or best_score - second_score < min_margin:
+            return None
+        return Router(type=best, logic=ROUTER_LOGIC[best])
+
+
+@lru_cache(maxsize=None)
+def get_local_router(embedding_model: str) -> NearestCentroidRouter:
+    """Return the process-wide router for an embedding model."""
+    return NearestCentroidRouter(get_text_encoder(embedding_model))
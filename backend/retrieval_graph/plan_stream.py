@@ -0,0 +1,153 @@
+"""Streaming of the research plan, step by step.
+
+The research plan is requested as a forced tool call whose arguments are
+streamed by the provider as partial JSON (for example ``{"steps": ["Fi`` then
+``nd the docs", "Rea``...). `IncrementalStringListParser` consumes these
+fragments and returns each step as soon as its closing quote arrives, so that
+research on the first steps can start while the next ones are generated.
+
+Providers that send the tool arguments in one piece (or the whole message at
+the end of the stream) are handled by parsing the final message: the steps not
+seen while streaming are returned at the end.
+"""
+
+import json
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.runnables import RunnableConfig
+
+
+class IncrementalStringListParser:
+    """Incrementally parses a JSON object, returning the strings of one of its lists.
+
+    Only the list at the top level of the object under ``key`` is extracted;
+    other fields, nested values and text around the object are skipped. Quoted
+    text is tracked from the start, so brackets quoted in the text before the
+    object are not taken for JSON. Strings are decoded (escapes included) when
+    complete, so a string split across fragments, even in the middle of an
+    escape sequence, is returned once.
+
+    Args:
+        key (str): Name of the list field.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.values: list[str] = []
+        # Open containers: {"type": "object", "key": ..., "expect_key": ...} or
+        # {"type": "array"}.
+        self._stack: list[dict[str, Any]] = []
+        self._string: Optional[list[str]] = None
+        self._escape = False
+
+    def _in_list(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[0]["key"] == self.key
+            and self._stack[1]["type"] == "array"
+        )
+
+    def _end_string(self) -> Optional[str]:
+        raw = "".join(self._string or [])
+        self._string = None
+        top = self._stack[-1] if self._stack else None
+        if top is None:
+            return None
+        if top["type"] == "object" and top["expect_key"]:
+            top["key"] = json.loads(f'"{raw}"')
+            return None
+        if self._in_list():
+            value = json.loads(f'"{raw}"')
+            self.values.append(value)
+            return value
+        return None
+
+    def feed(self, text: str) -> list[str]:
+        """Consume a fragment of JSON and return the strings of the list it completes."""
+        completed = []
+        for char in text:
+            if self._string is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    value = self._end_string()
+                    if value is not None:
+                        completed.append(value)
+                    continue
+                self._string.append(char)
+            elif char == '"':
+                self._string = []
+            elif char == "{":
+                self._stack.append({"type": "object", "key": None, "expect_key": True})
+            elif char == "[":
+                if self._stack:
+                    self._stack.append({"type": "array"})
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+            elif char == ":" and self._stack and self._stack[-1]["type"] == "object":
+                self._stack[-1]["expect_key"] = False
+            elif char == "," and self._stack and self._stack[-1]["type"] == "object":
+                self._stack[-1].update(key=None, expect_key=True)
+        return completed
+
+
+def _final_values(message: Optional[AIMessageChunk], key: str) -> list[str]:
+    """Return the list from the tool call (or JSON content) of the complete message."""
+    if message is None:
+        return []
+    for tool_call in message.tool_calls:
+        values = tool_call["args"].get(key)
+        if isinstance(values, list):
+            return [value for value in values if isinstance(value, str)]
+    if isinstance(message.content, str):
+        parser = IncrementalStringListParser(key)
+        parser.feed(message.content)
+        return parser.values
+    return []
+
+
+async def astream_string_list(
+    model: BaseChatModel,
+    schema: type,
+    key: str,
+    messages: list[BaseMessage],
+    config: Optional[RunnableConfig] = None,
+) -> AsyncIterator[str]:
+    """Stream the strings of a list field of a structured output, one at a time.
+
+    Args:
+        model (BaseChatModel): Model supporting tool calling.
+        schema (type): Output schema, called as a forced tool.
+        key (str): Name of the list field of the schema.
+        messages (list[BaseMessage]): The prompt.
+        config (Optional[RunnableConfig]): Configuration of the model call.
+
+    Yields:
+        str: The strings of the list, in order, as soon as they are complete.
+
+    Raises:
+        NotImplementedError: If the model does not support tool calling.
+    """
+    bound = model.bind_tools([schema], tool_choice=schema.__name__)
+    parser = IncrementalStringListParser(key)
+    message: Optional[AIMessageChunk] = None
+    tool_call_index = None
+    async for chunk in bound.astream(messages, config):
+        message = chunk if message is None else message + chunk
+        for tool_call_chunk in chunk.tool_call_chunks:
+            # Only the first tool call is parsed.
+            if tool_call_index is None:
+                tool_call_index = tool_call_chunk.get("index")
+            if tool_call_chunk.get("index") != tool_call_index:
+                continue
+            for value in parser.feed(tool_call_chunk.get("args") or ""):
+                yield value
+
+    # Fallback for providers that do not stream the tool arguments.
+    for value in _final_values(message, key)[len(parser.values) :]:
+        yield value
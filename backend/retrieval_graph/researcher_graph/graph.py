@@ -4,7 +4,7 @@ This module defines the core structure and functionality of the researcher graph
 which is responsible for generating search queries and retrieving relevant documents.
 """
 
-from typing import cast
+from typing import Literal, Union, cast
 
 from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
@@ -15,11 +15,15 @@ from typing_extensions import TypedDict
 from backend import retrieval
 from backend.retrieval_graph.configuration import AgentConfiguration
 from backend.retrieval_graph.researcher_graph.state import QueryState, ResearcherState
-from backend.utils import load_chat_model
+from backend.utils import load_structured_chat_model
 from backend.deepseek_wrapper import generate_queries_deepseek, enhance_prompt_for_json
 from backend.groq_wrapper import generate_queries_groq
 
 
+class Response(TypedDict):
+    queries: list[str]
+
+
 async def generate_queries(
     state: ResearcherState, *, config: RunnableConfig
 ) -> dict[str, list[str]]:
@@ -34,10 +38,6 @@ async def generate_queries(
     Returns:
         dict[str, list[str]]: A dictionary with a 'queries' key containing the list of generated search queries.
     """
-
-    class Response(TypedDict):
-        queries: list[str]
-
     configuration = AgentConfiguration.from_runnable_config(config)
 
     # Special handling for DeepSeek models (require explicit JSON mode)
@@ -78,12 +78,7 @@ async def generate_queries(
             return {"queries": [state.question]}
 
     # Standard logic for other models
-    structured_output_kwargs = (
-        {"method": "function_calling"} if "openai" in configuration.query_model else {}
-    )
-    model = load_chat_model(configuration.query_model).with_structured_output(
-        Response, **structured_output_kwargs
-    )
+    model = load_structured_chat_model(configuration.query_model, Response)
     messages = [
         {"role": "system", "content": configuration.generate_queries_system_prompt},
         {"role": "human", "content": state.question},
@@ -108,26 +103,60 @@ async def retrieve_documents(
     Returns:
         dict[str, list[Document]]: A dictionary with a 'documents' key containing the list of retrieved documents.
     """
-    with retrieval.make_retriever(config) as retriever:
+    configuration = AgentConfiguration.from_runnable_config(config)
+    async with retrieval.make_async_retriever(
+        config, fetch_vectors=configuration.uses_document_vectors
+    ) as retriever:
         response = await retriever.ainvoke(state.query, config)
         return {"documents": response}
 
 
-def retrieve_in_parallel(state: ResearcherState) -> list[Send]:
+async def retrieve_documents_batch(
+    state: ResearcherState, *, config: RunnableConfig
+) -> dict[str, list[Document]]:
+    """Retrieve documents for all generated queries in a single task.
+
+    The queries are embedded with one embedding request and searched concurrently;
+    the merged results are de-duplicated.
+
+    Args:
+        state (ResearcherState): The current state of the researcher, including the generated queries.
+        config (RunnableConfig): Configuration with the retriever used to fetch documents.
+
+    Returns:
+        dict[str, list[Document]]: A dictionary with a 'documents' key containing the list of retrieved documents.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    async with retrieval.make_async_retriever(
+        config, fetch_vectors=configuration.uses_document_vectors
+    ) as retriever:
+        response = await retrieval.aretrieve_many(retriever, state.queries, config)
+        return {"documents": response}
+
+
+def retrieve_in_parallel(
+    state: ResearcherState, *, config: RunnableConfig
+) -> Union[list[Send], Literal["retrieve_documents_batch"]]:
     """Create parallel retrieval tasks for each generated query.
 
     This function prepares parallel document retrieval tasks for each query in the researcher's state.
 
     Args:
         state (ResearcherState): The current state of the researcher, including the generated queries.
+        config (RunnableConfig): Configuration with the retrieval mode.
 
     Returns:
-        Literal["retrieve_documents"]: A list of Send objects, each representing a document retrieval task.
+        Union[list[Send], Literal["retrieve_documents_batch"]]: A list of Send objects, each representing
+            a document retrieval task, or the batched retrieval node in "batched" mode.
 
     Behavior:
-        - Creates a Send object for each query in the state.
+        - In "batched" mode, routes to the single "retrieve_documents_batch" node.
+        - Otherwise, creates a Send object for each query in the state.
         - Each Send object targets the "retrieve_documents" node with the corresponding query.
     """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    if configuration.retrieval_mode == "batched":
+        return "retrieve_documents_batch"
     return [
         Send("retrieve_documents", QueryState(query=query)) for query in state.queries
     ]
@@ -137,13 +166,15 @@ def retrieve_in_parallel(state: ResearcherState) -> list[Send]:
 builder = StateGraph(ResearcherState)
 builder.add_node(generate_queries)
 builder.add_node(retrieve_documents)
+builder.add_node(retrieve_documents_batch)
 builder.add_edge(START, "generate_queries")
 builder.add_conditional_edges(
     "generate_queries",
     retrieve_in_parallel,  # type: ignore
-    path_map=["retrieve_documents"],
+    path_map=["retrieve_documents", "retrieve_documents_batch"],
 )
 builder.add_edge("retrieve_documents", END)
+builder.add_edge("retrieve_documents_batch", END)
 # Compile into a graph object that you can invoke and deploy.
 graph = builder.compile()
 graph.name = "ResearcherGraph"
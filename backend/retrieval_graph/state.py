@@ -82,3 +82,13 @@ class AgentState(InputState):
     answer: str = field(default="")
     """Final answer. Useful for evaluations"""
     query: str = field(default="")
+    skipped_steps: list[str] = field(default_factory=list)
+    """Research plan steps skipped by early stopping in the current turn."""
+    research_stop_reason: str = field(default="")
+    """Why the research was stopped early in the current turn, if it was."""
+    semantic_cache_hit: bool = field(default=False)
+    """Whether the answer of the current turn was served from the semantic cache."""
+    prompt_cache_read_tokens: int = field(default=0)
+    """Prompt tokens of the final response served from the provider's prompt cache."""
+    prompt_cache_creation_tokens: int = field(default=0)
+    """Prompt tokens of the final response written to the provider's prompt cache."""
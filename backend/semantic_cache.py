@@ -0,0 +1,192 @@
+"""Semantic cache of answers to previously asked questions.
+
+Questions are stored as normalized embeddings in a preallocated NumPy matrix, so
+a lookup is a single matrix-vector product followed by masking. Entries are
+scoped (e.g. by response model and prompt version), expire after a TTL, are
+evicted least-recently-used when the cache is full, and are all dropped when the
+generation of the index they were answered from changes.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+@dataclass
+class SemanticCacheEntry:
+    """An answered question."""
+
+    question: str
+    answer: str
+    documents: list[Document]
+    similarity: float = 1.0
+    """Cosine similarity with the question that was looked up."""
+
+
+class SemanticCache:
+    """A bounded, thread-safe semantic cache of answered questions.
+
+    Args:
+        max_entries (int): Maximum number of cached answers.
+    """
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._created_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries: list[Optional[tuple[str, str, tuple[Any, ...]]]] = [
+            None
+        ] * max_entries
+        self._scope_ids: dict[str, int] = {}
+        self._next_scope_id = 0
+        self._generation: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_generation(self, generation: str) -> None:
+        if generation != self._generation:
+            self._reset()
+            self._generation = generation
+
+    def _reset(self) -> None:
+        self._valid[:] = False
+        self._entries = [None] * self.max_entries
+        self._scope_ids = {}
+
+    def _remove(self, slots: np.ndarray) -> None:
+        """Invalidate ``slots`` and forget the scopes left without entries."""
+        scope_ids = set(self._scopes[slots[self._valid[slots]]].tolist())
+        self._valid[slots] = False
+        for slot in slots:
+            self._entries[slot] = None
+        empty = {
+            scope_id
+            for scope_id in scope_ids
+            if not (self._valid & (self._scopes == scope_id)).any()
+        }
+        if empty:
+            self._scope_ids = {
+                scope: scope_id
+                for scope, scope_id in self._scope_ids.items()
+                if scope_id not in empty
+            }
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(
+        self,
+        vector: list[float],
+        *,
+        scope: str,
+        threshold: float,
+        ttl: float,
+        generation: str,
+    ) -> Optional[SemanticCacheEntry]:
+        """Return the most similar answered question above ``threshold``, if any."""
+        with self._lock:
+            self._check_generation(generation)
+            scope_id = self._scope_ids.get(scope)
+            if (
+                self._vectors is None
+                or self._vectors.shape[1] != len(vector)
+                or scope_id is None
+                or not self._valid.any()
+            ):
+                self.misses += 1
+                return None
+
+            now = time.time()
+            in_scope = self._valid & (self._scopes == scope_id)
+            expired = in_scope & (self._created_at < now - ttl)
+            if expired.any():
+                self._remove(np.flatnonzero(expired))
+            candidates = in_scope & ~expired
+            similarities = self._vectors @ self._normalize(vector)
+            similarities[~candidates] = -np.inf
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[best] = now
+            question, answer, documents = self._entries[best]
+            return SemanticCacheEntry(
+                question=question,
+                answer=answer,
+                documents=[
+                    Document(page_content=text, metadata=dict(metadata))
+                    for text, metadata in documents
+                ],
+                similarity=similarity,
+            )
+
+    def add(
+        self,
+        vector: list[float],
+        *,
+        scope: str,
+        generation: str,
+        question: str,
+        answer: str,
+        documents: list[Document],
+    ) -> None:
+        """Cache an answer, evicting the least recently used entry if full."""
+        if self.max_entries <= 0:
+            return
+        normalized = self._normalize(vector)
+        with self._lock:
+            self._check_generation(generation)
+            if self._vectors is None or self._vectors.shape[1] != len(normalized):
+                self._vectors = np.zeros(
+                    (self.max_entries, len(normalized)), dtype=np.float32
+                )
+                self._reset()
+
+            free = np.flatnonzero(~self._valid)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._remove(np.array([slot]))
+            if scope not in self._scope_ids:
+                self._scope_ids[scope] = self._next_scope_id
+                self._next_scope_id += 1
+            now = time.time()
+            self._vectors[slot] = normalized
+            self._scopes[slot] = self._scope_ids[scope]
+            self._created_at[slot] = now
+            self._last_used[slot] = now
+            self._valid[slot] = True
+            self._entries[slot] = (
+                question,
+                answer,
+                tuple((doc.page_content, dict(doc.metadata)) for doc in documents),
+            )
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the number of cached answers."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": int(self._valid.sum()),
+            "max_entries": self.max_entries,
+        }
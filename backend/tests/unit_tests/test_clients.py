@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from weaviate.exceptions import WeaviateConnectionError
+
+from backend.clients import AsyncWeaviateClientPool, WeaviateClientPool
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.ready = True
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    def is_ready(self) -> bool:
+        return self.ready
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def make_pool(**kwargs) -> tuple[WeaviateClientPool, list[FakeClient]]:
+    created: list[FakeClient] = []
+
+    def connect() -> FakeClient:
+        created.append(FakeClient())
+        return created[-1]
+
+    return WeaviateClientPool(connect=connect, **kwargs), created
+
+
+def test_pool_connects_lazily_and_reuses_client() -> None:
+    pool, created = make_pool()
+    assert created == []
+    with pool.borrow() as first, pool.borrow() as second:
+        assert first is second
+    assert len(created) == 1
+
+
+def test_pool_reconnects_when_health_check_fails() -> None:
+    pool, created = make_pool(health_check_interval=0)
+    client = pool.get()
+    client.ready = False
+    assert pool.get() is not client
+    assert client.closed
+    assert len(created) == 2
+
+
+def test_pool_drops_client_after_connection_error() -> None:
+    pool, created = make_pool()
+    with pytest.raises(WeaviateConnectionError):
+        with pool.borrow() as client:
+            raise WeaviateConnectionError("connection lost")
+    assert client.closed
+    assert pool.get() is not client
+
+
+def test_pool_close() -> None:
+    pool, created = make_pool()
+    pool.get()
+    pool.close()
+    assert created[0].closed
+
+
+class FakeAsyncClient(FakeClient):
+    async def is_ready(self) -> bool:
+        return self.ready
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_async_pool_reuses_client_within_a_loop() -> None:
+    created: list[FakeAsyncClient] = []
+
+    async def connect() -> FakeAsyncClient:
+        created.append(FakeAsyncClient())
+        return created[-1]
+
+    pool = AsyncWeaviateClientPool(connect=connect)
+
+    async def borrow_many() -> set[int]:
+        async def borrow() -> int:
+            async with pool.borrow() as client:
+                return id(client)
+
+        return set(await asyncio.gather(*(borrow() for _ in range(5))))
+
+    assert len(asyncio.run(borrow_many())) == 1
+    assert len(created) == 1
+    # A new event loop gets a new client, and the previous one is closed.
+    asyncio.run(borrow_many())
+    assert len(created) == 2
+    assert created[0].closed
+    assert not created[1].closed
+
+    # At exit, the client is closed outside of its (closed) loop.
+    pool.close_detached()
+    assert created[1].closed
+
+
+def test_async_pool_keeps_one_client_per_loop() -> None:
+    created: list[FakeAsyncClient] = []
+
+    async def connect() -> FakeAsyncClient:
+        created.append(FakeAsyncClient())
+        return created[-1]
+
+    pool = AsyncWeaviateClientPool(connect=connect)
+
+    async def borrow() -> FakeAsyncClient:
+        async with pool.borrow() as client:
+            return client
+
+    server_loop, worker_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        # Alternating loops do not tear down each other's client.
+        first = server_loop.run_until_complete(borrow())
+        second = worker_loop.run_until_complete(borrow())
+        assert server_loop.run_until_complete(borrow()) is first
+        assert worker_loop.run_until_complete(borrow()) is second
+        assert len(created) == 2
+        assert not first.closed and not second.closed
+
+        # The client of a closed loop is closed on the next use of the pool.
+        server_loop.close()
+        worker_loop.run_until_complete(borrow())
+        assert first.closed and not second.closed
+
+        pool.close_detached()
+        assert second.closed
+    finally:
+        server_loop.close()
+        worker_loop.close()
@@ -0,0 +1,53 @@
+from langchain_core.documents import Document
+
+from backend.context import dedupe_overlaps, get_context_budget, pack_context
+
+
+def _chunks(text: str, size: int, overlap: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text) - overlap, size - overlap)]
+
+
+def test_dedupe_overlaps_trims_splitter_overlap() -> None:
+    page = " ".join(f"word{i}" for i in range(400))
+    first, second, third = _chunks(page, 1000, 200)[:3]
+    documents = [
+        Document(page_content=second, metadata={"source": "a"}),
+        Document(page_content=first, metadata={"source": "a"}),
+        Document(page_content=second, metadata={"source": "a"}),
+        Document(page_content=third, metadata={"source": "b"}),
+    ]
+
+    deduped = dedupe_overlaps(documents)
+
+    assert [document.metadata["source"] for document in deduped] == ["a", "a", "b"]
+    assert deduped[0] is documents[0]
+    # The end of the first chunk repeats the start of the second one.
+    assert deduped[1].page_content == first[:800]
+    assert documents[1].page_content == first
+    # Overlaps are only removed between chunks of the same page.
+    assert deduped[2].page_content == third
+
+
+def test_pack_context_fills_budget_in_ranked_order() -> None:
+    documents = [
+        Document(page_content="q" * 10, metadata={"source": "1"}),
+        Document(page_content="w" * 100, metadata={"source": "2"}),
+        Document(page_content="x" * 20, metadata={"source": "3"}),
+        Document(page_content="z" * 20, metadata={"source": "4"}),
+    ]
+
+    def count(text: str) -> int:
+        return sum(text.count(letter) for letter in "qwxz")
+
+    packed = pack_context(documents, budget=50, count=count)
+
+    assert [document.page_content[0] for document in packed] == ["q", "x", "z"]
+    assert pack_context(documents, budget=5, count=count) == []
+
+
+def test_get_context_budget() -> None:
+    budgets = {"groq/": 4000, "groq/llama-3.3-70b-versatile": 16000}
+
+    assert get_context_budget("groq/llama-3.1-8b-instant", budgets, 20000) == 4000
+    assert get_context_budget("groq/llama-3.3-70b-versatile", budgets, 20000) == 16000
+    assert get_context_budget("anthropic/claude-3-5-sonnet", budgets, 20000) == 20000
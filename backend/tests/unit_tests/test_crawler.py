@@ -0,0 +1,321 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from langchain_core.stores import InMemoryByteStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from backend.crawler import Crawler, Site, aload_sites, iter_sites, process_page
+from backend.parser import langchain_docs_extractor
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+
+
+def _urlset(urls: list[str]) -> str:
+    entries = "".join(
+        f"<url><loc>{url}</loc><lastmod>2024-01-01</lastmod></url>" for url in urls
+    )
+    return f'<?xml version="1.0"?><urlset>{entries}</urlset>'
+
+
+def _app(calls: dict[str, int]) -> web.Application:
+    async def sitemap_index(request: web.Request) -> web.Response:
+        base = f"http://{request.host}"
+        body = f"<sitemapindex><sitemap><loc>{base}/docs.xml</loc></sitemap></sitemapindex>"
+        return web.Response(text=body, content_type="application/xml")
+
+    async def docs_sitemap(request: web.Request) -> web.Response:
+        base = f"http://{request.host}"
+        urls = [f"{base}/docs/a", f"{base}/docs/flaky", f"{base}/blog/b"]
+        urls.append("http://other.example/docs/c")
+        return web.Response(text=_urlset(urls), content_type="application/xml")
+
+    async def page(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        calls[name] = calls.get(name, 0) + 1
+        if name == "flaky" and calls[name] == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        body = f"<html><head><title>{name}</title></head><body><p>Page {name}</p></body></html>"
+        return web.Response(text=body, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/sitemap.xml", sitemap_index)
+    app.router.add_get("/docs.xml", docs_sitemap)
+    app.router.add_get("/docs/{name}", page)
+    app.router.add_get("/blog/{name}", page)
+    return app
+
+
+def _meta(entry: dict, soup: BeautifulSoup) -> dict:
+    return {"source": entry["loc"], "title": soup.title.get_text(), **entry}
+
+
+def _meta_without_title(entry: dict, soup: BeautifulSoup) -> dict:
+    return {"source": entry["loc"], **entry}
+
+
+def test_crawler_loads_filtered_sitemap_pages_with_retries() -> None:
+    calls: dict[str, int] = {}
+
+    async def crawl() -> list:
+        async with TestServer(_app(calls)) as server:
+            base = str(server.make_url(""))
+            site = Site(
+                f"{base}/sitemap.xml",
+                parsing_function=lambda soup: soup.get_text().strip(),
+                meta_function=_meta,
+                filter_urls=[f"{base}/docs/"],
+            )
+            return await aload_sites(
+                [site], max_connections_per_host=2, backoff_seconds=0
+            )
+
+    documents = asyncio.run(crawl())
+
+    assert [doc.page_content for doc in documents] == ["aPage a", "flakyPage flaky"]
+    assert [doc.metadata["title"] for doc in documents] == ["a", "flaky"]
+    assert documents[0].metadata["lastmod"] == "2024-01-01"
+    assert calls == {"a": 1, "flaky": 2}
+
+
+def test_crawler_bounds_concurrent_requests_per_host() -> None:
+    running = 0
+    max_running = 0
+
+    async def slow(request: web.Request) -> web.Response:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return web.Response(text="ok")
+
+    async def crawl() -> None:
+        app = web.Application()
+        app.router.add_get("/{name}", slow)
+        async with (
+            TestServer(app) as server,
+            Crawler(max_connections_per_host=3) as crawler,
+        ):
+            await asyncio.gather(
+                *(crawler.fetch(str(server.make_url(f"/{i}"))) for i in range(12))
+            )
+
+    asyncio.run(crawl())
+
+    assert max_running == 3
+
+
+def test_incremental_crawl_only_processes_changed_pages() -> None:
+    # Page -> (lastmod, ETag, body).
+    pages = {
+        "same": ("1", '"s1"', "<p>same</p>"),
+        "etag": ("1", '"e1"', "<p>etag</p>"),
+        "edited": ("1", '"d1"', "<p>edited</p>"),
+    }
+    requests: list[tuple[str, str]] = []
+    processed: list[str] = []
+
+    async def sitemap(request: web.Request) -> web.Response:
+        urls = "".join(
+            f"<url><loc>http://{request.host}/docs/{name}</loc>"
+            f"<lastmod>{lastmod}</lastmod></url>"
+            for name, (lastmod, _, _) in pages.items()
+        )
+        return web.Response(text=f"<urlset>{urls}</urlset>")
+
+    async def page(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        _, etag, body = pages[name]
+        requests.append((name, request.headers.get("If-None-Match", "")))
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    def transform(documents: list) -> list:
+        processed.extend(doc.page_content for doc in documents)
+        return [
+            Document(page_content=text, metadata=doc.metadata)
+            for doc in documents
+            for text in doc.page_content.split()
+        ]
+
+    async def crawl_twice() -> tuple[list, list]:
+        app = web.Application()
+        app.router.add_get("/sitemap.xml", sitemap)
+        app.router.add_get("/docs/{name}", page)
+        store = InMemoryByteStore()
+        async with TestServer(app) as server:
+            site = Site(
+                str(server.make_url("/sitemap.xml")),
+                parsing_function=lambda soup: f"{soup.get_text()} chunk",
+                meta_function=_meta_without_title,
+            )
+            first = await aload_sites([site], store=store, transform=transform)
+            pages["etag"] = ("2", '"e1"', "<p>etag</p>")
+            pages["edited"] = ("2", '"d2"', "<p>changed</p>")
+            requests.clear()
+            processed.clear()
+            second = await aload_sites([site], store=store, transform=transform)
+        return first, second
+
+    first, second = asyncio.run(crawl_twice())
+
+    assert [doc.page_content for doc in first] == [
+        *["same", "chunk", "etag", "chunk", "edited", "chunk"]
+    ]
+    assert [doc.page_content for doc in second] == [
+        *["same", "chunk", "etag", "chunk", "changed", "chunk"]
+    ]
+    # Sitemap fields of unchanged pages are up to date.
+    assert [doc.metadata["lastmod"] for doc in second] == ["1"] * 2 + ["2"] * 4
+    assert requests == [("etag", '"e1"'), ("edited", '"d1"')]
+    assert processed == ["changed chunk"]
+
+
+def test_crawler_skips_pages_failing_with_client_errors() -> None:
+    gone: set[str] = set()
+
+    async def sitemap(request: web.Request) -> web.Response:
+        urls = [f"http://{request.host}/docs/{name}" for name in ("a", "b", "c")]
+        return web.Response(text=_urlset(urls), content_type="application/xml")
+
+    async def page(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name in gone:
+            return web.Response(status=404 if name == "b" else 410)
+        return web.Response(text=f"<p>{name}</p>", content_type="text/html")
+
+    async def crawl_twice() -> tuple[list, list, list]:
+        app = web.Application()
+        app.router.add_get("/sitemap.xml", sitemap)
+        app.router.add_get("/docs/{name}", page)
+        store = InMemoryByteStore()
+        async with TestServer(app) as server:
+            site = Site(
+                str(server.make_url("/sitemap.xml")),
+                parsing_function=lambda soup: soup.get_text(),
+                meta_function=_meta_without_title,
+            )
+            gone.add("b")
+            first = await aload_sites([site], store=store, refresh=True)
+            gone.add("c")
+            second = await aload_sites([site], store=store, refresh=True)
+        return first, second, sorted(store.yield_keys())
+
+    first, second, recorded = asyncio.run(crawl_twice())
+
+    assert [doc.page_content for doc in first] == ["a", "c"]
+    assert [doc.page_content for doc in second] == ["a"]
+    # The records of removed pages are dropped.
+    assert [url.rsplit("/", 1)[1] for url in recorded] == ["a"]
+
+
+@contextmanager
+def serve(app: web.Application) -> Iterator[str]:
+    """Serve an app from a background thread, for the synchronous crawl API."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_iter_sites_streams_bounded_batches() -> None:
+    requested: list[str] = []
+
+    async def sitemap(request: web.Request) -> web.Response:
+        site = request.match_info["site"]
+        urls = "".join(
+            f"<url><loc>http://{request.host}/{site}/{i}</loc></url>"
+            for i in range(100)
+        )
+        return web.Response(text=f"<urlset>{urls}</urlset>")
+
+    async def page(request: web.Request) -> web.Response:
+        site, name = request.match_info["site"], request.match_info["name"]
+        requested.append(f"{site}/{name}")
+        if site == "broken" and name == "30":
+            return web.Response(status=500)
+        return web.Response(text=f"<p>{site} {name}</p>", content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{site}/sitemap.xml", sitemap)
+    app.router.add_get("/{site}/{name}", page)
+
+    with serve(app) as base:
+
+        def site(name: str) -> Site:
+            return Site(
+                f"{base}/{name}/sitemap.xml",
+                parsing_function=lambda soup: soup.get_text(),
+                meta_function=_meta_without_title,
+            )
+
+        documents = iter_sites([site("a"), site("b")], batch_pages=4)
+        assert next(documents).page_content == "a 0"
+        time.sleep(0.2)
+        # The crawl waits for the consumer: a dozen batches ahead at most.
+        assert len(requested) <= 48
+        contents = ["a 0", *(doc.page_content for doc in documents)]
+        assert sorted(contents) == sorted(
+            f"{name} {i}" for name in "ab" for i in range(100)
+        )
+        assert [c for c in contents if c.startswith("b")] == [
+            f"b {i}" for i in range(100)
+        ]
+
+        # A page still failing after the retries fails the crawl.
+        with pytest.raises(aiohttp.ClientResponseError):
+            list(
+                iter_sites(
+                    [site("a"), site("broken")], batch_pages=4, backoff_seconds=0
+                )
+            )
+
+
+def _split(documents: list[Document]) -> list[Document]:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=50)
+    return splitter.split_documents(documents)
+
+
+def test_crawler_processes_pages_in_process_pool() -> None:
+    site = Site(
+        "https://docs.example/sitemap.xml",
+        parsing_function=langchain_docs_extractor,
+        meta_function=_meta,
+    )
+    pages = [
+        ({"loc": f"https://docs.example/{path.stem}"}, path.read_text())
+        for path in sorted(FIXTURES.glob("*.html"))
+    ]
+
+    async def process_all() -> list[list[Document]]:
+        async with Crawler(transform=_split, parse_workers=2) as crawler:
+            return await asyncio.gather(
+                *(crawler.process(site, entry, html) for entry, html in pages)
+            )
+
+    results = asyncio.run(process_all())
+
+    assert results == [process_page(site, entry, html, _split) for entry, html in pages]
+    assert sum(len(documents) for documents in results) > len(pages)
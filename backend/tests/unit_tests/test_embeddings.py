@@ -0,0 +1,69 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from langchain.storage import InMemoryByteStore, LocalFileStore
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.embeddings import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self.embedded.append(text)
+        return super().embed_query(text)
+
+
+def test_cached_embeddings_hits_on_normalized_text() -> None:
+    underlying = CountingEmbeddings(size=4, embedded=[])
+    cached = CachedEmbeddings(underlying, model_name="fake/model")
+
+    first = cached.embed_query("how to use  ChatOpenAI")
+    second = cached.embed_query(" how to use ChatOpenAI\n")
+
+    assert second == first
+    assert underlying.embedded == ["how to use  ChatOpenAI"]
+    assert cached.stats()["hits"] == 1
+    assert cached.stats()["misses"] == 1
+
+
+def test_cached_embeddings_only_embeds_missing_documents_once() -> None:
+    underlying = CountingEmbeddings(size=4, embedded=[])
+    cached = CachedEmbeddings(underlying, model_name="fake/model")
+    cached.embed_query("a")
+
+    vectors = asyncio.run(cached.aembed_documents(["a", "b", "b", "c"]))
+
+    assert underlying.embedded == ["a", "b", "c"]
+    assert vectors[1] == vectors[2]
+    assert vectors[0] == cached.embed_query("a")
+
+
+def test_cached_embeddings_memory_tier_is_bounded_by_bytes() -> None:
+    underlying = CountingEmbeddings(size=4, embedded=[])
+    # Room for two 4-dimensional float32 vectors.
+    cached = CachedEmbeddings(underlying, model_name="fake/model", max_bytes=32)
+    cached.embed_documents(["a", "b", "c"])
+
+    assert cached.stats()["entries"] == 2
+    assert cached.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("store_type", ["memory", "files"])
+def test_cached_embeddings_persistent_tier(store_type: str, tmp_path: Path) -> None:
+    store = InMemoryByteStore() if store_type == "memory" else LocalFileStore(tmp_path)
+    underlying = CountingEmbeddings(size=4, embedded=[])
+    CachedEmbeddings(underlying, model_name="fake/model", store=store).embed_query("a")
+
+    cached = CachedEmbeddings(underlying, model_name="fake/model", store=store)
+    cached.embed_query("a")
+
+    assert underlying.embedded == ["a"]
+    assert cached.stats()["store_hits"] == 1
+    assert cached.stats()["misses"] == 0
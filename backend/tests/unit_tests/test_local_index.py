@@ -0,0 +1,143 @@
+import asyncio
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.local_index import (
+    LocalIndexRetriever,
+    LocalVectorIndex,
+    load_local_index,
+)
+
+
+def make_index(n: int = 50, dimensions: int = 16) -> LocalVectorIndex:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dimensions))
+    documents = [
+        Document(
+            page_content=f"chunk {i}", metadata={"uuid": str(i), "source": f"s{i}"}
+        )
+        for i in range(n)
+    ]
+    return LocalVectorIndex.from_vectors(vectors, documents, "fake/model")
+
+
+def test_search_returns_exact_top_k() -> None:
+    index = make_index()
+    query = np.random.default_rng(1).normal(size=16)
+
+    results = index.search(query.tolist(), k=5)
+
+    scores = index.vectors @ (query / np.linalg.norm(query))
+    assert [row for row, _ in results] == list(np.argsort(-scores)[:5])
+    assert np.allclose([score for _, score in results], np.sort(scores)[::-1][:5])
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    index = make_index()
+    index.save(tmp_path)
+
+    loaded = LocalVectorIndex.load(tmp_path)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.documents == index.documents
+    assert loaded.embedding_model == "fake/model"
+    query = index.vectors[3].tolist()
+    assert loaded.search(query, k=3) == index.search(query, k=3)
+
+
+def test_saving_over_a_loaded_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "index"
+    make_index(n=50).save(path)
+    loaded = load_local_index(str(path))
+    assert load_local_index(str(path)) is loaded
+    query = loaded.vectors[3].tolist()
+    results = loaded.search(query, k=3)
+
+    make_index(n=20, dimensions=16).save(path)
+
+    # The memory-mapped vectors of the previous snapshot are left untouched...
+    assert loaded.search(query, k=3) == results
+    # ...and the new snapshot is picked up on the next load.
+    reloaded = load_local_index(str(path))
+    assert len(reloaded) == 20
+    assert path.is_symlink()
+
+    # Only the current and previous versions are kept.
+    make_index(n=10).save(path)
+    assert len(load_local_index(str(path))) == 10
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_local_index_retriever() -> None:
+    embedding = DeterministicFakeEmbedding(size=16)
+    texts = [f"chunk {i}" for i in range(10)]
+    index = LocalVectorIndex.from_vectors(
+        embedding.embed_documents(texts),
+        [Document(page_content=text, metadata={"uuid": text}) for text in texts],
+        "fake/model",
+    )
+    retriever = LocalIndexRetriever(
+        index=index, embedding=embedding, search_kwargs={"k": 2}
+    )
+
+    docs = retriever.invoke("chunk 7")
+    assert len(docs) == 2
+    assert docs[0].page_content == "chunk 7"
+    (batched,) = asyncio.run(retriever.abatch_search(["chunk 7"]))
+    assert batched == docs
+
+
+def test_ivf_search(tmp_path: Path) -> None:
+    index = make_index(n=200)
+    index.build_ivf(n_lists=8)
+    query = index.vectors[42].tolist()
+
+    # Probing every list is an exhaustive search.
+    assert index.search(query, k=5, nprobe=8) == index.search(query, k=5)
+    assert index.search(query, k=1, nprobe=1)[0][0] == 42
+
+    index.save(tmp_path)
+    loaded = LocalVectorIndex.load(tmp_path)
+    assert loaded.ivf is not None and loaded.ivf.n_lists == 8
+    assert loaded.search(query, k=5, nprobe=2) == index.search(query, k=5, nprobe=2)
+
+
+def test_quantized_search(tmp_path: Path) -> None:
+    index = make_index(n=200)
+    query = index.vectors[7].tolist()
+    exact = index.search(query, k=5)
+
+    for kind in ("int8", "binary"):
+        index.quantize(kind, dimensions=12)
+        # Results are rescored with the float vectors, so rescoring every row is
+        # an exact search.
+        assert index.search(query, k=5, rescore=200) == exact
+        assert index.search(query, k=1)[0][0] == 7
+
+    index.save(tmp_path)
+    loaded = LocalVectorIndex.load(tmp_path)
+    assert loaded.codes is not None and loaded.codes.kind == "binary"
+    assert loaded.codes.dimensions == 12
+    assert loaded.search(query, k=5) == index.search(query, k=5)
+
+
+def test_hybrid_search_finds_exact_identifiers() -> None:
+    embedding = DeterministicFakeEmbedding(size=16)
+    texts = [f"chunk {i} about checkpoints" for i in range(30)]
+    texts[17] = "Use PostgresSaver.from_conn_string to persist checkpoints."
+    index = LocalVectorIndex.from_vectors(
+        embedding.embed_documents(texts),
+        [Document(page_content=text) for text in texts],
+        "fake/model",
+    )
+    retriever = LocalIndexRetriever(
+        index=index, embedding=embedding, search_kwargs={"k": 3, "alpha": 0.3}
+    )
+
+    docs = retriever.invoke("PostgresSaver.from_conn_string")
+
+    assert docs[0].page_content == texts[17]
+    assert [row for row, _ in index.bm25.search("from_conn_string", k=5)] == [17]
@@ -0,0 +1,17 @@
+from backend.mmr import mmr_select
+
+
+def test_mmr_skips_near_duplicates() -> None:
+    query = [1.0, 0.0, 0.0]
+    candidates = [
+        [1.0, 0.1, 0.0],
+        [1.0, 0.11, 0.0],  # near-duplicate of the first candidate
+        [0.7, 0.0, 0.7],
+        [0.0, 1.0, 0.0],
+    ]
+
+    assert mmr_select(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+    # Pure relevance keeps the duplicate.
+    assert mmr_select(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert sorted(mmr_select(query, candidates, k=10)) == [0, 1, 2, 3]
+    assert mmr_select(query, [], k=3) == []
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from backend.parser import langchain_docs_extractor, langchain_docs_extractor_lxml
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+PAGES = sorted(FIXTURES.glob("*.html"))
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[page.stem for page in PAGES])
+def test_extractors_match_golden_markdown(page: Path) -> None:
+    html = page.read_text()
+    expected = page.with_suffix(".md").read_text()
+
+    assert langchain_docs_extractor(BeautifulSoup(html, "lxml")) == expected
+    assert langchain_docs_extractor_lxml(html) == expected
+
+
+def test_lxml_extractor_handles_empty_pages() -> None:
+    assert langchain_docs_extractor_lxml("") == ""
+    assert langchain_docs_extractor_lxml("<html><body> </body></html>") == ""
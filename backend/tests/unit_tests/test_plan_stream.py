@@ -0,0 +1,38 @@
+import json
+
+from backend.retrieval_graph.plan_stream import IncrementalStringListParser
+
+
+def test_parser_returns_each_string_once_complete() -> None:
+    steps = ['Find "RunnableWithMessageHistory"', "Read C:\\docs\\é\u2603", "", "ok"]
+    arguments = json.dumps({"reason": "[a, b]", "steps": steps, "other": ["x"]})
+    parser = IncrementalStringListParser("steps")
+
+    completed = []
+    positions = []
+    for i, char in enumerate(arguments):
+        for value in parser.feed(char):
+            completed.append(value)
+            positions.append(i)
+
+    assert completed == steps
+    assert parser.values == steps
+    # Each string is returned on its closing quote, before the list is closed.
+    assert all(arguments[i] == '"' for i in positions)
+    assert positions[0] < arguments.index('"ok"')
+
+
+def test_parser_ignores_text_around_the_object() -> None:
+    parser = IncrementalStringListParser("steps")
+
+    assert parser.feed('Plan: ```json\n{"steps": ["a", ') == ["a"]
+    assert parser.feed('"b\\u00e9"]}\n```') == ["bé"]
+
+
+def test_parser_ignores_brackets_quoted_before_the_object() -> None:
+    text = 'Use the "[draft]" and "{name" templates: {"steps": ["a", "b"]}'
+    parser = IncrementalStringListParser("steps")
+
+    completed = [value for char in text for value in parser.feed(char)]
+
+    assert completed == ["a", "b"]
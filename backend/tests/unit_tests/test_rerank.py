@@ -0,0 +1,64 @@
+import asyncio
+import sys
+
+import pytest
+from langchain_core.documents import Document
+
+import backend.rerank as rerank_module
+from backend.rerank import LexicalReranker, aget_reranker, get_reranker
+
+
+def test_lexical_reranker_keeps_most_relevant_documents() -> None:
+    documents = [
+        Document(page_content="Streaming tokens from chat models."),
+        Document(page_content="Checkpointers persist graph state."),
+        Document(
+            page_content="Create it with from_conn_string.",
+            metadata={"title": "PostgresSaver"},
+        ),
+        Document(page_content="Use PostgresSaver to persist checkpoints in Postgres."),
+    ]
+
+    reranked = LexicalReranker().rerank(
+        "How do I use PostgresSaver.from_conn_string?", documents, top_n=2
+    )
+
+    assert reranked == [documents[2], documents[3]]
+    assert asyncio.run(LexicalReranker().arerank("anything", [], top_n=2)) == []
+
+
+def test_cross_encoder_falls_back_to_lexical(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    get_reranker.cache_clear()
+    try:
+        reranker = get_reranker("cross-encoder", "some/model")
+    finally:
+        get_reranker.cache_clear()
+
+    assert isinstance(reranker, LexicalReranker)
+    assert get_reranker("none", "some/model") is None
+
+
+def test_cross_encoder_is_loaded_outside_of_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    loaded_in: list[bool] = []
+
+    class FakeCrossEncoderReranker(LexicalReranker):
+        def __init__(self, model_name: str, backend: str) -> None:
+            try:
+                asyncio.get_running_loop()
+                loaded_in.append(True)
+            except RuntimeError:
+                loaded_in.append(False)
+
+    monkeypatch.setattr(rerank_module, "CrossEncoderReranker", FakeCrossEncoderReranker)
+    get_reranker.cache_clear()
+    try:
+        reranker = asyncio.run(aget_reranker("cross-encoder", "some/model"))
+    finally:
+        get_reranker.cache_clear()
+
+    assert isinstance(reranker, FakeCrossEncoderReranker)
+    # Loaded in a thread, not on the event loop.
+    assert loaded_in == [False]
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain.storage import LocalFileStore
+from langchain_core.embeddings import FakeEmbeddings
+from weaviate.classes.query import HybridFusion
+
+import backend.retrieval as retrieval_module
+from backend.cache import (
+    LRUCache,
+    bump_index_generation,
+    get_index_generation,
+    get_shared_store,
+)
+from backend.configuration import BaseConfiguration
+from backend.retrieval import (
+    AsyncWeaviateRetriever,
+    aget_document_vectors,
+    aretrieve_many,
+    document_vector_cache,
+    get_retrieval_cache_ttl,
+    make_async_weaviate_retriever,
+)
+from backend.retrieval_graph.configuration import AgentConfiguration
+
+
+class FakeQuery:
+    def __init__(self, objects: list[Any]) -> None:
+        self.objects = objects
+        self.calls: list[dict[str, Any]] = []
+
+    async def hybrid(self, **kwargs: Any) -> SimpleNamespace:
+        self.calls.append(kwargs)
+        return SimpleNamespace(objects=self.objects[: kwargs["limit"]])
+
+
+class FakeSyncQuery(FakeQuery):
+    def hybrid(self, **kwargs: Any) -> SimpleNamespace:
+        self.calls.append(kwargs)
+        return SimpleNamespace(objects=self.objects[: kwargs["limit"]])
+
+
+def make_object(text: str, source: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        uuid=uuid.uuid4(),
+        properties={"text": text, "source": source, "title": source.upper()},
+        metadata=SimpleNamespace(score=0.5, distance=None),
+    )
+
+
+def make_retriever(objects: list[Any], **search_kwargs: Any) -> AsyncWeaviateRetriever:
+    return AsyncWeaviateRetriever.model_construct(
+        collection=SimpleNamespace(query=FakeQuery(objects)),
+        embedding=FakeEmbeddings(size=8),
+        text_key="text",
+        attributes=["source", "title"],
+        search_kwargs={**search_kwargs, "return_uuids": True},
+    )
+
+
+def test_async_weaviate_retriever_returns_documents() -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(3)]
+    retriever = make_retriever(objects, k=2)
+    docs = asyncio.run(retriever.ainvoke("query"))
+
+    assert [doc.page_content for doc in docs] == ["text 0", "text 1"]
+    assert docs[0].metadata == {
+        "source": "s0",
+        "title": "S0",
+        "uuid": str(objects[0].uuid),
+    }
+    (call,) = retriever.collection.query.calls
+    assert call["query"] == "query"
+    assert len(call["vector"]) == 8
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    calls: int = 0
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        return self.embed_documents(texts)
+
+
+def test_aretrieve_many_embeds_once_and_deduplicates() -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(3)]
+    retriever = make_retriever(objects, k=2)
+    retriever.embedding = CountingEmbeddings(size=8)
+
+    docs = asyncio.run(aretrieve_many(retriever, ["a", "b", "c"]))
+
+    assert retriever.embedding.calls == 1
+    assert len(retriever.collection.query.calls) == 3
+    assert [doc.page_content for doc in docs] == ["text 0", "text 1"]
+
+
+def test_retrieval_cache_is_invalidated_by_index_generation() -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(3)]
+    retriever = make_retriever(objects, k=2)
+    retriever.collection.name = "TestIndex"
+    retriever.cache = LRUCache(16)
+    retriever.cache_ttl = 60
+
+    first = asyncio.run(retriever.ainvoke("how to use ChatOpenAI"))
+    second = asyncio.run(retriever.ainvoke("how to use  ChatOpenAI "))
+    assert second == first
+    assert second[0] is not first[0]
+    assert len(retriever.collection.query.calls) == 1
+
+    bump_index_generation("TestIndex")
+    asyncio.run(retriever.ainvoke("how to use ChatOpenAI"))
+    assert len(retriever.collection.query.calls) == 2
+
+
+def test_fusion_type_is_passed_to_weaviate_by_name() -> None:
+    retriever = make_retriever(
+        [make_object("text", "s")], k=1, alpha=0.5, fusion_type="ranked"
+    )
+    asyncio.run(retriever.ainvoke("RunnableWithMessageHistory"))
+
+    (call,) = retriever.collection.query.calls
+    assert call["alpha"] == 0.5
+    assert call["fusion_type"] == HybridFusion.RANKED
+    assert retriever.search_kwargs["fusion_type"] == "ranked"
+
+
+def test_document_vectors_are_cached_from_search_results() -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(2)]
+    objects[0].vector = {"default": [0.5] * 8}
+    objects[1].vector = None
+    retriever = make_retriever(objects, k=2)
+    retriever.vector_cache = document_vector_cache
+
+    docs = asyncio.run(retriever.ainvoke("query"))
+    vectors = asyncio.run(aget_document_vectors(docs, FakeEmbeddings(size=8)))
+
+    assert retriever.collection.query.calls[0]["include_vector"] is True
+    assert vectors[0] == [0.5] * 8
+    assert len(vectors[1]) == 8
+
+
+def test_document_vectors_are_kept_with_cached_results() -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(2)]
+    for i, obj in enumerate(objects):
+        obj.vector = {"default": [float(i)] * 8}
+    retriever = make_retriever(objects, k=2)
+    retriever.collection.name = "TestIndex"
+    retriever.cache = LRUCache(16)
+    retriever.cache_ttl = 60
+    retriever.vector_cache = LRUCache(16)
+
+    asyncio.run(retriever.ainvoke("query"))
+    retriever.vector_cache.clear()
+    docs = asyncio.run(retriever.ainvoke("query"))
+
+    assert len(retriever.collection.query.calls) == 1
+    for i, doc in enumerate(docs):
+        assert retriever.vector_cache.get(doc.metadata["uuid"]) == (
+            np.full(8, i, dtype=np.float32).tobytes()
+        )
+
+
+@pytest.mark.parametrize("mmr", [False, True])
+def test_vectors_are_only_fetched_when_used(monkeypatch: Any, mmr: bool) -> None:
+    collection = SimpleNamespace(name="TestIndex", query=FakeQuery([]))
+
+    @asynccontextmanager
+    async def borrow():
+        yield SimpleNamespace(collections=SimpleNamespace(get=lambda _: collection))
+
+    monkeypatch.setattr(retrieval_module.async_weaviate_pool, "borrow", borrow)
+    monkeypatch.setattr(
+        retrieval_module,
+        "AsyncWeaviateRetriever",
+        AsyncWeaviateRetriever.model_construct,
+    )
+    configuration = AgentConfiguration(mmr=mmr)
+
+    async def search() -> None:
+        async with make_async_weaviate_retriever(
+            configuration,
+            FakeEmbeddings(size=8),
+            fetch_vectors=configuration.uses_document_vectors,
+        ) as retriever:
+            await retriever.ainvoke("query")
+
+    asyncio.run(search())
+
+    assert collection.query.calls[0]["include_vector"] is mmr
+
+
+def test_async_weaviate_retriever_searches_with_sync_pool_when_invoked(
+    monkeypatch: Any,
+) -> None:
+    objects = [make_object(f"text {i}", f"s{i}") for i in range(3)]
+    retriever = make_retriever(objects, k=2)
+    retriever.collection.name = "TestIndex"
+    sync_query = FakeSyncQuery(objects)
+    collections: list[str] = []
+
+    def get_collection(name: str) -> SimpleNamespace:
+        collections.append(name)
+        return SimpleNamespace(query=sync_query)
+
+    @contextmanager
+    def borrow():
+        yield SimpleNamespace(collections=SimpleNamespace(get=get_collection))
+
+    monkeypatch.setattr(retrieval_module.weaviate_pool, "borrow", borrow)
+
+    docs = retriever.invoke("query")
+
+    assert collections == ["TestIndex"]
+    assert retriever.collection.query.calls == []
+    assert docs == asyncio.run(retriever.ainvoke("query"))
+    assert sync_query.calls[0]["query"] == "query"
+    assert sync_query.calls[0]["limit"] == 2
+
+
+def test_index_generation_in_local_file_store(monkeypatch: Any, tmp_path: Any) -> None:
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    get_shared_store.cache_clear()
+    try:
+        assert get_index_generation("TestIndex") == "0"
+        generation = bump_index_generation("TestIndex")
+        assert get_index_generation("TestIndex") == generation
+    finally:
+        get_shared_store.cache_clear()
+
+
+def test_expired_entries_are_pruned_from_cache_dir(
+    monkeypatch: Any, tmp_path: Any
+) -> None:
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("CACHE_TTL_SECONDS", "60")
+    get_shared_store.cache_clear()
+    try:
+        generation = bump_index_generation("TestIndex")
+        get_shared_store().mset([("old", b"1"), ("new", b"2")])
+        expired = time.time() - 120
+        for path in tmp_path.rglob("*"):
+            if path.is_file() and path.name != "new":
+                os.utime(path, (expired, expired))
+        get_shared_store.cache_clear()
+
+        store = get_shared_store()
+        assert store.mget(["old", "new"]) == [None, b"2"]
+        # Index generations never expire.
+        assert get_index_generation("TestIndex") == generation
+    finally:
+        get_shared_store.cache_clear()
+
+
+@pytest.mark.parametrize("shared_store", [True, False])
+def test_retrieval_cache_requires_a_shared_store(
+    monkeypatch: Any, tmp_path: Any, shared_store: bool
+) -> None:
+    store = LocalFileStore(tmp_path) if shared_store else None
+    monkeypatch.setattr(retrieval_module, "get_shared_store", lambda: store)
+    configuration = BaseConfiguration(retrieval_cache_ttl=60)
+
+    assert get_retrieval_cache_ttl(configuration) == (60 if shared_store else 0)
@@ -0,0 +1,414 @@
+import asyncio
+import json
+from typing import Any, Optional
+
+import pytest
+from langchain.storage import LocalFileStore
+from langchain_anthropic import ChatAnthropic
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
+
+from backend.retrieval_graph import graph as graph_module
+from backend.retrieval_graph.local_router import NearestCentroidRouter
+from backend.semantic_cache import SemanticCache
+
+
+class FakeChatModel:
+    def __init__(self, steps: list[str]) -> None:
+        self.steps = steps
+        self.calls: list[tuple[list[Any], dict[str, Any]]] = []
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        return RunnableLambda(lambda messages: {"steps": self.steps})
+
+    def bind_tools(self, tools: list[Any], **kwargs: Any) -> Any:
+        raise NotImplementedError
+
+    async def ainvoke(self, messages: list[Any], **kwargs: Any) -> AIMessage:
+        self.calls.append((messages, kwargs))
+        return AIMessage(
+            content="answer",
+            usage_metadata={
+                "input_tokens": 1500,
+                "output_tokens": 10,
+                "total_tokens": 1510,
+                "input_token_details": {"cache_read": 1200, "cache_creation": 300},
+            },
+        )
+
+
+class FakeStreamingChatModel(FakeChatModel):
+    """Streams the plan as tool call arguments, a few characters at a time."""
+
+    def __init__(self, steps: list[str], events: list[str]) -> None:
+        super().__init__(steps)
+        self.events = events
+
+    def bind_tools(self, tools: list[Any], **kwargs: Any) -> "FakeStreamingChatModel":
+        return self
+
+    async def astream(self, messages: list[Any], config: Any = None) -> Any:
+        arguments = json.dumps({"steps": self.steps})
+        for start in range(0, len(arguments), 5):
+            await asyncio.sleep(0)
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": "Plan" if start == 0 else None,
+                        "args": arguments[start : start + 5],
+                        "id": None,
+                        "index": 0,
+                    }
+                ],
+            )
+        self.events.append("plan done")
+
+
+def fail(name: str) -> Any:
+    """Return a stub failing the test when called."""
+
+    def stub(*args: Any, **kwargs: Any) -> Any:
+        pytest.fail(f"{name} must not be called")
+
+    return stub
+
+
+def patch_models(monkeypatch: pytest.MonkeyPatch, model: FakeChatModel) -> None:
+    monkeypatch.setattr(graph_module, "load_chat_model", lambda name: model)
+    monkeypatch.setattr(
+        graph_module,
+        "load_structured_chat_model",
+        lambda name, schema: model.with_structured_output(schema),
+    )
+
+
+class FakeResearcher:
+    def __init__(self, events: Optional[list[str]] = None) -> None:
+        self.running = 0
+        self.max_running = 0
+        self.questions: list[str] = []
+        self.events = events if events is not None else []
+
+    async def ainvoke(self, state: dict[str, Any]) -> dict[str, Any]:
+        self.events.append(f"research {state['question']}")
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.questions.append(state["question"])
+        return {"documents": [Document(page_content=state["question"])]}
+
+
+@pytest.mark.parametrize(
+    "configurable, expected_max_running",
+    [
+        ({"research_mode": "sequential", "router_mode": "none"}, 1),
+        (
+            {
+                "research_mode": "parallel",
+                "max_parallel_research_steps": 2,
+                "router_mode": "none",
+            },
+            2,
+        ),
+        ({"research_mode": "parallel", "router_mode": "none"}, 4),
+    ],
+)
+def test_research_modes_conduct_every_step(
+    monkeypatch: pytest.MonkeyPatch,
+    configurable: dict[str, Any],
+    expected_max_running: int,
+) -> None:
+    steps = ["step 1", "step 2", "step 3", "step 4", "step 5"]
+    researcher = FakeResearcher()
+    monkeypatch.setattr(graph_module, "researcher_graph", researcher)
+    patch_models(monkeypatch, FakeChatModel(steps))
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {"messages": [("human", "question")]},
+            {"configurable": configurable},
+        )
+    )
+
+    assert sorted(researcher.questions) == steps
+    assert researcher.max_running == min(expected_max_running, len(steps))
+    assert sorted(doc.page_content for doc in result["documents"]) == steps
+    assert result["steps"] == []
+
+
+def test_parallel_research_mode_starts_a_step_as_soon_as_one_is_done(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    steps = ["slow step", "step 2", "step 3"]
+    researcher = FakeResearcher()
+    step_3_started = asyncio.Event()
+
+    async def ainvoke(state: dict[str, Any]) -> dict[str, Any]:
+        # The slow step only finishes once step 3 runs alongside it.
+        if state["question"] == "slow step":
+            await step_3_started.wait()
+        elif state["question"] == "step 3":
+            step_3_started.set()
+        return await FakeResearcher.ainvoke(researcher, state)
+
+    monkeypatch.setattr(researcher, "ainvoke", ainvoke)
+    monkeypatch.setattr(graph_module, "researcher_graph", researcher)
+    patch_models(monkeypatch, FakeChatModel(steps))
+
+    result = asyncio.run(
+        asyncio.wait_for(
+            graph_module.graph.ainvoke(
+                {"messages": [("human", "question")]},
+                {
+                    "configurable": {
+                        "research_mode": "parallel",
+                        "max_parallel_research_steps": 2,
+                        "router_mode": "none",
+                    }
+                },
+            ),
+            timeout=5,
+        )
+    )
+
+    assert researcher.max_running == 2
+    assert [doc.page_content for doc in result["documents"]] == steps
+
+
+@pytest.mark.parametrize("streams", [True, False])
+def test_streaming_research_mode_researches_steps_during_planning(
+    monkeypatch: pytest.MonkeyPatch, streams: bool
+) -> None:
+    steps = ["step 1", "step 2", "step 3"]
+    events: list[str] = []
+    researcher = FakeResearcher(events)
+    model = FakeStreamingChatModel(steps, events) if streams else FakeChatModel(steps)
+    monkeypatch.setattr(graph_module, "researcher_graph", researcher)
+    patch_models(monkeypatch, model)
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {
+                "messages": [("human", "question")],
+                "documents": [Document(page_content="previous turn")],
+            },
+            {
+                "configurable": {
+                    "research_mode": "streaming",
+                    "max_parallel_research_steps": 2,
+                    "router_mode": "none",
+                }
+            },
+        )
+    )
+
+    if streams:
+        assert events.index("research step 1") < events.index("plan done")
+    assert sorted(researcher.questions) == steps
+    assert researcher.max_running == 2
+    assert [doc.page_content for doc in result["documents"]] == steps
+    assert result["steps"] == []
+
+
+def test_research_stops_when_steps_bring_no_new_documents(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    steps = ["step 1", "step 2", "step 3", "step 4"]
+    researcher = FakeResearcher()
+    documents = [Document(page_content="same", metadata={"uuid": "1"})]
+
+    async def ainvoke(state: dict[str, Any]) -> dict[str, Any]:
+        researcher.questions.append(state["question"])
+        return {"documents": documents}
+
+    monkeypatch.setattr(researcher, "ainvoke", ainvoke)
+    monkeypatch.setattr(graph_module, "researcher_graph", researcher)
+    patch_models(monkeypatch, FakeChatModel(steps))
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {"messages": [("human", "question")]},
+            {"configurable": {"research_min_novelty": 0.5, "router_mode": "none"}},
+        )
+    )
+
+    assert researcher.questions == ["step 1", "step 2"]
+    assert result["skipped_steps"] == ["step 3", "step 4"]
+    assert result["research_stop_reason"].startswith("novelty 0.00")
+
+
+@pytest.mark.parametrize(
+    "response_model, prompt_caching, cached",
+    [
+        ("anthropic/claude-sonnet-4-5-20250929", True, True),
+        ("anthropic/claude-sonnet-4-5-20250929", False, False),
+        ("openai/gpt-4o-mini", True, False),
+    ],
+)
+def test_respond_marks_prompt_cache_breakpoints(
+    monkeypatch: pytest.MonkeyPatch,
+    response_model: str,
+    prompt_caching: bool,
+    cached: bool,
+) -> None:
+    model = FakeChatModel(["step 1"])
+    monkeypatch.setattr(graph_module, "researcher_graph", FakeResearcher())
+    patch_models(monkeypatch, model)
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {"messages": [("human", "question")]},
+            {
+                "configurable": {
+                    "router_mode": "none",
+                    "response_model": response_model,
+                    "prompt_caching": prompt_caching,
+                }
+            },
+        )
+    )
+
+    messages, kwargs = model.calls[-1]
+    # The request sent to the Anthropic API.
+    payload = ChatAnthropic(
+        model="claude-sonnet-4-5-20250929", api_key="sk-test"
+    )._get_request_payload(messages, **kwargs)
+    assert "cache_control" not in payload
+    (question,) = payload["messages"]
+    if cached:
+        assert payload["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert "step 1" in payload["system"][0]["text"]
+        assert question["content"] == [
+            {"type": "text", "text": "question", "cache_control": {"type": "ephemeral"}}
+        ]
+    else:
+        assert isinstance(payload["system"], str)
+        assert question["content"] == "question"
+    # The state keeps the messages as they were.
+    assert result["messages"][0].content == "question"
+    assert result["prompt_cache_read_tokens"] == 1200
+    assert result["prompt_cache_creation_tokens"] == 300
+
+
+@pytest.mark.parametrize("shared_store", [True, False])
+def test_semantic_cache_requires_a_shared_store(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Any, shared_store: bool
+) -> None:
+    model = FakeChatModel(["step 1"])
+    monkeypatch.setattr(graph_module, "researcher_graph", FakeResearcher())
+    patch_models(monkeypatch, model)
+    store = LocalFileStore(tmp_path) if shared_store else None
+    monkeypatch.setattr(graph_module, "get_shared_store", lambda: store)
+    monkeypatch.setattr(graph_module, "semantic_cache", SemanticCache(8))
+    monkeypatch.setattr(
+        graph_module,
+        "get_text_encoder",
+        lambda name: DeterministicFakeEmbedding(size=8),
+    )
+    config = {"configurable": {"router_mode": "none", "semantic_cache": True}}
+
+    first = asyncio.run(
+        graph_module.graph.ainvoke({"messages": [("human", "question")]}, config)
+    )
+    second = asyncio.run(
+        graph_module.graph.ainvoke({"messages": [("human", "question")]}, config)
+    )
+
+    assert not first["semantic_cache_hit"]
+    assert second["semantic_cache_hit"] is shared_store
+    assert len(model.calls) == (1 if shared_store else 2)
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds texts by counting greeting, error and LangChain keywords."""
+
+    keywords = [
+        ("hi", "hello", "thanks", "thank", "bye", "hey"),
+        ("error", "broken", "work", "bug", "fail", "crash"),
+        ("langchain", "langgraph", "chain", "model", "agent", "retriever"),
+    ]
+
+    def embed_query(self, text: str) -> list[float]:
+        words = text.lower().replace("?", " ").replace("!", " ").split()
+        return [
+            float(sum(word.startswith(k) for word in words for k in group)) + 0.01
+            for group in self.keywords
+        ]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def test_local_router_answers_trivial_messages_without_llm_routing(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    router = NearestCentroidRouter(KeywordEmbeddings())
+    assert asyncio.run(router.aroute("hello!", 0.3, 0.1))["type"] == "general"
+    assert asyncio.run(router.aroute("it is broken", 0.3, 0.1))["type"] == "more-info"
+    assert asyncio.run(router.aroute("quantum physics", 0.9, 0.1)) is None
+
+    models: list[str] = []
+
+    def load_chat_model(name: str) -> FakeChatModel:
+        models.append(name)
+        return FakeChatModel([])
+
+    monkeypatch.setattr(graph_module, "load_chat_model", load_chat_model)
+    monkeypatch.setattr(
+        graph_module, "load_structured_chat_model", fail("load_structured_chat_model")
+    )
+    monkeypatch.setattr(graph_module, "get_local_router", lambda model: router)
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {"messages": [("human", "thanks!")]},
+            {"configurable": {"router_mode": "local"}},
+        )
+    )
+
+    # A single (response) model call, no research.
+    assert len(models) == 1
+    assert result["router"]["type"] == "general"
+    assert result["messages"][-1].type == "ai"
+    assert result["documents"] == []
+
+
+def test_local_router_leaves_follow_up_messages_to_the_llm(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    routed: list[list[Any]] = []
+
+    def load_structured_chat_model(name: str, schema: Any) -> RunnableLambda:
+        def route(messages: list[Any]) -> dict[str, str]:
+            routed.append(messages)
+            return {"type": "general", "logic": "thanks for the answer"}
+
+        return RunnableLambda(route)
+
+    monkeypatch.setattr(graph_module, "load_chat_model", lambda name: FakeChatModel([]))
+    monkeypatch.setattr(
+        graph_module, "load_structured_chat_model", load_structured_chat_model
+    )
+    monkeypatch.setattr(graph_module, "get_local_router", fail("get_local_router"))
+
+    result = asyncio.run(
+        graph_module.graph.ainvoke(
+            {
+                "messages": [
+                    ("human", "How do I add memory to a LangGraph agent?"),
+                    ("ai", "Use a checkpointer."),
+                    ("human", "thanks! and across threads?"),
+                ]
+            },
+            {"configurable": {"router_mode": "local"}},
+        )
+    )
+
+    # The whole conversation is routed by the LLM.
+    (messages,) = routed
+    assert len(messages) == 4
+    assert result["router"]["type"] == "general"
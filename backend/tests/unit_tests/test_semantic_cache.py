@@ -0,0 +1,76 @@
+from langchain_core.documents import Document
+
+from backend.semantic_cache import SemanticCache
+
+
+def add(cache: SemanticCache, vector: list[float], answer: str, **kwargs) -> None:
+    cache.add(
+        vector,
+        scope=kwargs.get("scope", "model"),
+        generation=kwargs.get("generation", "1"),
+        question=answer,
+        answer=answer,
+        documents=[Document(page_content=answer, metadata={"uuid": answer})],
+    )
+
+
+def lookup(cache: SemanticCache, vector: list[float], **kwargs):
+    return cache.lookup(
+        vector,
+        scope=kwargs.get("scope", "model"),
+        threshold=kwargs.get("threshold", 0.9),
+        ttl=kwargs.get("ttl", 60),
+        generation=kwargs.get("generation", "1"),
+    )
+
+
+def test_semantic_cache_returns_similar_answer() -> None:
+    cache = SemanticCache(max_entries=4)
+    add(cache, [1.0, 0.0, 0.0], "a")
+    add(cache, [0.0, 1.0, 0.0], "b")
+
+    entry = lookup(cache, [0.1, 1.0, 0.0])
+    assert entry is not None
+    assert entry.answer == "b"
+    assert entry.documents == [Document(page_content="b", metadata={"uuid": "b"})]
+    assert lookup(cache, [0.0, 0.0, 1.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_semantic_cache_scope_ttl_and_generation() -> None:
+    cache = SemanticCache(max_entries=4)
+    add(cache, [1.0, 0.0], "a")
+
+    assert lookup(cache, [1.0, 0.0], scope="other-model") is None
+    assert lookup(cache, [1.0, 0.0]) is not None
+    # Expired answers are removed.
+    assert lookup(cache, [1.0, 0.0], ttl=-1) is None
+    assert lookup(cache, [1.0, 0.0]) is None
+    add(cache, [1.0, 0.0], "a")
+    # Re-ingesting the index invalidates every answer.
+    assert lookup(cache, [1.0, 0.0], generation="2") is None
+    assert lookup(cache, [1.0, 0.0], generation="1") is None
+
+
+def test_semantic_cache_evicts_least_recently_used() -> None:
+    cache = SemanticCache(max_entries=2)
+    add(cache, [1.0, 0.0, 0.0], "a")
+    add(cache, [0.0, 1.0, 0.0], "b")
+    assert lookup(cache, [1.0, 0.0, 0.0]) is not None
+    add(cache, [0.0, 0.0, 1.0], "c")
+
+    assert lookup(cache, [0.0, 1.0, 0.0]) is None
+    assert lookup(cache, [1.0, 0.0, 0.0]).answer == "a"
+    assert lookup(cache, [0.0, 0.0, 1.0]).answer == "c"
+
+
+def test_semantic_cache_forgets_scopes_without_entries() -> None:
+    cache = SemanticCache(max_entries=2)
+    for i in range(10):
+        add(cache, [1.0, float(i)], str(i), scope=f"prompt-v{i}")
+    assert set(cache._scope_ids) == {"prompt-v8", "prompt-v9"}
+
+    assert lookup(cache, [1.0, 8.0], scope="prompt-v8", ttl=-1) is None
+    assert set(cache._scope_ids) == {"prompt-v9"}
+    assert lookup(cache, [1.0, 9.0], scope="prompt-v9").answer == "9"
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from typing_extensions import TypedDict
+
+from backend.utils import (
+    DocumentCollection,
+    load_chat_model,
+    load_structured_chat_model,
+    reduce_docs,
+    with_cache_breakpoint,
+)
+
+
+class Answer(TypedDict):
+    answer: str
+
+
+class Other(TypedDict):
+    other: str
+
+
+def test_chat_models_are_memoized(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    model = load_chat_model("openai/gpt-4o-mini")
+
+    assert load_chat_model("openai/gpt-4o-mini") is model
+    assert load_chat_model("openai/gpt-4o") is not model
+    structured = load_structured_chat_model("openai/gpt-4o-mini", Answer)
+    assert load_structured_chat_model("openai/gpt-4o-mini", Answer) is structured
+    assert load_structured_chat_model("openai/gpt-4o-mini", Other) is not structured
+
+
+def test_chat_models_are_not_shared_across_event_loops(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    async def load() -> tuple:
+        return (
+            load_chat_model("openai/gpt-4o-mini"),
+            load_chat_model("openai/gpt-4o-mini"),
+            load_structured_chat_model("openai/gpt-4o-mini", Answer),
+        )
+
+    first = asyncio.run(load())
+    second = asyncio.run(load())
+
+    assert first[0] is first[1]
+    assert second[0] is not first[0]
+    assert second[2] is not first[2]
+
+
+def _doc(uuid: str) -> Document:
+    return Document(page_content=uuid, metadata={"uuid": uuid})
+
+
+def test_reduce_docs_merges_without_mutating_existing() -> None:
+    first = reduce_docs([], [_doc("a"), _doc("b"), _doc("a")])
+    second = reduce_docs(first, [_doc("b"), _doc("c")])
+    third = reduce_docs(second, [_doc("d")])
+
+    assert isinstance(third, DocumentCollection)
+    assert [doc.metadata["uuid"] for doc in first] == ["a", "b"]
+    assert [doc.metadata["uuid"] for doc in second] == ["a", "b", "c"]
+    assert [doc.metadata["uuid"] for doc in third] == ["a", "b", "c", "d"]
+    # Merging into an older value (e.g. a previous checkpoint) forks the index.
+    fork = reduce_docs(first, [_doc("c"), _doc("e")])
+    assert [doc.metadata["uuid"] for doc in fork] == ["a", "b", "c", "e"]
+    assert [doc.metadata["uuid"] for doc in reduce_docs(third, [_doc("e")])] == [
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+    # Plain lists (deserialized checkpoints) are indexed on their first merge.
+    assert len(reduce_docs(list(second), [_doc("a"), _doc("d")])) == 4
+    assert reduce_docs(third, "delete") == []
+
+
+def test_reduce_docs_assigns_uuids_without_copying_others() -> None:
+    shared = _doc("a")
+    anonymous = Document(page_content="text", metadata={"source": "s"})
+
+    docs = reduce_docs(
+        None,
+        [shared, anonymous, "raw", {"page_content": "dict", "metadata": {"uuid": "b"}}],
+    )
+
+    assert docs[0] is shared
+    assert docs[1].metadata["source"] == "s"
+    assert "uuid" not in anonymous.metadata
+    assert all(doc.metadata.get("uuid") for doc in docs)
+    assert [doc.page_content for doc in docs] == ["a", "text", "raw", "dict"]
+
+
+def test_with_cache_breakpoint_marks_the_last_content_block() -> None:
+    cache_control = {"cache_control": {"type": "ephemeral"}}
+    message = HumanMessage(content=[{"type": "text", "text": "a"}, "b"])
+
+    marked = with_cache_breakpoint(message)
+
+    assert marked.content == [
+        {"type": "text", "text": "a"},
+        {"type": "text", "text": "b", **cache_control},
+    ]
+    assert message.content == [{"type": "text", "text": "a"}, "b"]
+    assert with_cache_breakpoint(HumanMessage(content="a")).content == [
+        {"type": "text", "text": "a", **cache_control}
+    ]
+    assert with_cache_breakpoint(HumanMessage(content="")).content == ""
@@ -1,16 +1,29 @@
 """Shared utility functions used in the project.
 
+Classes:
+    DocumentCollection: Ordered, uuid-indexed list of documents.
+
 Functions:
     format_docs: Convert documents to an xml-formatted string.
+    cache_per_event_loop: Cache the results of a function per running event loop.
     load_chat_model: Load a chat model from a model name.
+    load_structured_chat_model: Load a chat model with structured output from a model name.
+    supports_prompt_caching: Whether a model supports prompt cache breakpoints.
+    with_cache_breakpoint: Mark the end of a message as the end of a cached prefix.
+    get_prompt_cache_usage: Read the prompt cache token counts of a model response.
 """
 
+import asyncio
 import uuid
-from typing import Any, Literal, Optional, Union
+import weakref
+from functools import wraps
+from typing import Any, Callable, Literal, Optional, TypeVar, Union
 
 from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import Runnable
 
 
 def _format_doc(doc: Document) -> str:
@@ -64,9 +77,55 @@ def format_docs(docs: Optional[list[Document]]) -> str:
 </documents>"""
 
 
+R = TypeVar("R")
+
+
+def cache_per_event_loop(func: Callable[..., R]) -> Callable[..., R]:
+    """Cache the results of ``func``, like ``lru_cache(maxsize=None)``, per event loop.
+
+    Chat models hold async HTTP clients whose connections belong to the event
+    loop they were opened on, so a model must not be shared across loops (e.g.
+    successive ``asyncio.run`` calls). Results are cached separately for each
+    running loop, and dropped with it; calls made outside of any running loop
+    share one cache. Arguments must be hashable.
+    """
+    loop_caches: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+    sync_cache: dict = {}
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> R:
+        try:
+            cache = loop_caches.setdefault(asyncio.get_running_loop(), {})
+        except RuntimeError:
+            cache = sync_cache
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = func(*args, **kwargs)
+        return cache[key]
+
+    def cache_clear() -> None:
+        loop_caches.clear()
+        sync_cache.clear()
+
+    wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+    return wrapper
+
+
+@cache_per_event_loop
+def _init_chat_model(
+    model: str, provider: str, model_kwargs: tuple[tuple[str, Any], ...]
+) -> BaseChatModel:
+    return init_chat_model(model, model_provider=provider, **dict(model_kwargs))
+
+
 def load_chat_model(fully_specified_name: str) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Models are created once per event loop, keyed by provider, model and model
+    arguments, so that their HTTP clients (connection pools, TLS sessions) are
+    reused across node executions (see `cache_per_event_loop`). Chat models are
+    stateless between calls and safe to share across concurrent runs.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
     """
@@ -91,7 +150,164 @@ def load_chat_model(fully_specified_name: str) -> BaseChatModel:
     if provider == "anthropic":
         model_kwargs["max_tokens"] = 16384  # Support long, detailed responses
 
-    return init_chat_model(model, model_provider=provider, **model_kwargs)
+    return _init_chat_model(model, provider, tuple(sorted(model_kwargs.items())))
+
+
+@cache_per_event_loop
+def load_structured_chat_model(fully_specified_name: str, schema: type) -> Runnable:
+    """Load a chat model returning structured output, created once per event loop.
+
+    OpenAI models use function calling; other models use their default method.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+        schema (type): The output schema. It must be defined at module level, so
+            that the same class is used (and cached) across calls.
+    """
+    structured_output_kwargs = (
+        {"method": "function_calling"} if "openai" in fully_specified_name else {}
+    )
+    return load_chat_model(fully_specified_name).with_structured_output(
+        schema, **structured_output_kwargs
+    )
+
+
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def supports_prompt_caching(fully_specified_name: str) -> bool:
+    """Return whether the model supports explicit prompt cache breakpoints.
+
+    Anthropic only caches the prompt prefixes marked with ``cache_control``.
+    Other providers either cache prompt prefixes automatically (OpenAI) or do not
+    accept the breakpoints.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+    """
+    return fully_specified_name.split("/", maxsplit=1)[0] == "anthropic"
+
+
+def cache_breakpoint(text: str) -> list[dict[str, Any]]:
+    """Return message content made of ``text``, marked as the end of a cached prefix."""
+    return [{"type": "text", "text": text, "cache_control": PROMPT_CACHE_CONTROL}]
+
+
+def with_cache_breakpoint(message: BaseMessage) -> BaseMessage:
+    """Return a copy of ``message`` whose last content block ends a cached prefix.
+
+    The message itself (e.g. from the graph state) is left unchanged. Messages
+    without content are returned as is, as empty blocks cannot be cached.
+    """
+    content = message.content
+    if not content:
+        return message
+    if isinstance(content, str):
+        return message.model_copy(update={"content": cache_breakpoint(content)})
+    last = content[-1]
+    last = {"type": "text", "text": last} if isinstance(last, str) else dict(last)
+    last["cache_control"] = PROMPT_CACHE_CONTROL
+    return message.model_copy(update={"content": [*content[:-1], last]})
+
+
+def get_prompt_cache_usage(message: AIMessage) -> dict[str, int]:
+    """Return the prompt tokens read from and written to the provider's cache.
+
+    Args:
+        message (AIMessage): A model response.
+
+    Returns:
+        dict[str, int]: 'cache_read' and 'cache_creation' token counts, 0 when the
+            provider does not report them.
+    """
+    details = (message.usage_metadata or {}).get("input_token_details") or {}
+    return {
+        "cache_read": details.get("cache_read") or 0,
+        "cache_creation": details.get("cache_creation") or 0,
+    }
+
+
+class _DocumentIndex:
+    """Append-only uuid -> position index shared by a lineage of collections."""
+
+    __slots__ = ("positions", "size", "tip")
+
+    def __init__(self) -> None:
+        self.positions: dict[str, int] = {}
+        self.size = 0
+        self.tip: Optional[list[Document]] = None
+
+
+class DocumentCollection(list[Document]):
+    """Ordered list of documents with unique uuids, merged without re-indexing.
+
+    Merging documents returns a new collection, as graph reducers must not
+    mutate the current value (checkpoints may still reference it). The uuid
+    index is shared with the new collection instead of being rebuilt: it is
+    append-only, and only the latest collection of the lineage, unmodified
+    since its creation, is allowed to extend it. Older collections, and plain
+    lists such as deserialized checkpoints, get a new index on their next merge.
+
+    The list itself is still copied on every merge, so a merge is not O(1):
+    checkpoint serializers only handle real lists, whose items cannot be shared
+    between two lists. Copying N references is cheap next to hashing the N
+    documents again, but it does grow with the state.
+
+    Documents are never deep-copied: documents without a uuid are shallow
+    copies with a new uuid in their metadata, other documents are shared.
+    """
+
+    _index: Optional[_DocumentIndex] = None
+
+    def _get_index(self) -> _DocumentIndex:
+        index = self._index
+        if index is None or index.tip is not self or index.size != len(self):
+            index = _DocumentIndex()
+            for position, doc in enumerate(self):
+                index.positions.setdefault(doc.metadata.get("uuid"), position)
+            index.size = len(self)
+            index.tip = self
+            self._index = index
+        return index
+
+    def merge(self, new: list[Document]) -> "DocumentCollection":
+        """Return a new collection with the documents whose uuid is not present yet.
+
+        Hashes only the new documents, then copies the ``len(self)`` existing
+        references into the new list.
+        """
+        index = self._get_index()
+        added = []
+        for doc in new:
+            item_id = doc.metadata.get("uuid")
+            position = index.positions.get(item_id)
+            if position is not None and position < index.size:
+                continue
+            index.positions[item_id] = index.size
+            index.size += 1
+            added.append(doc)
+        merged = DocumentCollection(self)
+        merged.extend(added)
+        merged._index = index
+        index.tip = merged
+        return merged
+
+
+def _to_document(item: Union[Document, dict[str, Any], str]) -> Document:
+    """Convert an item to a Document with a uuid in its metadata."""
+    if isinstance(item, str):
+        return Document(page_content=item, metadata={"uuid": str(uuid.uuid4())})
+    if isinstance(item, dict):
+        metadata = item.get("metadata", {})
+        item_id = metadata.get("uuid", str(uuid.uuid4()))
+        return Document(**{**item, "metadata": {**metadata, "uuid": item_id}})
+    if item.metadata.get("uuid") is None:
+        return Document(
+            id=item.id,
+            page_content=item.page_content,
+            metadata={**item.metadata, "uuid": str(uuid.uuid4())},
+        )
+    return item
 
 
 def reduce_docs(
@@ -103,56 +319,26 @@ def reduce_docs(
         str,
         Literal["delete"],
     ],
-) -> list[Document]:
+) -> DocumentCollection:
     """Reduce and process documents based on the input type.
 
     This function handles various input types and converts them into a sequence of Document objects.
-    It also combines existing documents with the new one based on the document ID.
+    It also combines existing documents with the new one based on the document ID, keeping the first
+    document seen for each ID.
 
     Args:
         existing (Optional[Sequence[Document]]): The existing docs in the state, if any.
         new (Union[Sequence[Document], Sequence[dict[str, Any]], Sequence[str], str, Literal["delete"]]):
             The new input to process. Can be a sequence of Documents, dictionaries, strings, or a single string.
+
+    Returns:
+        DocumentCollection: The combined documents. ``existing`` is left unchanged.
     """
     if new == "delete":
-        return []
+        return DocumentCollection()
 
-    existing_list = list(existing) if existing else []
+    if not isinstance(existing, DocumentCollection):
+        existing = DocumentCollection(existing or [])
     if isinstance(new, str):
-        return existing_list + [
-            Document(page_content=new, metadata={"uuid": str(uuid.uuid4())})
-        ]
-
-    new_list = []
-    if isinstance(new, list):
-        existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
-        for item in new:
-            if isinstance(item, str):
-                item_id = str(uuid.uuid4())
-                new_list.append(Document(page_content=item, metadata={"uuid": item_id}))
-                existing_ids.add(item_id)
-
-            elif isinstance(item, dict):
-                metadata = item.get("metadata", {})
-                item_id = metadata.get("uuid", str(uuid.uuid4()))
-
-                if item_id not in existing_ids:
-                    new_list.append(
-                        Document(**item, metadata={**metadata, "uuid": item_id})
-                    )
-                    existing_ids.add(item_id)
-
-            elif isinstance(item, Document):
-                item_id = item.metadata.get("uuid")
-                if item_id is None:
-                    item_id = str(uuid.uuid4())
-                    new_item = item.copy(deep=True)
-                    new_item.metadata["uuid"] = item_id
-                else:
-                    new_item = item
-
-                if item_id not in existing_ids:
-                    new_list.append(new_item)
-                    existing_ids.add(item_id)
-
-    return existing_list + new_list
+        new = [new]
+    return existing.merge([_to_document(item) for item in new])